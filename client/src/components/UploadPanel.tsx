@@ -99,7 +99,7 @@ export function UploadPanel({
             type="file"
             id="file-upload"
             className="hidden"
-            accept=".pdf,.docx,.txt,.md,.jpg,.jpeg,.png,.mp3,.wav,.m4a,.mp4,.mov,.avi,.mkv"
+            accept=".pdf,.docx,.txt,.md,.jpg,.jpeg,.png,.tif,.tiff,.mp3,.wav,.m4a,.mp4,.mov,.avi,.mkv"
             multiple
             onChange={handleFileInput}
           />
@@ -8,6 +8,7 @@ export const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:80
 export const API_ENDPOINTS = {
   health: `${API_BASE_URL}/api/health`,
   uploadFile: `${API_BASE_URL}/api/upload_file`,
+  jobs: `${API_BASE_URL}/api/jobs`,
   query: `${API_BASE_URL}/api/query`,
   listFiles: `${API_BASE_URL}/api/list_files`,
   deleteFile: `${API_BASE_URL}/api/delete_file`,
@@ -10,6 +10,18 @@ import { BookOpen } from "lucide-react";
 import { toast } from "sonner";
 import { API_ENDPOINTS } from "@/config/api";
 
+// Progress shown for each background ingestion stage
+const STAGE_PROGRESS: Record<string, number> = {
+  queued: 5,
+  parsing: 25,
+  chunking: 50,
+  embedding: 70,
+  indexing: 90,
+  done: 100,
+};
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
 const Index = () => {
   const [files, setFiles] = useState<UploadedFile[]>([]);
   const [messages, setMessages] = useState<Message[]>([]);
@@ -44,7 +56,27 @@ const Index = () => {
         throw new Error("Upload failed");
       }
 
-      const data = await res.json();
+      // Upload returns a background job; poll it until indexing finishes
+      let job = await res.json();
+      while (job.status === "queued" || job.status === "running") {
+        setFiles((prev) =>
+          prev.map((f) =>
+            f.id === newFile.id
+              ? { ...f, progress: STAGE_PROGRESS[job.stage] ?? f.progress }
+              : f
+          )
+        );
+        await new Promise((r) => setTimeout(r, JOB_POLL_INTERVAL_MS));
+        const jobRes = await fetch(`${API_ENDPOINTS.jobs}/${job.job_id}`);
+        if (!jobRes.ok) {
+          throw new Error("Job status unavailable");
+        }
+        job = await jobRes.json();
+      }
+
+      if (job.status !== "done") {
+        throw new Error(job.error || `Indexing ${job.status}`);
+      }
 
       setFiles((prev) =>
         prev.map((f) =>
@@ -53,7 +85,7 @@ const Index = () => {
                 ...f,
                 status: "success",
                 progress: 100,
-                chunks: data.chunks,
+                chunks: job.chunks,
               }
             : f
         )
@@ -2,18 +2,30 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 
 
-class UploadResponse(BaseModel):
-    """Response model for file upload endpoint."""
-    status: str = Field(..., description="Status of the upload operation", example="ok")
+class JobInfo(BaseModel):
+    """Status of a background ingestion job."""
+    job_id: str = Field(..., description="Job identifier")
     file: str = Field(..., description="Name of the uploaded file", example="document.pdf")
-    chunks: int = Field(..., description="Number of text chunks created", example=42)
+    status: str = Field(..., description="queued, running, done, failed or cancelled", example="running")
+    stage: str = Field(..., description="Current pipeline stage", example="embedding")
+    chunks: Optional[int] = Field(None, description="Number of text chunks created (when done)", example=42)
+    error: Optional[str] = Field(None, description="Failure reason (when failed)")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the uploaded file content")
+    created_at: float = Field(..., description="Unix timestamp when the job was queued")
+    updated_at: float = Field(..., description="Unix timestamp of the last status change")
     
     class Config:
         json_schema_extra = {
             "example": {
-                "status": "ok",
+                "job_id": "3f2c9a7e0b4d4e21a8c5f1d26b9e7a10",
                 "file": "research_paper.pdf",
-                "chunks": 15
+                "status": "done",
+                "stage": "done",
+                "chunks": 15,
+                "error": None,
+                "sha256": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "created_at": 1760000000.0,
+                "updated_at": 1760000012.5
             }
         }
 
@@ -43,6 +55,10 @@ class FileInfo(BaseModel):
     """Information about an indexed file."""
     name: str = Field(..., description="Filename", example="document.pdf")
     chunks: int = Field(..., description="Number of chunks indexed", example=10)
+    sha256: Optional[str] = Field(None, description="SHA-256 of the indexed file")
+    size_bytes: Optional[int] = Field(None, description="File size in bytes", example=52431)
+    parser: Optional[str] = Field(None, description="Parser that extracted the text", example="PDFParser")
+    ingested_at: Optional[float] = Field(None, description="Unix time the last ingestion completed")
 
 
 class DeleteResponse(BaseModel):
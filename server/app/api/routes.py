@@ -1,18 +1,23 @@
 import logging
 import asyncio
+import json
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
 from fastapi.responses import StreamingResponse
 
 from typing import List
 
-from ..core.utils import write_upload_bytes
-from ..core.security import validate_upload_file, FileValidationError
-from ..parsers import extract_text_auto
-from ..rag.qdrant_store import list_files_with_counts, delete_file as delete_file_qdrant
+from ..core.utils import save_upload_stream
+from ..core.security import validate_upload_filename, sanitize_filename, FileValidationError
+from ..parsers.text_cache import invalidate_file, ensure_cached, iter_range
+from ..rag.embeddings import embedding_cache_stats
+from ..rag.vector_store import list_files_with_counts, delete_file as delete_file_qdrant
 from ..core.config import UPLOAD_DIR
 from ..services.rag_service import RagService
-from .models import UploadResponse, QueryResponse, FileInfo, DeleteResponse
+from ..services.catalog_reconciler import catalog_reconciler
+from ..services.embedding_batcher import query_batcher
+from ..services.ingest_service import ingest_queue, QueueFullError, JobStateError
+from .models import JobInfo, QueryResponse, FileInfo, DeleteResponse
 
 router = APIRouter(tags=["ThinkBook LM"])
 logger = logging.getLogger(__name__)
@@ -23,12 +28,40 @@ async def health_check():
     return {"status": "ok", "service": "thinkbook-server (Qdrant)"}
 
 
+@router.get(
+    "/stats",
+    summary="Cache statistics",
+    description="""
+    Report embedding cache, query batching and catalog reconciliation counters.
+    
+    **embedding_cache:** `memory_hits` and `disk_hits` are lookups served from the
+    in-memory LRU and the on-disk store, `misses` went to the embedding model.
+    `disk_bytes` is the vector data on disk, bounded by `max_bytes`.
+    
+    **query_batcher:** number of encode `batches` for `queries`, batch sizes and
+    how long queries waited in the queue before their batch started.
+    
+    **catalog:** background passes that check per-file chunk counts against
+    the vector store, and how many files they had to correct.
+    """
+)
+async def stats():
+    """Report embedding cache, query batching and catalog statistics."""
+    cache_stats = await asyncio.to_thread(embedding_cache_stats)
+    return {
+        "embedding_cache": cache_stats,
+        "query_batcher": query_batcher.stats(),
+        "catalog": catalog_reconciler.stats(),
+    }
+
+
 @router.post(
     "/upload_file", 
-    response_model=UploadResponse,
-    summary="Upload and index a document",
+    response_model=JobInfo,
+    status_code=202,
+    summary="Upload a document for indexing",
     description="""
-    Upload a document file for indexing in the knowledge base.
+    Upload a document file and queue it for indexing in the knowledge base.
     
     **Supported Formats:**
     - Documents: PDF, DOCX, TXT
@@ -37,41 +70,43 @@ async def health_check():
     - Video: MP4 (transcription)
     
     **Validation:**
-    - Max file size: 50MB
-    - MIME type verification
+    - Max file size: 50MB (enforced while the upload streams to disk)
+    - MIME type verification (sniffed from the first few KB)
     - Extension whitelist
     - Filename sanitization
     
     **Process:**
-    1. Validates file size and type
-    2. Extracts text content
-    3. Chunks text into semantic segments
-    4. Generates embeddings
-    5. Stores in vector database
+    1. Validates and stores the file
+    2. Returns a job ID immediately
+    3. In the background: extracts text, chunks, embeds and stores in the vector database
+    
+    Poll `/api/jobs/{job_id}` to follow the job through its stages.
     """,
     responses={
-        200: {
-            "description": "File successfully uploaded and indexed",
+        202: {
+            "description": "File stored and queued for indexing",
             "content": {
                 "application/json": {
                     "example": {
-                        "status": "ok",
+                        "job_id": "3f2c9a7e0b4d4e21a8c5f1d26b9e7a10",
                         "file": "research.pdf",
-                        "chunks": 25
+                        "status": "queued",
+                        "stage": "queued"
                     }
                 }
             }
         },
         400: {"description": "Invalid file (wrong type, too large, or empty)"},
         409: {"description": "File already exists"},
+        503: {"description": "Ingestion queue is full"},
         500: {"description": "Internal processing error"}
     }
 )
 async def upload_file(file: UploadFile = File(...)):
     """
-    Upload and index a document file.
+    Upload a document file and queue it for background indexing.
     
-    Validates file size, MIME type, and extension before processing.
+    Validates file size, MIME type, and extension before queueing.
     Supports: PDF, DOCX, TXT, Images (PNG/JPG), Audio (WAV/MP3), Video (MP4)
     """
     original_filename = file.filename
@@ -81,38 +116,24 @@ async def upload_file(file: UploadFile = File(...)):
     saved_path = None
     
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Validate file (size, MIME type, extension, sanitize filename)
-        safe_filename, mime_type = validate_upload_file(content, original_filename)
-        saved_path = UPLOAD_DIR / safe_filename
+        # Validate what we can from the name alone (sanitize filename, extension)
+        safe_filename = validate_upload_filename(original_filename)
+        target_path = UPLOAD_DIR / safe_filename
         
         # Check for duplicate filename
-        if saved_path.exists():
+        if target_path.exists():
             raise HTTPException(
                 status_code=409, 
                 detail=f"File '{safe_filename}' already exists. Please rename or delete the existing file first."
             )
         
-        # Save to file system
-        write_upload_bytes(content, UPLOAD_DIR, safe_filename)
-        logger.info(f"File saved: {safe_filename} ({mime_type})")
-        
-        # Extract text using parser registry
-        text = extract_text_auto(saved_path)
-        if not text or not text.strip():
-            logger.warning(f"No text extracted from file {safe_filename}")
-            if saved_path.exists():
-                saved_path.unlink()
-            raise HTTPException(
-                status_code=400, 
-                detail="No text extracted from file. File might be empty or unsupported."
-            )
+        # Stream to file system (size limit, MIME sniffing and hashing as blocks arrive)
+        stored = await save_upload_stream(file, UPLOAD_DIR, safe_filename)
+        saved_path = stored.path
+        logger.info(f"File saved: {safe_filename} ({stored.mime_type})")
         
-        # Process and index document
-        result = await RagService.process_document(text, safe_filename)
-        return result
+        # Hand off parsing and indexing to the background queue
+        return await ingest_queue.submit(safe_filename, sha256=stored.sha256)
         
     except FileValidationError as fve:
         # File validation failed
@@ -121,18 +142,24 @@ async def upload_file(file: UploadFile = File(...)):
             saved_path.unlink()
         raise HTTPException(status_code=400, detail=str(fve))
         
-    except HTTPException:
-        # Re-raise HTTP exceptions without wrapping
+    except FileExistsError:
+        # Another upload of the same name finished first
+        raise HTTPException(
+            status_code=409,
+            detail=f"File '{safe_filename}' already exists. Please rename or delete the existing file first."
+        )
+        
+    except QueueFullError as qfe:
+        logger.warning(f"Rejected upload {original_filename}: {qfe}")
         if saved_path and saved_path.exists():
             saved_path.unlink()
-        raise
+        raise HTTPException(status_code=503, detail=str(qfe))
         
-    except ValueError as ve:
-        # Processing error
-        logger.error(f"Processing error for {original_filename}: {ve}")
+    except HTTPException:
+        # Re-raise HTTP exceptions without wrapping
         if saved_path and saved_path.exists():
             saved_path.unlink()
-        raise HTTPException(status_code=500, detail=str(ve))
+        raise
         
     except Exception as e:
         # Unexpected error
@@ -142,6 +169,92 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Internal processing error")
 
 
+@router.post(
+    "/reindex_file",
+    response_model=JobInfo,
+    status_code=202,
+    summary="Re-index an uploaded file",
+    description="""
+    Queue an already uploaded file to be chunked, embedded and indexed again.
+    
+    The extracted text is served from the text cache, so the file is only
+    parsed again if its parser changed since it was first ingested.
+    """,
+    responses={
+        404: {"description": "File not found"},
+        503: {"description": "Ingestion queue is full"}
+    }
+)
+async def reindex_file(name: str = Form(..., description="Filename to re-index")):
+    """Queue an uploaded file for re-indexing."""
+    try:
+        if sanitize_filename(name) != name:
+            raise FileValidationError("Invalid filename")
+    except FileValidationError as fve:
+        raise HTTPException(status_code=400, detail=str(fve))
+
+    file_path = UPLOAD_DIR / name
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        return await ingest_queue.submit(name, reindex=True)
+    except QueueFullError as qfe:
+        raise HTTPException(status_code=503, detail=str(qfe))
+
+
+@router.get(
+    "/jobs",
+    response_model=List[JobInfo],
+    summary="List ingestion jobs",
+    description="List queued, running and recently finished ingestion jobs, most recent first."
+)
+async def list_jobs():
+    """List ingestion jobs."""
+    return await ingest_queue.list_jobs()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobInfo,
+    summary="Get ingestion job status",
+    description="""
+    Report the status of an ingestion job.
+    
+    **Stages:** `queued` → `parsing` → `chunking` → `embedding` → `indexing` → `done`
+    
+    **Status:** `queued`, `running`, `done`, `failed` or `cancelled`
+    """,
+    responses={404: {"description": "Unknown job"}}
+)
+async def get_job(job_id: str):
+    """Get the status of an ingestion job."""
+    job = await ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post(
+    "/jobs/{job_id}/cancel",
+    response_model=JobInfo,
+    summary="Cancel an ingestion job",
+    description="Cancel a queued or running ingestion job and remove its uploaded file.",
+    responses={
+        404: {"description": "Unknown job"},
+        409: {"description": "Job already finished or is writing to the index"}
+    }
+)
+async def cancel_job(job_id: str):
+    """Cancel an ingestion job."""
+    try:
+        job = await ingest_queue.cancel(job_id)
+    except JobStateError as jse:
+        raise HTTPException(status_code=409, detail=str(jse))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
 @router.post(
     "/query", 
     response_model=QueryResponse,
@@ -292,11 +405,18 @@ async def list_files():
     - `name`: Exact filename to delete
     
     **Warning:** This operation is irreversible.
-    """
+    """,
+    responses={409: {"description": "The file is being re-indexed"}}
 )
 async def delete_file(name: str = Form(..., description="Filename to delete")):
     """Delete a file from the knowledge base and filesystem."""
     try:
+        # Stop any pending ingestion of this file first, so none adds chunks after the delete
+        try:
+            await ingest_queue.cancel_file(name)
+        except JobStateError as jse:
+            raise HTTPException(status_code=409, detail=str(jse))
+
         # Delete from Vector DB
         deleted_count = delete_file_qdrant(name)
 
@@ -304,6 +424,7 @@ async def delete_file(name: str = Form(..., description="Filename to delete")):
         file_path = UPLOAD_DIR / name
         if file_path.exists():
             file_path.unlink()
+        invalidate_file(name)
 
         if deleted_count == 0 and not file_path.exists():
             raise HTTPException(
@@ -319,18 +440,82 @@ async def delete_file(name: str = Form(..., description="Filename to delete")):
         raise HTTPException(status_code=500, detail="Failed to delete file")
 
 
-@router.get("/get_file_text")
-async def get_file_text(name: str):
-    try:
-        file_path = UPLOAD_DIR / name
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-
-        text = extract_text_auto(file_path)
-        if not text:
-            raise HTTPException(status_code=500, detail="Failed to extract text")
+@router.get(
+    "/get_file_text",
+    summary="Get extracted file text",
+    description="""
+    Return a range of the text extracted from an uploaded file.
+    
+    Text is served from the extracted-text cache and only the requested range is
+    read. The JSON body is sent as a chunked response while the range is read.
+    
+    **Parameters:**
+    - `name`: Exact filename
+    - `offset`: First character to return (default: 0)
+    - `length`: Maximum number of characters to return (default: 50000)
+    
+    **Returns:** `text` for the range, `total_length` of the whole text and
+    `next_offset` to request the following range (`null` at the end).
+    """,
+    responses={
+        200: {
+            "description": "Text range",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "name": "document.pdf",
+                        "offset": 0,
+                        "length": 50000,
+                        "total_length": 182340,
+                        "next_offset": 50000,
+                        "text": "Chapter 1..."
+                    }
+                }
+            }
+        },
+        404: {"description": "File not found"},
+        500: {"description": "Failed to extract text"}
+    }
+)
+async def get_file_text(
+    name: str,
+    offset: int = Query(0, ge=0, description="First character to return"),
+    length: int = Query(50000, ge=1, le=1_000_000, description="Maximum characters to return"),
+):
+    """Return a range of a file's extracted text."""
+    file_path = UPLOAD_DIR / name
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
 
-        return {"name": name, "text": text[:50000]}  
+    try:
+        cached = await ensure_cached(file_path)
     except Exception as e:
         logger.error(f"Failed to load text for {name}: {e}")
         raise HTTPException(status_code=500, detail="Failed to load file text")
+    if cached is None:
+        raise HTTPException(status_code=500, detail="Failed to extract text")
+
+    key, total_length = cached
+    offset = min(offset, total_length)
+    length = min(length, total_length - offset)
+    next_offset = offset + length if offset + length < total_length else None
+
+    def generate():
+        header = {
+            "name": name,
+            "offset": offset,
+            "length": length,
+            "total_length": total_length,
+            "next_offset": next_offset,
+        }
+        # Open the JSON object, stream the escaped text, then close it
+        yield json.dumps(header)[:-1] + ', "text": "'
+        for piece in iter_range(key, offset, length):
+            yield json.dumps(piece)[1:-1]
+        yield '"}'
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/json",
+        headers={"X-Total-Length": str(total_length)},
+    )
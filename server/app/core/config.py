@@ -13,10 +13,46 @@ QDRANT_DIR = Path(os.getenv("THINKBOOK_QDRANT_DIR", "./data/qdrant")).resolve()
 # Default to local persistent mode if no URL provided
 QDRANT_URL = os.getenv("THINKBOOK_QDRANT_URL") 
 QDRANT_API_KEY = os.getenv("THINKBOOK_QDRANT_API_KEY")
+# Points per upsert request; with a Qdrant server, up to QDRANT_UPSERT_PARALLEL
+# requests are in flight at once (an ingest flush of INGEST_BATCH_CHUNKS chunks
+# is sent as INGEST_BATCH_CHUNKS / QDRANT_UPSERT_BATCH_SIZE requests)
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("THINKBOOK_QDRANT_UPSERT_BATCH_SIZE", "64"))
+QDRANT_UPSERT_PARALLEL = int(os.getenv("THINKBOOK_QDRANT_UPSERT_PARALLEL", "4"))
+# Quantization, HNSW and on-disk layout: "low-memory", "balanced" or "low-latency"
+# (see app/rag/storage_profiles.py); existing collections are migrated on startup
+QDRANT_STORAGE_PROFILE = os.getenv("THINKBOOK_QDRANT_STORAGE_PROFILE", "balanced")
+# Vector store: "qdrant" (local mode or THINKBOOK_QDRANT_URL), or "mmap" for
+# memory-mapped NumPy files shared by all worker processes (app/rag/mmap_store.py)
+VECTOR_STORE = os.getenv("THINKBOOK_VECTOR_STORE", "qdrant")
+MMAP_STORE_DIR = Path(os.getenv("THINKBOOK_MMAP_STORE_DIR", "./data/vector_store")).resolve()
+# float16 halves the vectors' memory and disk footprint; scores are computed in float32
+MMAP_STORE_DTYPE = os.getenv("THINKBOOK_MMAP_STORE_DTYPE", "float16")
+# Searches switch from a full scan to an IVF index from this many vectors (0 = never)
+MMAP_IVF_MIN_VECTORS = int(os.getenv("THINKBOOK_MMAP_IVF_MIN_VECTORS", "100000"))
+MMAP_IVF_PROBES = int(os.getenv("THINKBOOK_MMAP_IVF_PROBES", "16"))
+# Per-file catalog (chunk counts, hashes, sizes, parser, ingest time) behind /api/list_files
+CATALOG_PATH = Path(os.getenv("THINKBOOK_CATALOG_PATH", "./data/catalog.sqlite")).resolve()
+# Catalog chunk counts are checked against Qdrant at startup and then this often (0 = never)
+CATALOG_RECONCILE_INTERVAL_SECONDS = float(os.getenv("THINKBOOK_CATALOG_RECONCILE_INTERVAL_SECONDS", "900"))
 
 OLLAMA_URL = os.getenv("THINKBOOK_OLLAMA_URL", "http://localhost:11434/api/generate")
 OLLAMA_MODEL = os.getenv("THINKBOOK_OLLAMA_MODEL", "llama3.1:8b")
 EMBEDDING_MODEL = os.getenv("THINKBOOK_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "torch", "onnx" or "onnx-int8" (the ONNX backends run on CPU via ONNX Runtime)
+EMBEDDING_BACKEND = os.getenv("THINKBOOK_EMBEDDING_BACKEND", "torch")
+# Instruction set targeted by int8 quantization: avx2, avx512, avx512_vnni or arm64
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("THINKBOOK_EMBEDDING_ONNX_QUANTIZATION", "avx2")
+# Document chunks are embedded in length-sorted batches of EMBEDDING_BATCH_SIZE;
+# EMBEDDING_PROCESSES > 1 spreads them over a SentenceTransformer process pool
+EMBEDDING_BATCH_SIZE = int(os.getenv("THINKBOOK_EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_PROCESSES = int(os.getenv("THINKBOOK_EMBEDDING_PROCESSES", "0"))
+# Unix socket of a shared embedding server (python -m app.rag.embedding_server);
+# when set, API workers send texts there instead of loading the model themselves
+EMBEDDING_SERVER_SOCKET = os.getenv("THINKBOOK_EMBEDDING_SERVER_SOCKET", "")
+# Seconds an API worker waits for the embedding server to answer one request
+EMBEDDING_SERVER_TIMEOUT_SECONDS = float(os.getenv("THINKBOOK_EMBEDDING_SERVER_TIMEOUT_SECONDS", "120"))
+# Models quantized locally (when the hub has no int8 weights) are saved here
+EMBEDDING_ONNX_DIR = Path(os.getenv("THINKBOOK_EMBEDDING_ONNX_DIR", "./data/onnx_models")).resolve()
 CHUNK_SIZE_TOKENS = int(os.getenv("THINKBOOK_CHUNK_SIZE_TOKENS", "800"))
 CHUNK_OVERLAP_TOKENS = int(os.getenv("THINKBOOK_CHUNK_OVERLAP_TOKENS", "150"))
 LOG_LEVEL = os.getenv("THINKBOOK_LOG_LEVEL", "INFO")
@@ -26,6 +62,66 @@ ALLOWED_ORIGINS = os.getenv("THINKBOOK_ALLOWED_ORIGINS", "http://localhost:3000"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 QDRANT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Background ingestion queue
+INGEST_WORKERS = int(os.getenv("THINKBOOK_INGEST_WORKERS", "1"))
+INGEST_QUEUE_SIZE = int(os.getenv("THINKBOOK_INGEST_QUEUE_SIZE", "32"))
+# Job table shared by all API workers (SQLite)
+INGEST_JOBS_PATH = Path(os.getenv("THINKBOOK_INGEST_JOBS_PATH", "./data/jobs.sqlite")).resolve()
+
+# Parser process pool: "heavy" parsers (audio/video) and "light" parsers run in
+# separate worker processes with their own slot counts, wall-clock and RSS budgets
+# (a worker's RSS includes the page and transcription pools its parser starts)
+PARSER_POOL_ENABLED = os.getenv("THINKBOOK_PARSER_POOL_ENABLED", "true").lower() == "true"
+PARSER_HEAVY_SLOTS = int(os.getenv("THINKBOOK_PARSER_HEAVY_SLOTS", "1"))
+PARSER_LIGHT_SLOTS = int(os.getenv("THINKBOOK_PARSER_LIGHT_SLOTS", "2"))
+PARSER_HEAVY_TIMEOUT_SECONDS = int(os.getenv("THINKBOOK_PARSER_HEAVY_TIMEOUT_SECONDS", "1800"))
+PARSER_LIGHT_TIMEOUT_SECONDS = int(os.getenv("THINKBOOK_PARSER_LIGHT_TIMEOUT_SECONDS", "300"))
+PARSER_HEAVY_MAX_RSS_MB = int(os.getenv("THINKBOOK_PARSER_HEAVY_MAX_RSS_MB", "4096"))
+PARSER_LIGHT_MAX_RSS_MB = int(os.getenv("THINKBOOK_PARSER_LIGHT_MAX_RSS_MB", "1024"))
+
+# Page-parallel PDF extraction (used from PDF_PARALLEL_MIN_PAGES pages up)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("THINKBOOK_PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("THINKBOOK_PDF_PAGES_PER_TASK", "16"))
+PDF_PAGE_WORKERS = int(os.getenv("THINKBOOK_PDF_PAGE_WORKERS", "0")) or os.cpu_count() or 1
+
+# Speech-to-text: audio is cut into ~WHISPER_SEGMENT_SECONDS windows (snapped to
+# the quietest point nearby) that are transcribed on WHISPER_WORKERS processes
+WHISPER_MODEL = os.getenv("THINKBOOK_WHISPER_MODEL", "base")
+# "whisper" (openai-whisper, fp32) or "faster-whisper" (CTranslate2, quantized)
+STT_BACKEND = os.getenv("THINKBOOK_STT_BACKEND", "whisper")
+STT_COMPUTE_TYPE = os.getenv("THINKBOOK_STT_COMPUTE_TYPE", "int8")
+WHISPER_SEGMENT_SECONDS = int(os.getenv("THINKBOOK_WHISPER_SEGMENT_SECONDS", "30"))
+WHISPER_WORKERS = int(os.getenv("THINKBOOK_WHISPER_WORKERS", "0")) or min(2, os.cpu_count() or 1)
+
+# OCR: images are rescaled towards OCR_TARGET_DPI, binarized and run through
+# Tesseract on OCR_WORKERS threads (one single-threaded tesseract process each)
+OCR_LANG = os.getenv("THINKBOOK_OCR_LANG", "eng")
+OCR_TARGET_DPI = int(os.getenv("THINKBOOK_OCR_TARGET_DPI", "300"))
+OCR_WORKERS = int(os.getenv("THINKBOOK_OCR_WORKERS", "0")) or os.cpu_count() or 1
+
+# Plain-text files are memory-mapped and decoded in windows of this size
+TEXT_WINDOW_BYTES = int(os.getenv("THINKBOOK_TEXT_WINDOW_KB", "1024")) * 1024
+
+# Chunks embedded and upserted together while a document streams in; a multiple
+# of QDRANT_UPSERT_BATCH_SIZE so each flush fills concurrent upsert requests
+INGEST_BATCH_CHUNKS = int(os.getenv("THINKBOOK_INGEST_BATCH_CHUNKS", "256"))
+
+# Extracted text cache (SQLite, keyed by file SHA-256 + parser version)
+TEXT_CACHE_PATH = Path(os.getenv("THINKBOOK_TEXT_CACHE_PATH", "./data/text_cache.sqlite")).resolve()
+TEXT_CACHE_MAX_MB = int(os.getenv("THINKBOOK_TEXT_CACHE_MAX_MB", "1024"))
+
+# Embedding cache keyed by (model, text hash): an in-memory LRU of
+# EMBEDDING_CACHE_MEMORY_ITEMS vectors in front of a memory-mapped on-disk store
+EMBEDDING_CACHE_ENABLED = os.getenv("THINKBOOK_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = Path(os.getenv("THINKBOOK_EMBEDDING_CACHE_DIR", "./data/embedding_cache")).resolve()
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("THINKBOOK_EMBEDDING_CACHE_MAX_MB", "512"))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("THINKBOOK_EMBEDDING_CACHE_MEMORY_ITEMS", "4096"))
+
+# Concurrent query embeddings are coalesced: the first query waits up to
+# QUERY_BATCH_WINDOW_MS for others, and up to QUERY_BATCH_MAX_SIZE are encoded at once
+QUERY_BATCH_WINDOW_MS = float(os.getenv("THINKBOOK_QUERY_BATCH_WINDOW_MS", "5"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("THINKBOOK_QUERY_BATCH_MAX_SIZE", "32"))
+
 MAX_CHUNKS = int(os.getenv("THINKBOOK_MAX_CHUNKS", "5"))
 MAX_TOKENS = int(os.getenv("THINKBOOK_MAX_TOKENS", "512"))
 TEMPERATURE = float(os.getenv("THINKBOOK_TEMPERATURE", "0.0"))
@@ -33,6 +129,10 @@ TEMPERATURE = float(os.getenv("THINKBOOK_TEMPERATURE", "0.0"))
 # File upload security settings
 MAX_FILE_SIZE_MB = int(os.getenv("THINKBOOK_MAX_FILE_SIZE_MB", "50"))
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+# Uploads are streamed to disk in blocks of this size; only the first
+# MIME_SNIFF_BYTES are kept in memory for content-type detection.
+UPLOAD_BLOCK_SIZE_BYTES = int(os.getenv("THINKBOOK_UPLOAD_BLOCK_SIZE_KB", "1024")) * 1024
+MIME_SNIFF_BYTES = int(os.getenv("THINKBOOK_MIME_SNIFF_BYTES", "8192"))
 
 # Allowed MIME types for uploads
 ALLOWED_MIME_TYPES = {
@@ -44,6 +144,7 @@ ALLOWED_MIME_TYPES = {
     "image/png",
     "image/jpeg",
     "image/jpg",
+    "image/tiff",
     # Audio
     "audio/wav",
     "audio/mpeg",
@@ -55,7 +156,7 @@ ALLOWED_MIME_TYPES = {
 # Allowed file extensions (backup validation)
 ALLOWED_EXTENSIONS = {
     ".pdf", ".docx", ".txt",
-    ".png", ".jpg", ".jpeg",
+    ".png", ".jpg", ".jpeg", ".tif", ".tiff",
     ".wav", ".mp3",
     ".mp4"
 }
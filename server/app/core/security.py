@@ -23,18 +23,19 @@ class FileValidationError(Exception):
     pass
 
 
-def validate_file_size(file_size: int) -> None:
+def validate_file_size(file_size: int, max_bytes: int = MAX_FILE_SIZE_BYTES) -> None:
     """
     Validate file size against maximum allowed size.
     
     Args:
         file_size: Size of file in bytes
+        max_bytes: Size limit in bytes (defaults to MAX_FILE_SIZE_BYTES)
         
     Raises:
         FileValidationError: If file exceeds maximum size
     """
-    if file_size > MAX_FILE_SIZE_BYTES:
-        max_mb = MAX_FILE_SIZE_BYTES / (1024 * 1024)
+    if file_size > max_bytes:
+        max_mb = max_bytes / (1024 * 1024)
         actual_mb = file_size / (1024 * 1024)
         raise FileValidationError(
             f"File size ({actual_mb:.2f}MB) exceeds maximum allowed size ({max_mb:.0f}MB)"
@@ -123,6 +124,24 @@ def sanitize_filename(filename: str) -> str:
     return safe_name
 
 
+def validate_upload_filename(filename: str) -> str:
+    """
+    Validation that only needs the filename, run before any content is read.
+    
+    Args:
+        filename: Original filename
+        
+    Returns:
+        str: Sanitized filename
+        
+    Raises:
+        FileValidationError: If the name is unsafe or the extension is not allowed
+    """
+    safe_filename = sanitize_filename(filename)
+    validate_file_extension(safe_filename)
+    return safe_filename
+
+
 def validate_upload_file(
     file_content: bytes, 
     filename: str
@@ -140,16 +159,13 @@ def validate_upload_file(
     Raises:
         FileValidationError: If any validation fails
     """
-    # 1. Sanitize filename
-    safe_filename = sanitize_filename(filename)
+    # 1. Sanitize filename and validate extension
+    safe_filename = validate_upload_filename(filename)
     
     # 2. Validate file size
     validate_file_size(len(file_content))
     
-    # 3. Validate extension
-    validate_file_extension(safe_filename)
-    
-    # 4. Validate MIME type
+    # 3. Validate MIME type
     mime_type = validate_mime_type(file_content, safe_filename)
     
     logger.info(
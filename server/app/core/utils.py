@@ -1,7 +1,19 @@
 from pathlib import Path
+from typing import Iterator, NamedTuple
+import asyncio
+import codecs
+import hashlib
+import logging
+import mmap
+import os
 import shutil
 import uuid
 
+from .config import MAX_FILE_SIZE_BYTES, UPLOAD_BLOCK_SIZE_BYTES, MIME_SNIFF_BYTES, TEXT_WINDOW_BYTES
+from .security import validate_file_size, validate_mime_type
+
+logger = logging.getLogger(__name__)
+
 
 def safe_filename(filename: str) -> str:
     
@@ -25,8 +37,119 @@ def write_upload_bytes(data: bytes, upload_dir: Path, filename: str):
     return file_path
 
 
+def hash_file(path: Path, block_size: int = UPLOAD_BLOCK_SIZE_BYTES) -> str:
+    """Returns the SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def read_file_text(path: Path, encoding: str = "utf-8") -> str:
     try:
         return path.read_text(encoding=encoding, errors="ignore")
     except Exception:
         return ""
+
+
+def iter_file_text(
+    path: Path, encoding: str = "utf-8", window_bytes: int = TEXT_WINDOW_BYTES
+) -> Iterator[str]:
+    """
+    Yields the decoded text of a file in windows of about `window_bytes`.
+
+    The file is memory-mapped and decoded incrementally, so multi-byte
+    characters split across windows are kept intact and memory use does not
+    grow with file size. Joining the windows gives read_file_text(path).
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            # Windows must start on page boundaries to be released below
+            window_bytes = max(mmap.PAGESIZE, window_bytes - window_bytes % mmap.PAGESIZE)
+            for start in range(0, len(mm), window_bytes):
+                text = decoder.decode(mm[start : start + window_bytes])
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    # Unmap pages already decoded so they stop counting towards RSS
+                    mm.madvise(mmap.MADV_DONTNEED, start, min(window_bytes, len(mm) - start))
+                if text:
+                    yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class StoredUpload(NamedTuple):
+    path: Path
+    size: int
+    sha256: str
+    mime_type: str
+
+
+async def save_upload_stream(
+    upload,
+    upload_dir: Path,
+    filename: str,
+    max_bytes: int = MAX_FILE_SIZE_BYTES,
+    block_size: int = UPLOAD_BLOCK_SIZE_BYTES,
+    sniff_bytes: int = MIME_SNIFF_BYTES,
+) -> StoredUpload:
+    """
+    Streams an UploadFile to `upload_dir / filename` without holding it in memory.
+
+    Blocks are written to a temp file in the same directory while a SHA-256 is
+    computed, the size limit is enforced as data arrives and the MIME type is
+    sniffed from the first `sniff_bytes` only. The temp file is linked into place
+    once the whole body has been received, and removed on any failure.
+
+    Raises:
+        FileValidationError: If the file is too large or has a disallowed type
+        FileExistsError: If `filename` was stored meanwhile (a concurrent upload)
+    """
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    final_path = upload_dir / filename
+    temp_path = upload_dir / f".{filename}.{uuid.uuid4().hex}.part"
+
+    digest = hashlib.sha256()
+    head = bytearray()
+    mime_type = None
+    size = 0
+
+    try:
+        with open(temp_path, "wb") as out:
+            while True:
+                block = await upload.read(block_size)
+                if not block:
+                    break
+
+                size += len(block)
+                validate_file_size(size, max_bytes)
+
+                if mime_type is None:
+                    head += block[: sniff_bytes - len(head)]
+                    if len(head) >= sniff_bytes:
+                        mime_type = validate_mime_type(bytes(head), filename)
+
+                digest.update(block)
+                await asyncio.to_thread(out.write, block)
+
+        if mime_type is None:
+            mime_type = validate_mime_type(bytes(head), filename)
+
+        # Unlike a rename, a link never replaces a file stored by a concurrent upload
+        os.link(temp_path, final_path)
+        temp_path.unlink()
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+    logger.info(
+        f"Upload stored: {filename} ({size / 1024:.2f}KB, {mime_type}, sha256={digest.hexdigest()[:12]})"
+    )
+    return StoredUpload(final_path, size, digest.hexdigest(), mime_type)
@@ -3,9 +3,13 @@ import requests
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api.routes import router
-from .core.config import ALLOWED_ORIGINS, LOG_LEVEL, OLLAMA_URL, OLLAMA_MODEL
+from .core.config import ALLOWED_ORIGINS, LOG_LEVEL, OLLAMA_URL, OLLAMA_MODEL, EMBEDDING_SERVER_SOCKET
 from .core.logging_config import setup_logging
 from .rag.embeddings import get_embedding_model
+from .services.catalog_reconciler import catalog_reconciler
+from .services.embedding_batcher import query_batcher
+from .services.ingest_service import ingest_queue
+from .parsers import parser_pool
 
 setup_logging(LOG_LEVEL)
 logger = logging.getLogger(__name__)
@@ -27,7 +31,7 @@ app = FastAPI(
     
     ### Workflow
     
-    1. **Upload** documents via `/api/upload_file`
+    1. **Upload** documents via `/api/upload_file` and follow indexing via `/api/jobs/{job_id}`
     2. **Query** your knowledge base via `/api/query` or `/api/query_stream`
     3. **Manage** files via `/api/list_files` and `/api/delete_file`
     
@@ -62,9 +66,13 @@ app.include_router(router, prefix="/api")
 
 @app.on_event("startup")
 async def preload_models():
-    logger.info("Preloading embedding model...")
-    get_embedding_model()
-    logger.info("Embedding model loaded successfully.")
+    if EMBEDDING_SERVER_SOCKET:
+        # The model lives in the shared embedding server process
+        logger.info(f"Using embedding server at {EMBEDDING_SERVER_SOCKET}")
+    else:
+        logger.info("Preloading embedding model...")
+        get_embedding_model()
+        logger.info("Embedding model loaded successfully.")
 
     # 🔥 Preload Ollama model to avoid first-query timeout
     try:
@@ -79,6 +87,21 @@ async def preload_models():
         logger.warning(f"Ollama preload failed (will auto-load later): {e}")
 
 
+@app.on_event("startup")
+async def start_ingest_queue():
+    await ingest_queue.start()
+    await query_batcher.start()
+    await catalog_reconciler.start()
+
+
+@app.on_event("shutdown")
+async def stop_ingest_queue():
+    await catalog_reconciler.stop()
+    await ingest_queue.stop()
+    await query_batcher.stop()
+    parser_pool.shutdown()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -1,11 +1,12 @@
 from .registry import ParserRegistry
-# Import parsers to ensure registration
-from .pdf_parser import PDFParser
-from .docx_parser import DocxParser
-from .text_parser import TextParser
-from .image_parser import ImageParser
-from .audio_parser import AudioParser
-from .video_parser import VideoParser
+# Parser modules (and their PyPDF2 / Tesseract / Whisper dependencies) are
+# imported the first time a file of that type is parsed
+ParserRegistry.register_lazy([".pdf"], ".pdf_parser")
+ParserRegistry.register_lazy([".docx", ".doc"], ".docx_parser")
+ParserRegistry.register_lazy([".txt", ".md"], ".text_parser")
+ParserRegistry.register_lazy([".jpg", ".jpeg", ".png", ".tif", ".tiff"], ".image_parser")
+ParserRegistry.register_lazy([".mp3", ".wav", ".m4a"], ".audio_parser")
+ParserRegistry.register_lazy([".mp4", ".mov", ".avi", ".mkv"], ".video_parser")
 
 def extract_text_auto(file_path):
     parser = ParserRegistry.get_parser(file_path)
@@ -14,3 +15,13 @@ def extract_text_auto(file_path):
     # Fallback to text parser if no specific match, or raise error?
     # For now, let's try text parser as generic fallback or return empty
     return ""
+
+
+def iter_segments_auto(file_path):
+    parser = ParserRegistry.get_parser(file_path)
+    if parser:
+        yield from parser.iter_parse(file_path)
+
+
+from .pool import extract_text_async, parser_pool, ParseError
+from .text_cache import cached_extract_text, cached_extract_segments
@@ -1,31 +1,28 @@
 import logging
 from pathlib import Path
-import whisper
-from .base import BaseParser
+from typing import Iterator
+from .base import BaseParser, Segment
 from .registry import ParserRegistry
+from .transcription import read_audio, transcribe_segments
 
 logger = logging.getLogger(__name__)
 
-# Global model cache to avoid reloading
-_whisper_model = None
-
-def get_whisper_model():
-    global _whisper_model
-    if _whisper_model is None:
-        logger.info("Loading Whisper model (base)...")
-        # 'base' is a good trade-off for CPU inference; 'tiny' is faster but less accurate.
-        _whisper_model = whisper.load_model("base")
-    return _whisper_model
-
 @ParserRegistry.register(".mp3")
 @ParserRegistry.register(".wav")
 @ParserRegistry.register(".m4a")
 class AudioParser(BaseParser):
+    weight = "heavy"
+    version = 3
+
     def parse(self, file_path: Path) -> str:
+        return "".join(text for text, _ in self.iter_parse(file_path))
+
+    def iter_parse(self, file_path: Path) -> Iterator[Segment]:
+        """Yields transcript segments with {"start", "end"} timestamps in seconds."""
         try:
-            model = get_whisper_model()
-            result = model.transcribe(str(file_path))
-            return result.get("text", "")
+            audio = read_audio(file_path)
+            yield from transcribe_segments(audio)
         except Exception as e:
+            # Fail the job rather than index (and cache) the error as text
             logger.error(f"Error transcribing audio {file_path}: {e}")
-            return f"Error transcribing audio: {str(e)}"
+            raise
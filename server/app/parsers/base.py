@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+# A piece of extracted text and the metadata it carries (e.g. {"page": 3})
+Segment = Tuple[str, Dict[str, Any]]
 
 class BaseParser(ABC):
     """Abstract base class for all file parsers."""
 
+    # Which parser pool slots this parser runs in: "light" or "heavy"
+    weight = "light"
+
+    # Bump when a parser's output changes so cached extracted text is not reused
+    version = 1
+
     @abstractmethod
     def parse(self, file_path: Path) -> str:
         """
@@ -19,3 +29,21 @@ class BaseParser(ABC):
             Exception: If parsing fails.
         """
         pass
+
+    def iter_parse(self, file_path: Path) -> Iterator[Segment]:
+        """
+        Parse the file incrementally, yielding (text, metadata) segments in order.
+        
+        Concatenating the text of all segments gives the same result as parse().
+        Parsers that can produce text before the whole file is read (pages,
+        transcript segments) override this so downstream chunking can start early.
+        
+        Args:
+            file_path (Path): Path to the file to parse.
+            
+        Yields:
+            Segment: Extracted text and its metadata.
+        """
+        text = self.parse(file_path)
+        if text:
+            yield text, {}
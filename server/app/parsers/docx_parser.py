@@ -1,15 +1,135 @@
+import logging
+import re
+import zipfile
 from pathlib import Path
-import docx
-from .base import BaseParser
+from typing import IO, Iterator, List
+from xml.etree.ElementTree import iterparse
+from .base import BaseParser, Segment
 from .registry import ParserRegistry
 
+logger = logging.getLogger(__name__)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _T, _TAB, _BR, _CR = f"{_W}p", f"{_W}t", f"{_W}tab", f"{_W}br", f"{_W}cr"
+_TC, _TR = f"{_W}tc", f"{_W}tr"
+
+_HEADER = re.compile(r"word/header\d*\.xml$")
+_FOOTER = re.compile(r"word/footer\d*\.xml$")
+
+# Paragraphs are batched into segments of about this many characters
+_BLOCK_CHARS = 16 * 1024
+
+
+def _iter_part(stream: IO[bytes]) -> Iterator[str]:
+    """
+    Yields the paragraphs of one WordprocessingML part in document order.
+
+    A table row is yielded as one line with its cells separated by " | ".
+    Finished elements are dropped as soon as they are read, so memory stays
+    bounded by the largest paragraph rather than the document size.
+    """
+    stack = []
+    runs: List[str] = []
+    # One list of paragraphs per open table cell, one list of cells per open row
+    cells: List[List[str]] = []
+    rows: List[List[str]] = []
+
+    for event, elem in iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == _TC:
+                cells.append([])
+            elif elem.tag == _TR:
+                rows.append([])
+            continue
+
+        stack.pop()
+        tag = elem.tag
+        if tag == _T:
+            runs.append(elem.text or "")
+        elif tag == _TAB:
+            runs.append("\t")
+        elif tag in (_BR, _CR):
+            runs.append("\n")
+        elif tag == _P:
+            text = "".join(runs)
+            runs = []
+            if cells:
+                cells[-1].append(text)
+            elif text.strip():
+                yield text
+        elif tag == _TC:
+            cell = "\n".join(p for p in cells.pop() if p.strip())
+            if rows:
+                rows[-1].append(cell)
+        elif tag == _TR:
+            row = rows.pop()
+            line = " | ".join(c for c in row if c)
+            if cells:
+                # Nested table: the row belongs to the enclosing cell
+                cells[-1].append(line)
+            elif line.strip():
+                yield line
+
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
 @ParserRegistry.register(".docx")
 @ParserRegistry.register(".doc")
 class DocxParser(BaseParser):
+    version = 3
+
     def parse(self, file_path: Path) -> str:
+        return "".join(text for text, _ in self.iter_parse(file_path))
+
+    def iter_parse(self, file_path: Path) -> Iterator[Segment]:
+        """
+        Streams paragraphs and table rows straight from the zip, without
+        building a document model.
+
+        Headers come first and footers last, each distinct text once.
+        """
         try:
-            doc = docx.Document(str(file_path))
-            paragraphs = [p.text for p in doc.paragraphs if p.text]
-            return "\n".join(paragraphs)
-        except Exception:
-            return ""
+            with zipfile.ZipFile(file_path) as archive:
+                names = archive.namelist()
+                parts = (
+                    sorted(n for n in names if _HEADER.match(n))
+                    + ["word/document.xml"]
+                    + sorted(n for n in names if _FOOTER.match(n))
+                )
+                yield from self._batch(self._iter_paragraphs(archive, parts))
+        except Exception as e:
+            # Fail the job rather than index (and cache) a truncated document
+            logger.error(f"Error parsing DOCX {file_path}: {e}")
+            raise
+
+    @staticmethod
+    def _iter_paragraphs(archive: zipfile.ZipFile, parts: List[str]) -> Iterator[str]:
+        seen_margins = set()
+        for name in parts:
+            is_body = name == "word/document.xml"
+            with archive.open(name) as stream:
+                for text in _iter_part(stream):
+                    if not is_body:
+                        # The same header/footer is usually repeated across sections
+                        if text in seen_margins:
+                            continue
+                        seen_margins.add(text)
+                    yield text
+
+    @staticmethod
+    def _batch(paragraphs: Iterator[str]) -> Iterator[Segment]:
+        block: List[str] = []
+        size = 0
+        first = True
+        for text in paragraphs:
+            block.append(text)
+            size += len(text) + 1
+            if size >= _BLOCK_CHARS:
+                yield ("" if first else "\n") + "\n".join(block), {}
+                first = False
+                block, size = [], 0
+        if block:
+            yield ("" if first else "\n") + "\n".join(block), {}
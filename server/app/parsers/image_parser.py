@@ -1,19 +1,46 @@
+import logging
 from pathlib import Path
-from PIL import Image
+from typing import Iterator
+from PIL import Image, ImageSequence
 import pytesseract
-from .base import BaseParser
+from .base import BaseParser, Segment
 from .registry import ParserRegistry
+from .ocr import ocr_images
+
+logger = logging.getLogger(__name__)
 
 @ParserRegistry.register(".jpg")
 @ParserRegistry.register(".jpeg")
 @ParserRegistry.register(".png")
+@ParserRegistry.register(".tif")
+@ParserRegistry.register(".tiff")
 class ImageParser(BaseParser):
+    version = 3
+
     def parse(self, file_path: Path) -> str:
+        return "".join(text for text, _ in self.iter_parse(file_path))
+
+    def iter_parse(self, file_path: Path) -> Iterator[Segment]:
+        """
+        OCRs every frame of the image; multi-page TIFFs yield one segment per
+        page with {"page": n} metadata.
+        """
         try:
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
-            return text
-        except ImportError:
-            return "OCR library (pytesseract) or Tesseract binary not found."
+            with Image.open(file_path) as image:
+                n_frames = getattr(image, "n_frames", 1)
+                # Frames are copied one at a time as the OCR pool asks for them
+                frames = (frame.copy() for frame in ImageSequence.Iterator(image))
+                first = True
+                for page_no, text in enumerate(ocr_images(frames), start=1):
+                    if not text:
+                        continue
+                    meta = {"page": page_no} if n_frames > 1 else {}
+                    yield (text if first else "\n" + text), meta
+                    first = False
+        except pytesseract.TesseractNotFoundError as e:
+            # Fail the job rather than index (and cache) the error as text
+            logger.error(f"Tesseract not available: {e}")
+            raise
         except Exception as e:
-            return f"Error processing image: {str(e)}"
+            logger.error(f"Error processing image {file_path}: {e}")
+            raise
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, Optional
+
+import pytesseract
+from PIL import Image, ImageOps
+
+from ..core.config import OCR_LANG, OCR_TARGET_DPI, OCR_WORKERS
+from . import text_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when preprocessing changes so cached OCR text is not reused
+OCR_VERSION = 1
+
+# Images without usable DPI metadata are scaled into this range (longest side, px)
+_MIN_SIDE = 1000
+_MAX_SIDE = 4200
+_SCALE_LIMITS = (0.5, 2.0)
+
+# Each tesseract process runs single-threaded; parallelism comes from the pool
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    return _executor
+
+
+def _otsu_threshold(image: Image.Image) -> int:
+    """Returns the grey level that best separates ink from background."""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg = weight_bg = 0
+    best, threshold = 0.0, 127
+    for level, count in enumerate(histogram):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += level * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold
+
+
+def preprocess(image: Image.Image) -> Image.Image:
+    """
+    Prepares an image for Tesseract: greyscale, rescaled towards
+    OCR_TARGET_DPI and binarized with Otsu's threshold.
+    """
+    dpi = image.info.get("dpi", (0, 0))[0]
+    longest = max(image.size)
+    if dpi and dpi >= 72:
+        scale = OCR_TARGET_DPI / dpi
+    elif longest > _MAX_SIDE:
+        scale = _MAX_SIDE / longest
+    elif longest < _MIN_SIDE:
+        scale = _MIN_SIDE / longest
+    else:
+        scale = 1.0
+    scale = min(max(scale, _SCALE_LIMITS[0]), _SCALE_LIMITS[1], _MAX_SIDE / longest)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparent areas become white rather than black
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image.convert("RGBA"))
+    gray = ImageOps.autocontrast(image.convert("L"))
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.LANCZOS)
+
+    threshold = _otsu_threshold(gray)
+    return gray.point(lambda v: 255 if v > threshold else 0, mode="1")
+
+
+def image_key(image: Image.Image) -> text_cache.CacheKey:
+    """Text cache key of an image's pixels under the current OCR settings."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest(), f"OCR:{OCR_LANG}:{OCR_TARGET_DPI}", OCR_VERSION
+
+
+def ocr_image(image: Image.Image, key: Optional[text_cache.CacheKey] = None) -> str:
+    """OCRs one image, reusing the cached text of identical pixels."""
+    key = key or image_key(image)
+    text = text_cache.get_text(key)
+    if text is not None:
+        return text
+
+    text = pytesseract.image_to_string(preprocess(image), lang=OCR_LANG).strip()
+    text_cache.put_text(key, text)
+    return text
+
+
+def ocr_images(images: Iterable[Image.Image]) -> Iterator[str]:
+    """
+    OCRs a batch of images on the Tesseract worker pool, yielding text in
+    input order.
+
+    At most 2 * OCR_WORKERS images are decoded ahead of the one being
+    returned, so multi-page TIFFs and large batches stay within bounded memory.
+    An image repeated within the batch reuses the first one's future, since
+    both would miss the text cache while it is still being OCRed.
+    """
+    executor = _get_executor()
+    pending: Deque[Future] = deque()
+    submitted: Dict[text_cache.CacheKey, Future] = {}
+    try:
+        for image in images:
+            key = image_key(image)
+            if key not in submitted:
+                submitted[key] = executor.submit(ocr_image, image, key)
+            pending.append(submitted[key])
+            if len(pending) >= 2 * OCR_WORKERS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
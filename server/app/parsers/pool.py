@@ -0,0 +1,394 @@
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import queue
+import resource
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set
+
+from ..core.config import (
+    PARSER_POOL_ENABLED,
+    PARSER_HEAVY_SLOTS,
+    PARSER_LIGHT_SLOTS,
+    PARSER_HEAVY_TIMEOUT_SECONDS,
+    PARSER_LIGHT_TIMEOUT_SECONDS,
+    PARSER_HEAVY_MAX_RSS_MB,
+    PARSER_LIGHT_MAX_RSS_MB,
+)
+from .base import Segment
+from .registry import ParserRegistry
+
+logger = logging.getLogger(__name__)
+
+# Exit code used by a worker that kills itself for exceeding its RSS budget
+_RSS_EXIT_CODE = 86
+_RSS_CHECK_INTERVAL = 0.5
+# How often a job waiting on its worker checks whether it was cancelled
+_CANCEL_CHECK_INTERVAL = 0.2
+
+# Marks the end of a streamed parse job
+_END = object()
+
+
+class ParseError(Exception):
+    """Raised when a file could not be parsed in the worker pool."""
+    pass
+
+
+class ParseTimeoutError(ParseError):
+    """Raised when a parse job exceeds its wall-clock budget."""
+    pass
+
+
+class ParseResourceError(ParseError):
+    """Raised when a parse job exceeds its memory budget."""
+    pass
+
+
+class ParseCancelledError(ParseError):
+    """Raised when a parse job is cancelled by its caller."""
+    pass
+
+
+# --- Worker process side ---
+
+def _statm_rss_bytes(pid) -> int:
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _descendant_pids() -> List[int]:
+    """PIDs of this process's children, grandchildren, ... (empty without procfs)."""
+    found: List[int] = []
+    pending = ["self"]
+    while pending:
+        pid = pending.pop()
+        for children in Path(f"/proc/{pid}/task").glob("*/children"):
+            try:
+                child_pids = [int(p) for p in children.read_text().split()]
+            except OSError:
+                continue
+            found.extend(child_pids)
+            pending.extend(child_pids)
+    return found
+
+
+def _current_rss_bytes() -> int:
+    """
+    RSS of this worker plus every process it started, such as the page and
+    transcription pools of the PDF and media parsers.
+    """
+    try:
+        rss = _statm_rss_bytes("self")
+    except OSError:
+        # No procfs (macOS): fall back to this process's peak RSS, reported in bytes there
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    for pid in _descendant_pids():
+        try:
+            rss += _statm_rss_bytes(pid)
+        except OSError:
+            pass  # Exited since it was listed
+    return rss
+
+
+def _exit_over_budget():
+    # Take the parser's own worker processes down too rather than orphan them
+    for pid in _descendant_pids():
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    os._exit(_RSS_EXIT_CODE)
+
+
+def _watch_rss(max_rss_bytes: int):
+    while True:
+        if _current_rss_bytes() > max_rss_bytes:
+            _exit_over_budget()
+        time.sleep(_RSS_CHECK_INTERVAL)
+
+
+def _worker_main(conn, max_rss_bytes: int):
+    """
+    Parses one file per request received on `conn` until told to stop.
+
+    Segments are sent back as soon as the parser yields them, followed by a
+    ("done",) or ("error", message) message.
+    """
+    if max_rss_bytes:
+        threading.Thread(target=_watch_rss, args=(max_rss_bytes,), daemon=True).start()
+
+    from ..core.config import LOG_LEVEL
+    from ..core.logging_config import setup_logging
+    from . import iter_segments_auto
+
+    setup_logging(LOG_LEVEL)
+
+    while True:
+        try:
+            path = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if path is None:
+            break
+        try:
+            for text, meta in iter_segments_auto(Path(path)):
+                conn.send(("segment", text, meta))
+        except Exception as e:
+            conn.send(("error", str(e)))
+            continue
+        # Jobs shorter than the watchdog interval are checked here
+        if max_rss_bytes and _current_rss_bytes() > max_rss_bytes:
+            _exit_over_budget()
+        conn.send(("done",))
+
+
+# --- API process side ---
+
+class _Worker:
+    """A persistent parser process; models stay loaded between jobs."""
+
+    def __init__(self, ctx, max_rss_bytes: int):
+        self.conn, child_conn = ctx.Pipe()
+        # Not a daemon: parsers may start their own worker processes
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, max_rss_bytes), daemon=False
+        )
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, timeout: float = 5.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class _SlotPool:
+    """Worker processes for one parser weight class."""
+
+    def __init__(self, name: str, slots: int, timeout: float, max_rss_mb: int):
+        self.name = name
+        self.slots = max(1, slots)
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._busy: Set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(self.slots)
+
+    def stream(
+        self, file_path: Path, cancelled: Optional[threading.Event] = None
+    ) -> Iterator[Segment]:
+        """
+        Parses `file_path` in a worker, yielding segments as they arrive.
+
+        A reader thread drains the worker into a queue, so the wall-clock
+        budget covers parsing only and not how fast the caller consumes.
+        Setting `cancelled` kills the worker mid-parse; the stream then
+        raises ParseCancelledError.
+        """
+        results: queue.Queue = queue.Queue()
+        threading.Thread(
+            target=self._run_job, args=(file_path, results, cancelled), daemon=True
+        ).start()
+        while True:
+            item = results.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def run(self, file_path: Path) -> str:
+        """Parses `file_path` in a worker, blocking until a slot is free."""
+        return "".join(text for text, _ in self.stream(file_path))
+
+    def _run_job(self, file_path: Path, results: queue.Queue, cancelled: Optional[threading.Event]):
+        try:
+            with self._semaphore:
+                if cancelled is not None and cancelled.is_set():
+                    raise ParseCancelledError(f"Parsing {file_path.name} was cancelled")
+                with self._lock:
+                    worker = self._idle.pop() if self._idle else None
+                if worker is None or not worker.process.is_alive():
+                    worker = _Worker(self._ctx, self.max_rss_bytes)
+
+                with self._lock:
+                    self._busy.add(worker)
+                try:
+                    error = self._call(worker, file_path, results.put, cancelled)
+                except BaseException:
+                    worker.kill()
+                    raise
+                finally:
+                    with self._lock:
+                        self._busy.discard(worker)
+
+                with self._lock:
+                    self._idle.append(worker)
+
+            if error is not None:
+                raise ParseError(error)
+        except Exception as e:
+            results.put(e)
+        else:
+            results.put(_END)
+
+    def _call(
+        self, worker: _Worker, file_path: Path, emit, cancelled: Optional[threading.Event] = None
+    ) -> Optional[str]:
+        """Runs one job on `worker`; returns the parser's error message, if any."""
+        deadline = time.monotonic() + self.timeout
+        worker.conn.send(str(file_path))
+        while True:
+            # Raising makes the caller kill the worker, the only way to stop a parser mid-file
+            if cancelled is not None and cancelled.is_set():
+                raise ParseCancelledError(f"Parsing {file_path.name} was cancelled")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ParseTimeoutError(
+                    f"Parsing {file_path.name} exceeded {self.timeout:.0f}s ({self.name} parser budget)"
+                )
+            if not worker.conn.poll(min(remaining, _CANCEL_CHECK_INTERVAL)):
+                continue
+            try:
+                message = worker.conn.recv()
+            except (EOFError, ConnectionResetError):
+                # A worker killed mid-send resets the pipe instead of closing it
+                worker.process.join(1.0)
+                if worker.process.exitcode == _RSS_EXIT_CODE:
+                    raise ParseResourceError(
+                        f"Parsing {file_path.name} exceeded {self.max_rss_bytes // (1024 * 1024)}MB "
+                        f"({self.name} parser budget)"
+                    )
+                raise ParseError(
+                    f"Parser process for {file_path.name} died (exit code {worker.process.exitcode})"
+                )
+
+            if message[0] == "segment":
+                emit((message[1], message[2]))
+            elif message[0] == "done":
+                return None
+            else:
+                return message[1]
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            busy = list(self._busy)
+        for worker in idle:
+            worker.stop()
+        for worker in busy:
+            worker.kill()
+
+
+class ParserPool:
+    """
+    Runs parsers out of process so that blocking extraction (PyPDF2, Tesseract,
+    Whisper) never stalls the API event loop.
+
+    Each weight class ("heavy" for audio/video, "light" for everything else)
+    has its own slot count, per-job wall-clock timeout and RSS limit. A worker
+    that times out or exceeds its memory budget is killed and replaced.
+    """
+
+    def __init__(self):
+        self._pools: Dict[str, _SlotPool] = {
+            "heavy": _SlotPool(
+                "heavy", PARSER_HEAVY_SLOTS, PARSER_HEAVY_TIMEOUT_SECONDS, PARSER_HEAVY_MAX_RSS_MB
+            ),
+            "light": _SlotPool(
+                "light", PARSER_LIGHT_SLOTS, PARSER_LIGHT_TIMEOUT_SECONDS, PARSER_LIGHT_MAX_RSS_MB
+            ),
+        }
+        # Runs at exit before multiprocessing joins its non-daemon children,
+        # which would otherwise wait forever on idle workers
+        multiprocessing.util.Finalize(self, self.shutdown, exitpriority=10)
+
+    def _pool_for(self, file_path: Path) -> Optional[_SlotPool]:
+        parser = ParserRegistry.get_parser(file_path)
+        if parser is None:
+            return None
+        return self._pools.get(parser.weight, self._pools["light"])
+
+    def extract_text(self, file_path: Path) -> str:
+        """Blocking parse of `file_path` in the matching worker pool."""
+        pool = self._pool_for(file_path)
+        return pool.run(file_path) if pool else ""
+
+    def iter_segments(
+        self, file_path: Path, cancelled: Optional[threading.Event] = None
+    ) -> Iterator[Segment]:
+        """
+        Blocking, incremental parse of `file_path` in the matching worker pool.
+
+        Setting `cancelled` stops the parse by killing its worker.
+        """
+        pool = self._pool_for(file_path)
+        if pool:
+            yield from pool.stream(file_path, cancelled)
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown()
+
+
+parser_pool = ParserPool()
+
+
+async def extract_text_async(file_path: Path) -> str:
+    """
+    Extracts text without blocking the event loop.
+
+    Uses the parser process pool, or a thread when THINKBOOK_PARSER_POOL_ENABLED
+    is false.
+    """
+    if not PARSER_POOL_ENABLED:
+        from . import extract_text_auto
+
+        return await asyncio.to_thread(extract_text_auto, file_path)
+    return await asyncio.to_thread(parser_pool.extract_text, file_path)
+
+
+async def iter_segments_async(file_path: Path) -> AsyncIterator[Segment]:
+    """
+    Yields (text, metadata) segments as the parser produces them, without
+    blocking the event loop.
+
+    Stopping early (e.g. cancelling the consuming task) kills the worker
+    process still parsing the file. Without the pool the parser thread
+    cannot be stopped and runs until it finishes the file.
+    """
+    cancelled = threading.Event()
+    if PARSER_POOL_ENABLED:
+        segments = parser_pool.iter_segments(file_path, cancelled)
+    else:
+        from . import iter_segments_auto
+
+        segments = iter_segments_auto(file_path)
+
+    try:
+        while True:
+            segment = await asyncio.to_thread(next, segments, None)
+            if segment is None:
+                return
+            yield segment
+    finally:
+        cancelled.set()
@@ -1,7 +1,8 @@
+import importlib
 import logging
 import mimetypes
 from pathlib import Path
-from typing import Dict, Type, Optional
+from typing import Dict, Iterable, Type, Optional
 from .base import BaseParser
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,8 @@ class ParserRegistry:
     """Registry to manage and retrieve parsers based on file extensions/mimetypes."""
     
     _parsers: Dict[str, Type[BaseParser]] = {}
+    # Extension -> parser module imported on first use (e.g. ".audio_parser")
+    _lazy: Dict[str, str] = {}
 
     @classmethod
     def register(cls, extension: str):
@@ -19,6 +22,31 @@ class ParserRegistry:
             return parser_cls
         return wrapper
 
+    @classmethod
+    def register_lazy(cls, extensions: Iterable[str], module: str):
+        """
+        Registers extensions against a parser module without importing it.
+
+        The module is imported the first time one of its extensions is looked
+        up; its @register decorators then replace the lazy entries.
+        """
+        for extension in extensions:
+            cls._lazy[extension.lower()] = module
+
+    @classmethod
+    def get_parser_class(cls, extension: str) -> Optional[Type[BaseParser]]:
+        """Returns the parser class for an extension, importing its module if needed."""
+        ext = extension.lower()
+        parser_cls = cls._parsers.get(ext)
+        if parser_cls is None and ext in cls._lazy:
+            module = cls._lazy[ext]
+            logger.debug(f"Loading parser module {module} for {ext}")
+            importlib.import_module(module, package=__package__)
+            parser_cls = cls._parsers.get(ext)
+            if parser_cls is None:
+                logger.error(f"Parser module {module} did not register {ext}")
+        return parser_cls
+
     @classmethod
     def get_parser(cls, file_path: Path) -> Optional[BaseParser]:
         """
@@ -31,7 +59,7 @@ class ParserRegistry:
             Optional[BaseParser]: An instance of the matching parser, or None if not found.
         """
         ext = file_path.suffix.lower()
-        parser_cls = cls._parsers.get(ext)
+        parser_cls = cls.get_parser_class(ext)
         
         if not parser_cls:
             logger.warning(f"No parser registered for extension: {ext}")
@@ -41,4 +69,4 @@ class ParserRegistry:
 
     @classmethod
     def supported_extensions(cls):
-        return list(cls._parsers.keys())
+        return list(dict.fromkeys([*cls._parsers, *cls._lazy]))
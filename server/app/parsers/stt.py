@@ -0,0 +1,114 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Type
+
+import numpy as np
+
+from ..core.config import STT_BACKEND, STT_COMPUTE_TYPE, WHISPER_MODEL
+
+logger = logging.getLogger(__name__)
+
+# faster-whisper is optional; the backend is chosen by THINKBOOK_STT_BACKEND and
+# FasterWhisperBackend raises if it is selected without the package installed
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+
+class STTBackend(ABC):
+    """Transcribes 16 kHz mono float32 audio to text."""
+
+    name = ""
+
+    def __init__(self, model_name: str = WHISPER_MODEL, threads: int = 0):
+        self.model_name = model_name
+        self.threads = threads
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray) -> str:
+        """
+        Transcribe an audio buffer.
+
+        Args:
+            audio (np.ndarray): 16 kHz mono float32 samples in [-1, 1].
+
+        Returns:
+            str: The transcript, stripped of surrounding whitespace.
+        """
+        pass
+
+
+class WhisperBackend(STTBackend):
+    """openai-whisper on PyTorch, fp32 on CPU."""
+
+    name = "whisper"
+
+    def __init__(self, model_name: str = WHISPER_MODEL, threads: int = 0):
+        super().__init__(model_name, threads)
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        logger.info(f"Loading Whisper model ({model_name})...")
+        self.model = whisper.load_model(model_name)
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        result = self.model.transcribe(audio, fp16=False)
+        return result.get("text", "").strip()
+
+
+class FasterWhisperBackend(STTBackend):
+    """faster-whisper on CTranslate2, int8-quantized on CPU by default."""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name: str = WHISPER_MODEL, threads: int = 0):
+        super().__init__(model_name, threads)
+        if not FASTER_WHISPER_AVAILABLE:
+            raise RuntimeError("faster-whisper is not installed. Install with: pip install faster-whisper")
+        logger.info(f"Loading faster-whisper model ({model_name}, {STT_COMPUTE_TYPE})...")
+        self.model = WhisperModel(
+            model_name, device="cpu", compute_type=STT_COMPUTE_TYPE, cpu_threads=threads
+        )
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        segments, _ = self.model.transcribe(audio, beam_size=5)
+        # Segments are decoded lazily as the generator is consumed
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+BACKENDS: Dict[str, Type[STTBackend]] = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+# One loaded model per backend and process, shared by all parser instances
+_backends: Dict[str, STTBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_stt_backend(name: Optional[str] = None, threads: int = 0) -> STTBackend:
+    """
+    Returns the cached speech-to-text backend, loading its model on first use.
+
+    Args:
+        name: Backend name ("whisper" or "faster-whisper"); defaults to
+            THINKBOOK_STT_BACKEND.
+        threads: CPU threads for inference on first load (0 = library default).
+    """
+    name = name or STT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech-to-text backend: {name}. Choose from: {', '.join(BACKENDS)}")
+
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                backend = BACKENDS[name](threads=threads)
+                _backends[name] = backend
+    return backend
@@ -0,0 +1,471 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from ..core.config import TEXT_CACHE_PATH, TEXT_CACHE_MAX_MB
+from ..core.utils import hash_file
+from .base import Segment
+from .pool import iter_segments_async
+from .registry import ParserRegistry
+
+logger = logging.getLogger(__name__)
+
+# Text is stored as zlib-compressed segments so that large transcripts do not
+# have to be written (or later read) as a single blob.
+_SEGMENT_CHARS = 64 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS texts (
+    sha256 TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    chars INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (sha256, parser, version)
+);
+CREATE TABLE IF NOT EXISTS segments (
+    sha256 TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (sha256, parser, version, seq)
+);
+CREATE TABLE IF NOT EXISTS marks (
+    sha256 TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    PRIMARY KEY (sha256, parser, version, offset)
+);
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS texts_accessed ON texts (accessed_at);
+"""
+
+# (sha256, parser name, parser version)
+CacheKey = Tuple[str, str, int]
+
+# (character offset, metadata) of a parser segment that carries metadata
+Mark = Tuple[int, Dict]
+
+_initialized = False
+
+
+def _connect(check_same_thread: bool = True) -> sqlite3.Connection:
+    global _initialized
+    if not _initialized:
+        TEXT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(TEXT_CACHE_PATH), timeout=30, check_same_thread=check_same_thread)
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized = True
+    return conn
+
+
+def parser_key(file_path: Path) -> Optional[Tuple[str, int]]:
+    """Returns (parser name, parser version) for a file, or None if unsupported."""
+    parser = ParserRegistry.get_parser(file_path)
+    if parser is None:
+        return None
+    return type(parser).__name__, parser.version
+
+
+def get_text(key: CacheKey) -> Optional[str]:
+    """Returns cached text for a key, or None on a miss."""
+    conn = _connect()
+    try:
+        with conn:
+            updated = conn.execute(
+                "UPDATE texts SET accessed_at = ? WHERE sha256 = ? AND parser = ? AND version = ?",
+                (time.time(), *key),
+            ).rowcount
+            if not updated:
+                return None
+            rows = conn.execute(
+                "SELECT data FROM segments WHERE sha256 = ? AND parser = ? AND version = ? ORDER BY seq",
+                key,
+            ).fetchall()
+        return "".join(zlib.decompress(r[0]).decode("utf-8") for r in rows)
+    finally:
+        conn.close()
+
+
+def text_length(key: CacheKey) -> Optional[int]:
+    """Returns the cached text length in characters, or None on a miss."""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE texts SET accessed_at = ? WHERE sha256 = ? AND parser = ? AND version = ?",
+                (time.time(), *key),
+            )
+            row = conn.execute(
+                "SELECT chars FROM texts WHERE sha256 = ? AND parser = ? AND version = ?", key
+            ).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def iter_range(key: CacheKey, offset: int, length: int) -> Iterator[str]:
+    """
+    Yields the cached text in [offset, offset + length) one segment at a time.
+
+    Only the segments overlapping the range are read and decompressed.
+    """
+    end = offset + length
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT start, data FROM segments "
+            "WHERE sha256 = ? AND parser = ? AND version = ? AND start < ? AND start + ? > ? "
+            "ORDER BY seq",
+            (*key, end, _SEGMENT_CHARS, offset),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    for start, data in rows:
+        segment = zlib.decompress(data).decode("utf-8")
+        yield segment[max(offset - start, 0) : end - start]
+
+
+def iter_segments(key: CacheKey) -> Iterator[Segment]:
+    """
+    Replays cached text as the (text, metadata) segments the parser produced.
+
+    Segments with metadata are rebuilt exactly from the stored marks. Text
+    without metadata is yielded one storage segment at a time, so replaying
+    a very large file does not load it at once.
+    """
+    conn = _connect(check_same_thread=False)
+    try:
+        marks = [
+            (offset, json.loads(meta))
+            for offset, meta in conn.execute(
+                "SELECT offset, meta FROM marks WHERE sha256 = ? AND parser = ? AND version = ? "
+                "ORDER BY offset",
+                key,
+            )
+        ]
+        rows = conn.execute(
+            "SELECT start, data FROM segments WHERE sha256 = ? AND parser = ? AND version = ? ORDER BY seq",
+            key,
+        )
+
+        pending: List[str] = []
+        meta: Dict = {}
+        m = 0
+        for start, data in rows:
+            chunk = zlib.decompress(data).decode("utf-8")
+            pos = 0
+            while m < len(marks) and marks[m][0] < start + len(chunk):
+                cut = marks[m][0] - start
+                pending.append(chunk[pos:cut])
+                if "".join(pending):
+                    yield "".join(pending), meta
+                pending, pos, meta = [], cut, marks[m][1]
+                m += 1
+            pending.append(chunk[pos:])
+            if not meta:
+                yield "".join(pending), meta
+                pending = []
+        if "".join(pending):
+            yield "".join(pending), meta
+    finally:
+        conn.close()
+
+
+class TextWriter:
+    """
+    Writes extracted text to the cache incrementally, so a document never has
+    to be held in memory as a whole.
+
+    Compressed segments are inserted as soon as they fill up; the entry only
+    becomes visible to readers on commit().
+    """
+
+    def __init__(self, key: CacheKey, marks: Optional[List[Mark]] = None):
+        self.key = key
+        self.chars = 0
+        self.has_text = False
+        self._marks: List[Mark] = list(marks or [])
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._flushed = 0
+        self._seq = 0
+        self._stored_bytes = 0
+
+    def write(self, text: str, meta: Optional[Dict] = None):
+        """Appends a parser segment; segments with metadata are marked for replay."""
+        if meta:
+            self._marks.append((self.chars, meta))
+        self.chars += len(text)
+        self.has_text = self.has_text or bool(text.strip())
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= _SEGMENT_CHARS:
+            self._flush(final=False)
+
+    def _flush(self, final: bool):
+        data = "".join(self._buffer)
+        cut = len(data) if final else len(data) - len(data) % _SEGMENT_CHARS
+        rows = []
+        for start in range(0, cut, _SEGMENT_CHARS):
+            blob = zlib.compress(data[start : start + _SEGMENT_CHARS].encode("utf-8"))
+            rows.append((*self.key, self._seq, self._flushed + start, blob))
+            self._seq += 1
+            self._stored_bytes += len(blob)
+        if rows:
+            conn = _connect()
+            try:
+                with conn:
+                    # Identical content written concurrently produces identical rows
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO segments (sha256, parser, version, seq, start, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+            finally:
+                conn.close()
+        self._flushed += cut
+        rest = data[cut:]
+        self._buffer = [rest] if rest else []
+        self._buffered = len(rest)
+
+    def commit(self):
+        """Makes the entry visible and evicts old entries if over budget."""
+        self._flush(final=True)
+        now = time.time()
+        conn = _connect()
+        try:
+            with conn:
+                # Drop leftovers of a longer text previously stored under this key
+                conn.execute(
+                    "DELETE FROM segments WHERE sha256 = ? AND parser = ? AND version = ? AND seq >= ?",
+                    (*self.key, self._seq),
+                )
+                conn.execute("DELETE FROM marks WHERE sha256 = ? AND parser = ? AND version = ?", self.key)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO marks VALUES (?, ?, ?, ?, ?)",
+                    [(*self.key, offset, json.dumps(meta)) for offset, meta in self._marks],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*self.key, self.chars, self._stored_bytes, now, now),
+                )
+            _evict(conn, TEXT_CACHE_MAX_MB * 1024 * 1024)
+        finally:
+            conn.close()
+
+    def abort(self):
+        """Removes the segments written so far unless the entry was committed elsewhere."""
+        conn = _connect()
+        try:
+            with conn:
+                committed = conn.execute(
+                    "SELECT 1 FROM texts WHERE sha256 = ? AND parser = ? AND version = ?", self.key
+                ).fetchone()
+                if not committed:
+                    conn.execute(
+                        "DELETE FROM segments WHERE sha256 = ? AND parser = ? AND version = ?", self.key
+                    )
+        finally:
+            conn.close()
+
+
+def put_text(key: CacheKey, text: str, marks: Optional[List[Mark]] = None):
+    """
+    Stores extracted text under a key and evicts old entries if over budget.
+
+    Args:
+        key: Cache key of the text.
+        text: Full extracted text.
+        marks: Offsets where parser segments with metadata start, so that
+            iter_segments() can replay them.
+    """
+    writer = TextWriter(key, marks)
+    writer.write(text)
+    writer.commit()
+
+
+def bind_file(name: str, key: CacheKey):
+    """Records which cache entry holds the text of an uploaded file."""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (name, *key))
+    finally:
+        conn.close()
+
+
+def lookup_file(name: str) -> Optional[CacheKey]:
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT sha256, parser, version FROM files WHERE name = ?", (name,)
+        ).fetchone()
+        return tuple(row) if row else None
+    finally:
+        conn.close()
+
+
+def invalidate_file(name: str):
+    """
+    Forgets a deleted file. Its cached text is dropped as well unless another
+    file with identical content still references it.
+    """
+    conn = _connect()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT sha256, parser, version FROM files WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+            still_used = conn.execute(
+                "SELECT 1 FROM files WHERE sha256 = ? AND parser = ? AND version = ? LIMIT 1", row
+            ).fetchone()
+            if not still_used:
+                _delete_entry(conn, row)
+        logger.info(f"Text cache invalidated for {name}")
+    finally:
+        conn.close()
+
+
+def _delete_entry(conn: sqlite3.Connection, key: CacheKey):
+    conn.execute("DELETE FROM segments WHERE sha256 = ? AND parser = ? AND version = ?", key)
+    conn.execute("DELETE FROM marks WHERE sha256 = ? AND parser = ? AND version = ?", key)
+    conn.execute("DELETE FROM texts WHERE sha256 = ? AND parser = ? AND version = ?", key)
+
+
+def _evict(conn: sqlite3.Connection, max_bytes: int):
+    """Drops least recently used entries until the cache fits in max_bytes."""
+    total = conn.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM texts").fetchone()[0]
+    if total <= max_bytes:
+        return
+    with conn:
+        for sha256, parser, version, stored_bytes in conn.execute(
+            "SELECT sha256, parser, version, stored_bytes FROM texts ORDER BY accessed_at"
+        ).fetchall():
+            if total <= max_bytes:
+                break
+            _delete_entry(conn, (sha256, parser, version))
+            total -= stored_bytes
+            logger.info(f"Evicted cached text {sha256[:12]} ({parser} v{version})")
+
+
+async def _resolve_key(file_path: Path, sha256: Optional[str]) -> Optional[CacheKey]:
+    pkey = parser_key(file_path)
+    if pkey is None:
+        return None
+    if sha256 is None:
+        # Known files skip re-hashing; a parser version bump still misses
+        bound = await asyncio.to_thread(lookup_file, file_path.name)
+        sha256 = bound[0] if bound else await asyncio.to_thread(hash_file, file_path)
+    return (sha256, *pkey)
+
+
+async def ensure_cached(file_path: Path) -> Optional[Tuple[CacheKey, int]]:
+    """
+    Makes sure an uploaded file's text is cached without loading it as a whole.
+
+    Returns:
+        (cache key, text length), or None if no text could be extracted.
+    """
+    key = await _resolve_key(file_path, None)
+    if key is None:
+        return None
+    length = await asyncio.to_thread(text_length, key)
+    if length is None:
+        length = 0
+        async for text, _ in cached_extract_segments(file_path, sha256=key[0]):
+            length += len(text)
+        if await asyncio.to_thread(text_length, key) is None:
+            return None
+    return key, length
+
+
+async def cached_extract_text(file_path: Path, sha256: Optional[str] = None) -> str:
+    """
+    Returns the extracted text of an uploaded file, parsing it only on a cache miss.
+
+    Args:
+        file_path: Path of the uploaded file.
+        sha256: Content hash if already known (e.g. computed during upload).
+    """
+    key = await _resolve_key(file_path, sha256)
+    if key is None:
+        return ""
+
+    text = await asyncio.to_thread(get_text, key)
+    if text is not None:
+        logger.info(f"Text cache hit for {file_path.name}")
+        await asyncio.to_thread(bind_file, file_path.name, key)
+        return text
+    return "".join([t async for t, _ in cached_extract_segments(file_path, sha256=key[0])])
+
+
+async def cached_extract_segments(
+    file_path: Path, sha256: Optional[str] = None
+) -> AsyncIterator[Segment]:
+    """
+    Yields the (text, metadata) segments of an uploaded file as they become
+    available.
+
+    On a cache hit the stored segments are replayed; on a miss they are
+    streamed from the parser pool and written to the cache as they arrive,
+    becoming visible once parsing completes.
+
+    Args:
+        file_path: Path of the uploaded file.
+        sha256: Content hash if already known (e.g. computed during upload).
+    """
+    name = file_path.name
+    key = await _resolve_key(file_path, sha256)
+    if key is None:
+        return
+
+    if await asyncio.to_thread(text_length, key) is not None:
+        logger.info(f"Text cache hit for {name}")
+        await asyncio.to_thread(bind_file, name, key)
+        segments = iter_segments(key)
+        try:
+            while True:
+                segment = await asyncio.to_thread(next, segments, None)
+                if segment is None:
+                    return
+                yield segment
+        finally:
+            segments.close()
+
+    writer = TextWriter(key)
+    committed = False
+    try:
+        async for text, meta in iter_segments_async(file_path):
+            await asyncio.to_thread(writer.write, text, meta)
+            yield text, meta
+
+        if writer.has_text:
+            await asyncio.to_thread(writer.commit)
+            await asyncio.to_thread(bind_file, name, key)
+            committed = True
+    finally:
+        if not committed:
+            await asyncio.to_thread(writer.abort)
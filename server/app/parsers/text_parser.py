@@ -1,10 +1,19 @@
 from pathlib import Path
-from .base import BaseParser
+from typing import Iterator
+from .base import BaseParser, Segment
 from .registry import ParserRegistry
-from ..core.utils import read_file_text
+from ..core.utils import read_file_text, iter_file_text
 
 @ParserRegistry.register(".txt")
 @ParserRegistry.register(".md")
 class TextParser(BaseParser):
     def parse(self, file_path: Path) -> str:
         return read_file_text(file_path)
+
+    def iter_parse(self, file_path: Path) -> Iterator[Segment]:
+        """Streams the file in memory-mapped windows so large logs use constant memory."""
+        try:
+            for text in iter_file_text(file_path):
+                yield text, {}
+        except Exception:
+            return
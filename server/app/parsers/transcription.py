@@ -0,0 +1,162 @@
+import atexit
+import logging
+import multiprocessing
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from ..core.config import WHISPER_SEGMENT_SECONDS, WHISPER_WORKERS
+from .base import Segment
+from .stt import get_stt_backend
+
+logger = logging.getLogger(__name__)
+
+# Whisper models expect 16 kHz mono input
+SAMPLE_RATE = 16000
+
+# Window boundaries move to the quietest 100ms frame within this many seconds
+_SNAP_SECONDS = 3.0
+_FRAME_SECONDS = 0.1
+
+# Process pool used when WHISPER_WORKERS > 1
+_executor = None
+
+
+class NoAudioError(Exception):
+    """Raised when a media file has no audio stream."""
+    pass
+
+
+def read_audio(file_path: Path) -> np.ndarray:
+    """
+    Decodes the audio track of any ffmpeg-readable file to 16 kHz mono float32.
+
+    PCM is read from an ffmpeg pipe straight into memory, so no intermediate
+    WAV file is written. Video streams are skipped without being decoded.
+
+    Raises:
+        NoAudioError: If the file has no audio stream.
+        RuntimeError: If ffmpeg fails to decode the file.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", str(file_path),
+        "-vn", "-sn", "-dn",
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-",
+    ]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        # Both pipes are drained together: a damaged file can log an error per
+        # frame, and ffmpeg blocks once the stderr pipe buffer is full
+        pcm, stderr = proc.communicate()
+    stderr = stderr.decode("utf-8", "replace")
+
+    if proc.returncode != 0:
+        if "does not contain any stream" in stderr or "matches no streams" in stderr:
+            raise NoAudioError(f"{file_path.name} has no audio track")
+        raise RuntimeError(f"ffmpeg failed to decode {file_path.name}: {stderr.strip()}")
+    if not pcm:
+        raise NoAudioError(f"{file_path.name} has no audio track")
+
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def split_audio(
+    audio: np.ndarray,
+    window_seconds: float = WHISPER_SEGMENT_SECONDS,
+    snap_seconds: float = _SNAP_SECONDS,
+) -> List[Tuple[int, int]]:
+    """
+    Splits 16 kHz mono audio into [start, end) sample ranges of roughly
+    `window_seconds`, cutting at the lowest-energy frame near each boundary so
+    words are not split between windows.
+    """
+    n = len(audio)
+    window = int(window_seconds * SAMPLE_RATE)
+    frame = int(_FRAME_SECONDS * SAMPLE_RATE)
+    snap = min(int(snap_seconds * SAMPLE_RATE), window // 4)
+    if window <= 0 or n <= window + window // 2:
+        return [(0, n)] if n else []
+
+    ranges = []
+    start = 0
+    # The last window absorbs any remainder shorter than half a window
+    while n - start > window + window // 2:
+        lo = start + window - snap
+        hi = start + window + snap
+        frames = (hi - lo) // frame
+        if frames > 0:
+            energy = np.square(audio[lo : lo + frames * frame]).reshape(frames, frame).mean(axis=1)
+            cut = lo + int(np.argmin(energy)) * frame + frame // 2
+        else:
+            cut = start + window
+        ranges.append((start, cut))
+        start = cut
+    ranges.append((start, n))
+    return ranges
+
+
+def _init_worker(threads: int):
+    get_stt_backend(threads=threads)
+
+
+def _transcribe(audio: np.ndarray) -> str:
+    return get_stt_backend().transcribe(audio)
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """Returns the transcription process pool, kept between files so models stay loaded."""
+    global _executor
+    if _executor is None:
+        threads = max(1, (multiprocessing.cpu_count() or 1) // workers)
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+        atexit.register(_executor.shutdown, cancel_futures=True)
+    return _executor
+
+
+def transcribe_segments(audio: np.ndarray) -> Iterator[Segment]:
+    """
+    Transcribes 16 kHz mono audio window by window, yielding
+    (text, {"start": seconds, "end": seconds}) in order as windows finish.
+
+    Windows are transcribed concurrently on WHISPER_WORKERS processes, each
+    holding its own copy of the speech-to-text model.
+    """
+    global _executor
+    ranges = split_audio(audio)
+    futures = []
+    if WHISPER_WORKERS < 2 or len(ranges) < 2:
+        texts = (_transcribe(audio[start:end]) for start, end in ranges)
+    else:
+        logger.info(f"Transcribing {len(ranges)} audio segments on {WHISPER_WORKERS} processes")
+        futures = [
+            _get_executor(WHISPER_WORKERS).submit(_transcribe, audio[start:end])
+            for start, end in ranges
+        ]
+        texts = (future.result() for future in futures)
+
+    try:
+        first = True
+        for (start, end), text in zip(ranges, texts):
+            if not text:
+                continue
+            meta = {"start": round(start / SAMPLE_RATE, 2), "end": round(end / SAMPLE_RATE, 2)}
+            yield (text if first else " " + text), meta
+            first = False
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start fresh for the next file
+        _executor = None
+        raise
+    finally:
+        # The caller may stop early (job cancelled, parse budget exceeded)
+        for future in futures:
+            future.cancel()
@@ -1,10 +1,9 @@
 import logging
-import os
 from pathlib import Path
-from moviepy import VideoFileClip
-from .base import BaseParser
+from typing import Iterator
+from .base import BaseParser, Segment
 from .registry import ParserRegistry
-from .audio_parser import get_whisper_model
+from .transcription import NoAudioError, read_audio, transcribe_segments
 
 logger = logging.getLogger(__name__)
 
@@ -13,29 +12,28 @@ logger = logging.getLogger(__name__)
 @ParserRegistry.register(".avi")
 @ParserRegistry.register(".mkv")
 class VideoParser(BaseParser):
+    weight = "heavy"
+    version = 3
+
     def parse(self, file_path: Path) -> str:
-        temp_audio_path = file_path.with_suffix(".temp.wav")
+        return "".join(text for text, _ in self.iter_parse(file_path))
+
+    def iter_parse(self, file_path: Path) -> Iterator[Segment]:
+        """Yields transcript segments of the audio track with {"start", "end"} timestamps."""
         try:
-            # Extract audio
-            video = VideoFileClip(str(file_path))
-            if not video.audio:
-                return "Video has no audio track."
-            
+            # Extract audio through an ffmpeg pipe; nothing is written to disk
             logger.info(f"Extracting audio from video {file_path}...")
-            video.audio.write_audiofile(str(temp_audio_path), verbose=False, logger=None)
-            video.close() # Close to release file handle
-
-            # Transcribe using shared Whisper model
-            model = get_whisper_model()
-            result = model.transcribe(str(temp_audio_path))
-            text = result.get("text", "")
-            
-            return text
+            audio = read_audio(file_path)
+        except NoAudioError:
+            yield "Video has no audio track.", {}
+            return
+        except Exception as e:
+            # Fail the job rather than index (and cache) the error as text
+            logger.error(f"Error processing video {file_path}: {e}")
+            raise
 
+        try:
+            yield from transcribe_segments(audio)
         except Exception as e:
             logger.error(f"Error processing video {file_path}: {e}")
-            return f"Error processing video: {str(e)}"
-        finally:
-            # Cleanup temp file
-            if temp_audio_path.exists():
-                temp_audio_path.unlink()
+            raise
@@ -0,0 +1,227 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import CATALOG_PATH, QDRANT_DIR
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    sha256 TEXT,
+    size_bytes INTEGER,
+    parser TEXT,
+    parser_version INTEGER,
+    ingested_at REAL,
+    updated_at REAL NOT NULL
+);
+-- When files were last removed, so a recount taken earlier does not bring them back
+CREATE TABLE IF NOT EXISTS removed (
+    name TEXT PRIMARY KEY,
+    removed_at REAL NOT NULL
+);
+"""
+
+_COLUMNS = ("name", "chunks", "sha256", "size_bytes", "parser", "parser_version", "ingested_at", "updated_at")
+
+# Registry written by earlier versions, imported once into an empty catalog
+_LEGACY_REGISTRY_PATH = QDRANT_DIR / "file_registry.json"
+
+
+class Catalog:
+    """
+    Per-file metadata of the indexed documents: chunk counts, content hash,
+    size, parser and ingest time.
+
+    Rows live in SQLite (WAL mode), so every update is one small atomic
+    transaction and concurrent workers never lose each other's counts. Reads
+    are served from an in-process copy of the table that is reloaded only
+    after a write, from this process or (via PRAGMA data_version) another.
+    """
+
+    def __init__(self, path: Path = CATALOG_PATH, legacy_registry: Optional[Path] = _LEGACY_REGISTRY_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._rows: Optional[Dict[str, Dict[str, Any]]] = None
+        self._data_version: Optional[int] = None
+        if legacy_registry is not None:
+            self._migrate(Path(legacy_registry))
+
+    # --- Reads ---
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Returns the catalog entry of a file, or None if it is not indexed."""
+        with self._lock:
+            row = self._load().get(name)
+            return dict(row) if row else None
+
+    def list_files(self) -> List[Dict[str, Any]]:
+        """All catalog entries, in name order."""
+        with self._lock:
+            return [dict(row) for row in self._load().values()]
+
+    def counts(self) -> Dict[str, int]:
+        """Chunk count per file."""
+        with self._lock:
+            return {name: row["chunks"] for name, row in self._load().items()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    # --- Updates ---
+
+    def add_chunks(self, name: str, count: int):
+        """Adds count chunks to a file, creating its entry if needed."""
+        self._write(
+            "INSERT INTO files (name, chunks, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET chunks = chunks + excluded.chunks, updated_at = excluded.updated_at",
+            (name, count, time.time()),
+        )
+
+    def record_ingest(
+        self,
+        name: str,
+        sha256: Optional[str] = None,
+        size_bytes: Optional[int] = None,
+        parser: Optional[str] = None,
+        parser_version: Optional[int] = None,
+    ):
+        """Records the source file details of a completed ingestion."""
+        now = time.time()
+        self._write(
+            "INSERT INTO files (name, sha256, size_bytes, parser, parser_version, ingested_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET sha256 = excluded.sha256, size_bytes = excluded.size_bytes, "
+            "parser = excluded.parser, parser_version = excluded.parser_version, "
+            "ingested_at = excluded.ingested_at, updated_at = excluded.updated_at",
+            (name, sha256, size_bytes, parser, parser_version, now, now),
+        )
+
+    def remove(self, name: str):
+        """Drops a file's entry."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                self._conn.execute("INSERT OR REPLACE INTO removed VALUES (?, ?)", (name, time.time()))
+            self._rows = None
+
+    def stamps(self) -> Tuple[float, Dict[str, float]]:
+        """
+        The time and updated_at of every file; taken before counting the
+        vector store, it is the baseline for set_counts.
+        """
+        with self._lock:
+            return time.time(), {name: row["updated_at"] for name, row in self._load().items()}
+
+    def set_counts(self, counts: Dict[str, int], stamps: Tuple[float, Dict[str, float]]) -> int:
+        """
+        Sets chunk counts taken from the vector store and returns the number
+        of files changed.
+
+        Each file is compared and set against its stamp from before the count
+        was taken, so a file added to, re-ingested or deleted meanwhile (by
+        any process) is left alone until the next pass. Stamped files missing
+        from counts are dropped; files the catalog did not have are added
+        unless they were removed since.
+        """
+        taken_at, stamps = stamps
+        now = time.time()
+        changed = 0
+        with self._lock:
+            with self._conn:
+                for name, stamp in stamps.items():
+                    if name in counts:
+                        cursor = self._conn.execute(
+                            "UPDATE files SET chunks = ?, updated_at = ? "
+                            "WHERE name = ? AND updated_at = ? AND chunks != ?",
+                            (counts[name], now, name, stamp, counts[name]),
+                        )
+                    else:
+                        cursor = self._conn.execute(
+                            "DELETE FROM files WHERE name = ? AND updated_at = ?", (name, stamp)
+                        )
+                    changed += cursor.rowcount
+                for name, count in counts.items():
+                    if name not in stamps:
+                        cursor = self._conn.execute(
+                            "INSERT INTO files (name, chunks, updated_at) "
+                            "SELECT ?, ?, ? WHERE NOT EXISTS "
+                            "(SELECT 1 FROM removed WHERE name = ? AND removed_at >= ?) "
+                            "ON CONFLICT (name) DO NOTHING",
+                            (name, count, now, name, taken_at),
+                        )
+                        changed += cursor.rowcount
+                # Later passes start after these removals
+                self._conn.execute("DELETE FROM removed WHERE removed_at < ?", (taken_at,))
+            self._rows = None
+        return changed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Internals ---
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(sql, params)
+            self._rows = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        # data_version changes when another connection commits to the database
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._rows is None or version != self._data_version:
+            cursor = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM files ORDER BY name")
+            self._rows = {row[0]: dict(zip(_COLUMNS, row)) for row in cursor}
+            self._data_version = version
+        return self._rows
+
+    def _migrate(self, registry_path: Path):
+        if not registry_path.exists():
+            return
+        try:
+            with open(registry_path, "r") as f:
+                registry = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read legacy file registry {registry_path}: {e}")
+            return
+
+        with self._lock:
+            with self._conn:
+                empty = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+                if empty:
+                    now = time.time()
+                    self._conn.executemany(
+                        "INSERT INTO files (name, chunks, updated_at) VALUES (?, ?, ?)",
+                        [(name, int(count), now) for name, count in registry.items()],
+                    )
+            self._rows = None
+        registry_path.rename(registry_path.with_name(registry_path.name + ".migrated"))
+        if empty:
+            logger.info(f"Imported {len(registry)} files from {registry_path} into the catalog")
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Returns the process-wide document catalog."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
@@ -1,6 +1,10 @@
-from typing import List
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 from ..core.config import CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -13,22 +17,122 @@ except Exception:
     logger.info("tiktoken not available; falling back to character-based chunking.")
 
 
-def chunk_text_tokenwise(text: str, chunk_size: int, overlap: int) -> List[str]:
-    
-    enc = tiktoken.get_encoding("cl100k_base")
-    tokens = enc.encode(text)
-    chunks = []
+# Texts longer than this are encoded in parts on tiktoken's thread pool
+_ENCODE_BATCH_CHARS = 256 * 1024
+_ENCODE_THREADS = min(os.cpu_count() or 1, 8)
+
+# Text without a stable cut is force-cut once this many windows of it (at
+# about 4 characters per token) are pending; the last _FORCED_CUT_KEEP_TOKENS
+# tokens stay pending in case they merge with what follows
+_MAX_PENDING_WINDOWS = 4
+_FORCED_CUT_KEEP_TOKENS = 16
+
+# UTF-8 continuation bytes (10xxxxxx)
+_CONTINUATION = bytes(range(0x80, 0xC0))
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=4)
+def _token_tables(enc) -> Tuple[List[int], bytearray]:
+    """
+    Per-token lookup tables, built once per encoding: the number of
+    characters a token starts, and whether it begins in the middle of a
+    character (a UTF-8 continuation byte).
+    """
+    counts = [0] * enc.n_vocab
+    mid_char = bytearray(enc.n_vocab)
+    for token in range(enc.n_vocab):
+        try:
+            data = enc.decode_single_token_bytes(token)
+        except KeyError:
+            continue
+        counts[token] = len(data.translate(None, _CONTINUATION))
+        mid_char[token] = bool(data) and 0x80 <= data[0] < 0xC0
+    return counts, mid_char
+
+
+def _stable_cut(text: str, start: int = 0, end: int = None) -> int:
+    """
+    Returns the last index in text[start:end] where the text can be split
+    without changing its cl100k tokenization, or start if there is none.
+
+    A space that follows a non-whitespace character always starts a new
+    pre-tokenizer piece, and the pieces before it do not depend on anything
+    after it, so encode(a + b) == encode(a) + encode(b) at such a cut.
+    """
+    i = text.rfind(" ", start, end)
+    while i > start and text[i - 1].isspace():
+        i = text.rfind(" ", start, i - 1)
+    return max(i, start)
+
+
+def count_tokens(text: str) -> int:
+    """Number of cl100k tokens in text, or an estimate of 4 chars per token."""
+    if _TIKTOKEN_AVAILABLE:
+        try:
+            return len(_get_encoding().encode_ordinary(text))
+        except Exception:
+            pass
+    return (len(text) + 3) // 4
+
+
+def _encode(enc, text: str) -> List[int]:
+    """
+    Encodes text, splitting long texts at stable cuts so the parts are
+    encoded as one batch on tiktoken's threads. Tokens are identical to
+    encoding the text whole.
+    """
+    if len(text) <= _ENCODE_BATCH_CHARS or _ENCODE_THREADS < 2:
+        return enc.encode_ordinary(text)
+    parts = []
+    start = 0
+    while len(text) - start > _ENCODE_BATCH_CHARS:
+        cut = _stable_cut(text, start, start + _ENCODE_BATCH_CHARS)
+        if cut == start:
+            break
+        parts.append(text[start:cut])
+        start = cut
+    parts.append(text[start:])
+    tokens: List[int] = []
+    for part in enc.encode_ordinary_batch(parts, num_threads=_ENCODE_THREADS):
+        tokens.extend(part)
+    return tokens
+
+
+def _windows(n: int, chunk_size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """Token [start, end) of each chunk window."""
+    step = max(chunk_size - overlap, 1)
     start = 0
-    n = len(tokens)
     while start < n:
         end = min(start + chunk_size, n)
-        chunk_tokens = tokens[start:end]
-        chunk_text = enc.decode(chunk_tokens)
-        chunks.append(chunk_text)
+        yield start, end
         if end >= n:
             break
-        start = max(end - overlap, end - overlap)
-    return chunks
+        start += step
+
+
+def chunk_text_tokenwise(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Token windows of chunk_size with overlap, cut as slices of text.
+
+    Token boundaries are mapped to character offsets in one pass over the
+    tokens, so no window is decoded. A character whose bytes straddle a
+    window boundary belongs to the later window.
+    """
+    enc = _get_encoding()
+    tokens = _encode(enc, text)
+    counts, mid_char = _token_tables(enc)
+    offsets = list(accumulate(map(counts.__getitem__, tokens), initial=0))
+    n = len(tokens)
+
+    def at(k: int) -> int:
+        return offsets[k] - mid_char[tokens[k]] if k < n else offsets[n]
+
+    return [text[at(start) : at(end)] for start, end in _windows(n, chunk_size, overlap)]
 
 
 def chunk_text_charwise(
@@ -58,7 +162,185 @@ def chunk_text(text: str):
             return chunk_text_tokenwise(text, CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS)
         except Exception as e:
             logger.warning("Tokenwise chunking failed, fallback: %s", e)
-    
+
     chunk_chars = int(CHUNK_SIZE_TOKENS * 4)
     overlap_chars = int(CHUNK_OVERLAP_TOKENS * 4)
     return chunk_text_charwise(text, chunk_chars, overlap_chars)
+
+
+# A chunk and the metadata of the segment it starts in
+Chunk = Tuple[str, Dict[str, Any]]
+
+
+class StreamChunker:
+    """
+    Incremental chunker: feed text as it arrives and receive finished chunks.
+
+    Produces exactly the chunks chunk_text() would produce for the
+    concatenated input (same CHUNK_SIZE_TOKENS windows and
+    CHUNK_OVERLAP_TOKENS overlap), while holding only the current window plus
+    the text since the last safe tokenization cut. A long run without such a
+    cut (e.g. text without spaces) is cut at a token boundary instead, where
+    tokens may differ slightly from encoding the text whole.
+
+    Each chunk carries the metadata of the segment in which it starts.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._enc = None
+        if _TIKTOKEN_AVAILABLE:
+            try:
+                self._enc = _get_encoding()
+            except Exception as e:
+                logger.warning("Tokenwise chunking failed, fallback: %s", e)
+        if self._enc is None:
+            # Same character sizes as chunk_text's fallback
+            self.chunk_size = int(chunk_size * 4)
+            self.overlap = int(overlap * 4)
+        self._step = max(self.chunk_size - self.overlap, 1)
+
+        # Text from the start of the current window, and its tokens with
+        # their absolute character offsets (token mode only)
+        self._chars = ""
+        self._window: List[int] = []
+        self._token_offsets: List[int] = []
+        self._encoded = 0
+        # Text not yet encoded because it may still merge with what follows
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._max_pending = self.chunk_size * _MAX_PENDING_WINDOWS * 4
+        # Character offset of the window start, and where each segment starts
+        self._offset = 0
+        self._seen = 0
+        self._starts: List[int] = []
+        self._metas: List[Dict[str, Any]] = []
+
+    def feed(self, text: str, meta: Dict[str, Any] = None) -> List[Chunk]:
+        """Adds the next segment of text and returns the chunks it completes."""
+        self._starts.append(self._seen)
+        self._metas.append(meta or {})
+        self._seen += len(text)
+
+        if self._enc is None:
+            self._chars += text
+            return self._emit_chars(final=False)
+
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if " " in text:
+            pending = "".join(self._pending)
+            cut = _stable_cut(pending)
+            self._set_pending(pending[cut:])
+            if cut:
+                self._encode(pending[:cut])
+        if self._pending_chars > self._max_pending:
+            self._force_cut()
+        return self._emit_tokens(final=False)
+
+    def finish(self) -> List[Chunk]:
+        """Flushes the remaining text as the final chunk(s)."""
+        if self._enc is None:
+            return self._emit_chars(final=True)
+        pending = "".join(self._pending)
+        self._set_pending("")
+        if pending:
+            self._encode(pending)
+        return self._emit_tokens(final=True)
+
+    def _set_pending(self, text: str):
+        self._pending = [text] if text else []
+        self._pending_chars = len(text)
+
+    def _force_cut(self):
+        """Encodes pending text that has no stable cut, except its last few tokens."""
+        pending = "".join(self._pending)
+        tokens = _encode(self._enc, pending)
+        counts, mid_char = _token_tables(self._enc)
+        k = len(tokens) - _FORCED_CUT_KEEP_TOKENS
+        # Cut before a token that starts a character, never inside one
+        while k > 0 and mid_char[tokens[k]]:
+            k -= 1
+        if k <= 0:
+            return
+        cut = sum(map(counts.__getitem__, tokens[:k]))
+        self._set_pending(pending[cut:])
+        self._append(pending[:cut], tokens[:k])
+
+    def _encode(self, text: str):
+        self._append(text, _encode(self._enc, text))
+
+    def _append(self, text: str, tokens: List[int]):
+        counts, _ = _token_tables(self._enc)
+        offsets = list(accumulate(map(counts.__getitem__, tokens), initial=self._encoded))
+        self._encoded = offsets.pop()
+        self._window.extend(tokens)
+        self._token_offsets.extend(offsets)
+        self._chars += text
+
+    def _token_start(self, k: int) -> int:
+        if k >= len(self._window):
+            return self._encoded
+        _, mid_char = _token_tables(self._enc)
+        return self._token_offsets[k] - mid_char[self._window[k]]
+
+    def _meta_at(self, offset: int) -> Dict[str, Any]:
+        i = bisect_right(self._starts, offset) - 1
+        return self._metas[max(i, 0)] if self._metas else {}
+
+    def _advance(self, chars: int):
+        self._offset += chars
+        # Forget segments that ended before the new window start
+        i = bisect_right(self._starts, self._offset) - 1
+        if i > 0:
+            del self._starts[:i]
+            del self._metas[:i]
+
+    def _emit_tokens(self, final: bool) -> List[Chunk]:
+        chunks = []
+        # A full window is only known not to be the last one once a token follows it
+        while len(self._window) > self.chunk_size:
+            end = self._token_start(self.chunk_size) - self._offset
+            chunks.append((self._chars[:end], self._meta_at(self._offset)))
+            del self._window[: self._step]
+            del self._token_offsets[: self._step]
+            shift = self._token_start(0) - self._offset
+            self._chars = self._chars[shift:]
+            self._advance(shift)
+        if final and self._window:
+            chunks.append((self._chars, self._meta_at(self._offset)))
+            self._window, self._token_offsets, self._chars = [], [], ""
+        return chunks
+
+    def _emit_chars(self, final: bool) -> List[Chunk]:
+        chunks = []
+        while len(self._chars) > self.chunk_size:
+            chunk = self._chars[: self.chunk_size].strip()
+            if chunk:
+                chunks.append((chunk, self._meta_at(self._offset)))
+            self._advance(self._step)
+            self._chars = self._chars[self._step :]
+        if final and self._chars:
+            chunk = self._chars.strip()
+            if chunk:
+                chunks.append((chunk, self._meta_at(self._offset)))
+            self._chars = ""
+        return chunks
+
+
+def chunk_segments(segments: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Chunk]:
+    """Yields (chunk, metadata) as (text, metadata) segments stream in."""
+    chunker = StreamChunker()
+    for text, meta in segments:
+        yield from chunker.feed(text, meta)
+    yield from chunker.finish()
+
+
+def chunk_stream(texts: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the chunks of a text arriving in pieces, without buffering the
+    whole document. Output matches chunk_text("".join(texts)).
+    """
+    for chunk, _ in chunk_segments((text, {}) for text in texts):
+        yield chunk
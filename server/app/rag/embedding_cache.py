@@ -0,0 +1,376 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized within one process only
+    fcntl = None
+
+from ..core.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_MEMORY_ITEMS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    dim INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS free_rows (
+    dim INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (dim, row)
+);
+CREATE TABLE IF NOT EXISTS files (
+    dim INTEGER PRIMARY KEY,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+"""
+
+# Vector files grow by at least this many rows at a time
+_MIN_GROW_ROWS = 1024
+
+# Eviction frees this fraction of the budget beyond what is needed, so it
+# does not run again on every insert
+_EVICT_SLACK = 0.1
+
+# Access times of memory hits are written to the index in batches of at most
+# this many keys (and before every disk read or eviction)
+_TOUCH_FLUSH_ITEMS = 1024
+
+
+def cache_key(model: str, text: str) -> bytes:
+    """Cache key of a text's embedding under a model."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8", "surrogatepass")).digest()
+
+
+class _VectorFile:
+    """
+    A growable memory-mapped float32 matrix with `dim` columns.
+
+    Other processes may grow the file, so the mapping is refreshed from the
+    file size whenever a row lies beyond it.
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.path.touch(exist_ok=True)
+        self.capacity = 0
+        self._map: Optional[np.memmap] = None
+        self._refresh()
+
+    def _refresh(self):
+        capacity = self.path.stat().st_size // (4 * self.dim)
+        if capacity != self.capacity or self._map is None:
+            if self._map is not None:
+                self._map.flush()
+            self.capacity = capacity
+            self._map = (
+                np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)) if capacity else None
+            )
+
+    def reserve(self, rows: int):
+        """Grows the file to hold rows; callers hold the cache's write lock."""
+        if rows <= self.capacity:
+            return
+        self._refresh()
+        if rows <= self.capacity:
+            return
+        # Only ever grows: another process may already index rows up to the current size
+        size = max(rows, 2 * self.capacity, _MIN_GROW_ROWS) * 4 * self.dim
+        with open(self.path, "r+b") as f:
+            if size > f.seek(0, 2):
+                f.truncate(size)
+        self._refresh()
+
+    def read(self, rows: Sequence[int]) -> np.ndarray:
+        rows = list(rows)
+        if rows and max(rows) >= self.capacity:
+            self._refresh()
+        return np.array(self._map[rows])
+
+    def write(self, rows: Sequence[int], vectors: np.ndarray):
+        rows = list(rows)
+        if rows and max(rows) >= self.capacity:
+            self._refresh()
+        self._map[rows] = vectors
+        self._map.flush()
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by (model name, text hash).
+
+    A bounded in-memory LRU sits in front of a persistent store: vectors live
+    in memory-mapped float32 files (one per dimension) and a SQLite index maps
+    keys to rows. The store is bounded by max_bytes of vector data; the least
+    recently read entries are evicted first and their rows reused. Reads
+    served from memory count as reads too: their access times are batched
+    and written to the index before the next eviction.
+
+    Several processes may share one directory. Writers take an exclusive
+    flock on write.lock; a reader re-checks the index after reading vectors,
+    so a row evicted and reused by another process meanwhile is a miss.
+    """
+
+    def __init__(
+        self,
+        directory: Path = EMBEDDING_CACHE_DIR,
+        max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        # Access times of memory hits not yet written to the index
+        self._touched: Dict[bytes, float] = {}
+        self._files: Dict[int, _VectorFile] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock_file = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.directory / "index.sqlite"), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    @contextmanager
+    def _write_lock(self):
+        """Serializes writers across processes; callers hold self._lock."""
+        if self._lock_file is None:
+            self._db()
+            self._lock_file = open(self.directory / "write.lock", "a+")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _lookup(self, db: sqlite3.Connection, keys: List[bytes]) -> Dict[bytes, tuple]:
+        """(dim, row) of each stored key."""
+        rows: Dict[bytes, tuple] = {}
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            marks = ",".join("?" * len(batch))
+            for key, dim, row in db.execute(f"SELECT key, dim, row FROM entries WHERE key IN ({marks})", batch):
+                rows[key] = (dim, row)
+        return rows
+
+    def _file(self, dim: int) -> _VectorFile:
+        vectors = self._files.get(dim)
+        if vectors is None:
+            vectors = _VectorFile(self.directory / f"vectors-{dim}.f32", dim)
+            self._files[dim] = vectors
+        return vectors
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached embedding of each text, or None where there is none."""
+        keys = [cache_key(model, t) for t in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            on_disk = []
+            now = time.time()
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = now
+                    found[i] = vector
+                    self.memory_hits += 1
+                else:
+                    on_disk.append(i)
+            if on_disk:
+                self._read_disk(keys, on_disk, found)
+            elif len(self._touched) >= _TOUCH_FLUSH_ITEMS:
+                self._flush_touched(self._db())
+        return found
+
+    def _flush_touched(self, db: sqlite3.Connection, accessed: Optional[Dict[bytes, float]] = None):
+        """Writes the access times of memory hits (and `accessed`) to the index."""
+        touched = self._touched
+        if accessed:
+            touched.update(accessed)
+        if not touched:
+            return
+        self._touched = {}
+        with db:
+            db.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+
+    def _read_disk(self, keys: List[bytes], indices: List[int], found: List[Optional[np.ndarray]]):
+        db = self._db()
+        rows = self._lookup(db, list({keys[i] for i in indices}))
+
+        by_dim: Dict[int, List[bytes]] = {}
+        for key, (dim, _) in rows.items():
+            by_dim.setdefault(dim, []).append(key)
+        vectors: Dict[bytes, np.ndarray] = {}
+        for dim, dim_keys in by_dim.items():
+            data = self._file(dim).read([rows[k][1] for k in dim_keys])
+            vectors.update(zip(dim_keys, data))
+        if vectors:
+            # Another process evicts before it reuses a row, so a row still
+            # indexed under the same key after the read held that key's vector
+            current = self._lookup(db, list(vectors))
+            vectors = {k: v for k, v in vectors.items() if current.get(k) == rows[k]}
+
+        for i in indices:
+            vector = vectors.get(keys[i])
+            if vector is None:
+                self.misses += 1
+            else:
+                found[i] = vector
+                self.disk_hits += 1
+                self._remember(keys[i], vector)
+
+        now = time.time()
+        self._flush_touched(db, {k: now for k in vectors})
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray):
+        """Stores the embeddings of texts (one row of vectors per text)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        dim = vectors.shape[1]
+        entries = {cache_key(model, t): v for t, v in zip(texts, vectors)}
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+            if dim * 4 * len(entries) > self.max_bytes:
+                return
+            db = self._db()
+            with self._write_lock():
+                # Eviction must see the entries recently read from memory
+                self._flush_touched(db)
+                # Rows already stored for some of these keys are overwritten in place
+                keys = list(entries)
+                stored = {k: row for k, (d, row) in self._lookup(db, keys).items() if d == dim}
+                new_keys = [k for k in keys if k not in stored]
+                self._evict(db, dim * 4 * len(new_keys), keep=entries)
+                rows = self._allocate(db, dim, len(new_keys))
+                stored.update(zip(new_keys, rows))
+
+                # Vectors reach the file before the index points at them
+                order = list(stored)
+                self._file(dim).write([stored[k] for k in order], np.stack([entries[k] for k in order]))
+                now = time.time()
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO entries (key, dim, row, accessed_at) VALUES (?, ?, ?, ?)",
+                        [(k, dim, stored[k], now) for k in order],
+                    )
+
+    def _allocate(self, db: sqlite3.Connection, dim: int, count: int) -> List[int]:
+        """Hands out free or fresh rows; callers hold the write lock."""
+        rows = [r for (r,) in db.execute("SELECT row FROM free_rows WHERE dim = ? LIMIT ?", (dim, count))]
+        used = db.execute("SELECT used FROM files WHERE dim = ?", (dim,)).fetchone()
+        used = used[0] if used else 0
+        fresh = count - len(rows)
+        rows.extend(range(used, used + fresh))
+        self._file(dim).reserve(used + fresh)
+        with db:
+            db.executemany("DELETE FROM free_rows WHERE dim = ? AND row = ?", [(dim, r) for r in rows[: count - fresh]])
+            db.execute("INSERT OR REPLACE INTO files (dim, used) VALUES (?, ?)", (dim, used + fresh))
+        return rows
+
+    def _evict(self, db: sqlite3.Connection, incoming_bytes: int, keep=()):
+        """Frees rows of least recently read entries; committed before any row is reused."""
+        size = db.execute("SELECT COALESCE(SUM(dim * 4), 0) FROM entries").fetchone()[0]
+        excess = size + incoming_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        excess += int(self.max_bytes * _EVICT_SLACK)
+        victims = []
+        freed = 0
+        for key, dim, row in db.execute("SELECT key, dim, row FROM entries ORDER BY accessed_at"):
+            if key in keep:
+                continue
+            victims.append((key, dim, row))
+            freed += dim * 4
+            if freed >= excess:
+                break
+        with db:
+            db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _, _ in victims])
+            db.executemany("INSERT OR IGNORE INTO free_rows (dim, row) VALUES (?, ?)", [(d, r) for _, d, r in victims])
+        logger.info(f"Embedding cache evicted {len(victims)} entries ({freed / 1024 / 1024:.1f} MB)")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current sizes."""
+        with self._lock:
+            entries, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(dim * 4), 0) FROM entries").fetchone()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": entries,
+                "disk_bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        """Drops every cached embedding and resets the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            db = self._db()
+            with self._write_lock(), db:
+                db.execute("DELETE FROM entries")
+                db.execute("DELETE FROM free_rows")
+                db.execute("DELETE FROM files")
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touched(self._conn)
+            self._files.clear()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
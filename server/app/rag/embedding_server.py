@@ -0,0 +1,249 @@
+"""
+Standalone embedding server shared by all API worker processes.
+
+One process owns the embedding model (and the embedding cache) and serves
+encode requests over a local Unix socket, so adding uvicorn/gunicorn workers
+does not add model copies and model compute never runs on a worker's event
+loop. Query requests from all workers are micro-batched together.
+
+Run it next to the API (from server/):
+    python -m app.rag.embedding_server [--socket /tmp/thinkbook-embed.sock]
+
+and point the API workers at it with THINKBOOK_EMBEDDING_SERVER_SOCKET.
+
+Wire format: each message is a frame of two big-endian uint32 lengths, a
+JSON header and a binary payload. Requests carry {"kind", "texts"} and no
+payload; responses carry {"shape": [n, dim]} and the float32 vectors, or
+{"error": message}, or {"stats": {...}} for a "stats" request.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_LENGTHS = struct.Struct("!II")
+
+# Request kinds
+KIND_QUERY = "query"
+KIND_TEXTS = "texts"
+KIND_DOCUMENTS = "documents"
+KIND_STATS = "stats"
+
+
+class EmbeddingServerError(Exception):
+    """Raised when the embedding server cannot be reached or fails a request."""
+    pass
+
+
+def _encode_frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    data = json.dumps(header).encode()
+    return _LENGTHS.pack(len(data), len(payload)) + data + payload
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view[-size:], size)
+        if not n:
+            raise ConnectionError("Embedding server closed the connection")
+        size -= n
+    return bytes(buf)
+
+
+# --- Client (API workers) ---
+
+
+class EmbeddingClient:
+    """
+    Blocking client for the embedding server, with one connection per thread.
+
+    Callers run on worker threads (asyncio.to_thread), never on the event loop.
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        from ..core.config import EMBEDDING_SERVER_TIMEOUT_SECONDS
+
+        self.path = path
+        self.timeout = EMBEDDING_SERVER_TIMEOUT_SECONDS if timeout is None else timeout
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout or None)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def request(self, kind: str, texts: Optional[List[str]] = None) -> Tuple[Dict[str, Any], bytes]:
+        frame = _encode_frame({"kind": kind, "texts": list(texts or [])})
+        # A connection dropped by a server restart is retried once
+        for attempt in (1, 2):
+            try:
+                sock = self._socket()
+                sock.sendall(frame)
+                header_len, payload_len = _LENGTHS.unpack(_recv_exactly(sock, _LENGTHS.size))
+                header = json.loads(_recv_exactly(sock, header_len))
+                payload = _recv_exactly(sock, payload_len)
+                break
+            except socket.timeout as e:
+                # A stuck server is not retried; the late reply would desync the connection
+                self._close()
+                raise EmbeddingServerError(
+                    f"Embedding server at {self.path} did not answer within {self.timeout}s"
+                ) from e
+            except OSError as e:
+                self._close()
+                if attempt == 2:
+                    raise EmbeddingServerError(f"Embedding server at {self.path} unavailable: {e}") from e
+        if "error" in header:
+            raise EmbeddingServerError(header["error"])
+        return header, payload
+
+    def embed(self, texts: List[str], kind: str = KIND_TEXTS) -> np.ndarray:
+        """Returns the (n, dim) float32 embeddings of texts."""
+        header, payload = self.request(kind, texts)
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+
+    def stats(self) -> Dict[str, Any]:
+        header, _ = self.request(KIND_STATS)
+        return header["stats"]
+
+
+_client: Optional[EmbeddingClient] = None
+_client_lock = threading.Lock()
+
+
+def get_embedding_client(path: str) -> EmbeddingClient:
+    """Returns the process-wide client for the server at path."""
+    global _client
+    if _client is None or _client.path != path:
+        with _client_lock:
+            if _client is None or _client.path != path:
+                _client = EmbeddingClient(path)
+    return _client
+
+
+# --- Server ---
+
+
+class EmbeddingServer:
+    """Serves embedding requests from one model over a Unix socket."""
+
+    def __init__(self, path: str, batcher=None):
+        from ..services.embedding_batcher import EmbeddingBatcher
+        from . import embeddings
+
+        self.path = path
+        self._embeddings = embeddings
+        # This process computes embeddings itself (local=True), whatever the shared config says
+        self.batcher = batcher or EmbeddingBatcher(functools.partial(embeddings.embed_texts, local=True))
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.path):
+            # A socket left behind by a previous run
+            os.unlink(self.path)
+        await self.batcher.start()
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o600)
+        logger.info(f"Embedding server listening on {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.stop()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header_len, payload_len = _LENGTHS.unpack(await reader.readexactly(_LENGTHS.size))
+                    request = json.loads(await reader.readexactly(header_len))
+                    await reader.readexactly(payload_len)
+                except asyncio.IncompleteReadError:
+                    break
+                writer.write(await self._respond(request))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request: Dict[str, Any]) -> bytes:
+        kind = request.get("kind")
+        texts = request.get("texts") or []
+        try:
+            if kind == KIND_STATS:
+                cache_stats = await asyncio.to_thread(self._embeddings.embedding_cache_stats, local=True)
+                return _encode_frame({"stats": {"embedding_cache": cache_stats, "query_batcher": self.batcher.stats()}})
+            if kind == KIND_QUERY:
+                # Queries from every API worker share micro-batches
+                vectors = np.stack(await asyncio.gather(*(self.batcher.embed(t) for t in texts)))
+            elif kind == KIND_TEXTS:
+                vectors = await asyncio.to_thread(self._embeddings.embed_texts, texts, local=True)
+            elif kind == KIND_DOCUMENTS:
+                vectors = await asyncio.to_thread(self._embeddings.embed_documents, texts, local=True)
+            else:
+                return _encode_frame({"error": f"Unknown request kind: {kind}"})
+        except Exception as e:
+            logger.error(f"Embedding request ({kind}, {len(texts)} texts) failed: {e}")
+            return _encode_frame({"error": str(e)})
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        return _encode_frame({"shape": list(vectors.shape)}, vectors.tobytes())
+
+
+def main():
+    from ..core.config import EMBEDDING_SERVER_SOCKET, LOG_LEVEL
+    from ..core.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="ThinkBook embedding server")
+    parser.add_argument("--socket", default=EMBEDDING_SERVER_SOCKET or "/tmp/thinkbook-embed.sock")
+    args = parser.parse_args()
+
+    setup_logging(LOG_LEVEL)
+    server = EmbeddingServer(args.socket)
+    # Load the model before accepting connections
+    server._embeddings.get_embedding_model()
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,248 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from ..core.config import EMBEDDING_MODEL
+from ..core.config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_DIR,
+    EMBEDDING_ONNX_QUANTIZATION,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_PROCESSES,
+    EMBEDDING_SERVER_SOCKET,
+)
+from .embedding_cache import get_embedding_cache
+from .embedding_server import KIND_DOCUMENTS, KIND_QUERY, KIND_TEXTS, get_embedding_client
+from importlib.util import find_spec
+import atexit
+import logging
+import math
 import threading
-import torch
 
-_model = None
+logger = logging.getLogger(__name__)
+
+# ONNX backends need onnxruntime and optimum (pip install "sentence-transformers[onnx]")
+ONNX_AVAILABLE = find_spec("onnxruntime") is not None and find_spec("optimum") is not None
+
+# "torch": PyTorch (MPS when available); "onnx": ONNX Runtime on CPU, fp32;
+# "onnx-int8": ONNX Runtime on CPU with dynamically int8-quantized weights
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# One loaded model per backend, shared by all callers
+_models = {}
 _model_lock = threading.Lock()
 
 
-def get_embedding_model():
+def _load_quantized_onnx():
+    from sentence_transformers import SentenceTransformer
+
+    file_name = f"onnx/model_qint8_{EMBEDDING_ONNX_QUANTIZATION}.onnx"
+    try:
+        # Many hub models ship pre-quantized ONNX weights
+        return SentenceTransformer(
+            EMBEDDING_MODEL, device="cpu", backend="onnx", model_kwargs={"file_name": file_name}
+        )
+    except Exception as e:
+        logger.info(f"No pre-quantized ONNX weights for {EMBEDDING_MODEL} ({e}); quantizing locally")
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    local_dir = EMBEDDING_ONNX_DIR / EMBEDDING_MODEL.replace("/", "__")
+    if not (local_dir / file_name).exists():
+        model = SentenceTransformer(EMBEDDING_MODEL, device="cpu", backend="onnx")
+        model.save(str(local_dir))
+        export_dynamic_quantized_onnx_model(model, EMBEDDING_ONNX_QUANTIZATION, str(local_dir))
+    return SentenceTransformer(str(local_dir), device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def _load_model(backend: str):
+    # PyTorch and sentence-transformers are only imported by the process that
+    # runs the model, not by API workers using an embedding server
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        device = "mps" if torch.backends.mps.is_available() else "cpu"
+        return SentenceTransformer(EMBEDDING_MODEL, device=device)
+    if not ONNX_AVAILABLE:
+        raise RuntimeError(
+            f"Embedding backend {backend} needs ONNX Runtime. "
+            'Install with: pip install "sentence-transformers[onnx]"'
+        )
+    if backend == "onnx":
+        return SentenceTransformer(EMBEDDING_MODEL, device="cpu", backend="onnx")
+    return _load_quantized_onnx()
+
+
+def get_embedding_model(backend: str = None):
     """
     Returns a cached instance of the embedding model to prevent reloads per query.
+
+    Args:
+        backend: "torch", "onnx" or "onnx-int8"; defaults to
+            THINKBOOK_EMBEDDING_BACKEND.
     """
-    global _model
-    if _model is None:
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}. Choose from: {', '.join(EMBEDDING_BACKENDS)}")
+
+    model = _models.get(backend)
+    if model is None:
         with _model_lock:
-            if _model is None:
-                
-                device = "mps" if torch.backends.mps.is_available() else "cpu"
-                _model = SentenceTransformer(EMBEDDING_MODEL, device=device)
-    return _model
+            model = _models.get(backend)
+            if model is None:
+                logger.info(f"Loading embedding model {EMBEDDING_MODEL} ({backend})...")
+                model = _load_model(backend)
+                _models[backend] = model
+    return model
 
 
-def embed_texts(texts):
+def cache_model_name(backend: str = None) -> str:
     """
-    Returns numpy array embeddings (n, dim)
+    Name embeddings are cached under. Backends give slightly different
+    vectors, so each non-default backend has its own cache entries.
     """
+    backend = backend or EMBEDDING_BACKEND
+    return EMBEDDING_MODEL if backend == "torch" else f"{EMBEDDING_MODEL}:{backend}"
+
+
+def _encode(texts):
     model = get_embedding_model()
-    embs = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-    return embs
+    return model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
+
+
+# SentenceTransformer multi-process pool for document embedding (EMBEDDING_PROCESSES > 1)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(model):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                logger.info(f"Starting embedding pool with {EMBEDDING_PROCESSES} processes")
+                _pool = model.start_multi_process_pool(target_devices=["cpu"] * EMBEDDING_PROCESSES)
+                atexit.register(_stop_pool)
+    return _pool
+
+
+def _stop_pool():
+    global _pool
+    if _pool is not None:
+        from sentence_transformers import SentenceTransformer
+
+        SentenceTransformer.stop_multi_process_pool(_pool)
+        _pool = None
+
+
+def _token_lengths(model, texts):
+    """Number of model tokens per text, capped at the model's max sequence length."""
+    encoded = model.tokenizer(
+        list(texts), truncation=True, max_length=model.max_seq_length, return_attention_mask=False
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def _encode_bucketed(texts):
+    """
+    Encodes texts in fixed-size batches of similar token length.
+
+    Texts are sorted by token length so each batch pads to nearly the same
+    length, and at most EMBEDDING_BATCH_SIZE texts are in flight per forward
+    pass. Vectors are written into one preallocated array in input order.
+    """
+    model = get_embedding_model()
+    lengths = _token_lengths(model, texts)
+    order = np.argsort(lengths, kind="stable")
+    out = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    if EMBEDDING_PROCESSES > 1 and len(texts) > EMBEDDING_BATCH_SIZE:
+        # Each process gets one run of neighbouring (similar-length) texts; a
+        # fixed chunk size would leave all but one process idle on ingest
+        # flushes of INGEST_BATCH_CHUNKS texts
+        out[order] = model.encode(
+            [texts[i] for i in order],
+            pool=_get_pool(model),
+            batch_size=EMBEDDING_BATCH_SIZE,
+            chunk_size=math.ceil(len(texts) / EMBEDDING_PROCESSES),
+            show_progress_bar=False,
+        )
+        return out
+
+    for start in range(0, len(order), EMBEDDING_BATCH_SIZE):
+        batch = order[start : start + EMBEDDING_BATCH_SIZE]
+        out[batch] = model.encode(
+            [texts[i] for i in batch],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+    return out
+
+
+def _cached(texts, encode):
+    if not EMBEDDING_CACHE_ENABLED or not len(texts):
+        return encode(texts)
+
+    cache = get_embedding_cache()
+    model_name = cache_model_name()
+    found = cache.get_many(model_name, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, found) if v is None))
+    if missing:
+        embs = encode(missing)
+        cache.put_many(model_name, missing, embs)
+        computed = dict(zip(missing, embs))
+        found = [computed[t] if v is None else v for t, v in zip(texts, found)]
+    return np.stack(found)
+
+
+def embed_texts(texts, local: bool = False):
+    """
+    Returns numpy array embeddings (n, dim)
+
+    Embeddings are looked up in the embedding cache first; only texts that
+    miss (each distinct text once) reach the model. With local=True the model
+    of this process is used even if an embedding server is configured.
+    """
+    if EMBEDDING_SERVER_SOCKET and not local and len(texts):
+        return get_embedding_client(EMBEDDING_SERVER_SOCKET).embed(texts, KIND_TEXTS)
+    return _cached(texts, _encode)
+
+
+def embed_documents(texts, local: bool = False):
+    """
+    Returns numpy array embeddings (n, dim) for document chunks.
+
+    Like embed_texts, but cache misses are encoded in length-bucketed
+    batches of EMBEDDING_BATCH_SIZE (across EMBEDDING_PROCESSES processes
+    when set), so peak memory does not grow with the number of chunks.
+    """
+    if not len(texts):
+        return _encode(texts)
+    if EMBEDDING_SERVER_SOCKET and not local:
+        return get_embedding_client(EMBEDDING_SERVER_SOCKET).embed(texts, KIND_DOCUMENTS)
+    return _cached(texts, _encode_bucketed)
+
+
+def embed_queries(texts):
+    """
+    Returns numpy array embeddings (n, dim) for a batch of queries. With an
+    embedding server, the server batches them with other workers' queries.
+    """
+    if EMBEDDING_SERVER_SOCKET and len(texts):
+        return get_embedding_client(EMBEDDING_SERVER_SOCKET).embed(texts, KIND_QUERY)
+    return embed_texts(texts)
+
+
+def embedding_cache_stats(local: bool = False):
+    """Embedding cache counters of the process that owns the model."""
+    if EMBEDDING_SERVER_SOCKET and not local:
+        return get_embedding_client(EMBEDDING_SERVER_SOCKET).stats()["embedding_cache"]
+    return get_embedding_cache().stats()
+
+
+def embed_query(text: str):
+    """
+    Returns the embedding (dim,) of a single query; repeated queries are
+    served from the cache without touching the model.
+    """
+    return embed_texts([text])[0]
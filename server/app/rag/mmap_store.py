@@ -0,0 +1,578 @@
+"""
+Vector store backed by memory-mapped NumPy files, with the same functions as
+qdrant_store (THINKBOOK_VECTOR_STORE=mmap).
+
+Vectors are L2-normalized and stored as float16 or float32 rows of one flat
+file, so a search is a blockwise matrix-vector product over the mapped
+pages. Every process maps the same files read-only, so any number of API
+workers share one copy of the vectors in the page cache. Chunk text and
+metadata live in SQLite (WAL), so readers never block.
+
+Layout of MMAP_STORE_DIR:
+    meta.sqlite            points (id, row, source, document, payload), state
+    vectors-{gen}.{dtype}  (capacity, dim) vectors, grown by doubling
+    alive-{gen}.u8         1 for rows that hold a live point
+    ivf-{gen}-{ver}.npz    IVF centroids and rows grouped by list
+
+Deleted rows are only marked dead; once they outnumber the live ones the
+files are compacted into the next generation. Appends never move rows, and
+readers remap whenever the generation or the file size changes.
+
+From MMAP_IVF_MIN_VECTORS live vectors up, an IVF index (spherical k-means,
+about sqrt(n) lists) narrows a search to the MMAP_IVF_PROBES nearest lists
+plus the rows added since it was trained. It is retrained as the corpus
+grows by half.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized within one process only
+    fcntl = None
+
+from ..core.config import (
+    MMAP_STORE_DIR,
+    MMAP_STORE_DTYPE,
+    MMAP_IVF_MIN_VECTORS,
+    MMAP_IVF_PROBES,
+)
+from .catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    id TEXT PRIMARY KEY,
+    row INTEGER NOT NULL,
+    source TEXT,
+    document TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS points_row ON points (row);
+CREATE INDEX IF NOT EXISTS points_source ON points (source);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+_DTYPES = {"float16": np.float16, "float32": np.float32}
+
+_MIN_CAPACITY = 1024
+# Rows scored per matrix-vector product, bounding the float32 working copy
+_SCAN_BLOCK_ROWS = 65536
+# Dead rows tolerated before compaction (and at least as many as live ones)
+_COMPACT_MIN_DEAD = 4096
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE_PER_LIST = 64
+
+
+class _Mapping:
+    """Read-only view of one generation's files, as mapped by this process."""
+
+    def __init__(self, directory: Path, generation: int, dim: int, dtype: str):
+        self.generation = generation
+        self.dim = dim
+        self.vectors_path = directory / f"vectors-{generation}.{dtype}"
+        self.alive_path = directory / f"alive-{generation}.u8"
+        self.size = -1
+        self.vectors: Optional[np.ndarray] = None
+        self.alive: Optional[np.ndarray] = None
+        self.dtype = _DTYPES[dtype]
+
+    def refresh(self):
+        """Remaps the files if a writer has grown them."""
+        try:
+            size = self.vectors_path.stat().st_size
+        except FileNotFoundError:
+            # Compacted away: keep searching the (unlinked) files already mapped
+            if self.vectors is not None:
+                return
+            size = 0
+        if size == self.size:
+            return
+        capacity = size // (self.dim * np.dtype(self.dtype).itemsize)
+        if capacity:
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(capacity, self.dim))
+            self.alive = np.memmap(self.alive_path, dtype=np.uint8, mode="r", shape=(capacity,))
+        else:
+            self.vectors, self.alive = None, None
+        self.size = size
+
+
+class _IVF:
+    """Inverted file index: rows [0, trained_rows) grouped by nearest centroid."""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, trained_rows: int):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.trained_rows = trained_rows
+
+    @classmethod
+    def load(cls, path: Path) -> "_IVF":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["order"], data["offsets"], int(data["trained_rows"]))
+
+    def save(self, path: Path):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets, trained_rows=self.trained_rows)
+        os.replace(tmp, path)
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """Rows in the probes lists nearest to query."""
+        scores = self.centroids @ query
+        probes = min(probes, len(scores))
+        nearest = np.argpartition(-scores, probes - 1)[:probes]
+        return np.concatenate([self.order[self.offsets[l] : self.offsets[l + 1]] for l in nearest])
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _SCAN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + _SCAN_BLOCK_ROWS], dtype=np.float32)
+        labels[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def _train_centroids(vectors: np.ndarray, lists: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means (cosine similarity) on a sample of vectors."""
+    sample_size = min(len(vectors), lists * _KMEANS_SAMPLE_PER_LIST)
+    sample = _normalize(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, lists, replace=False)]
+    for _ in range(_KMEANS_ITERATIONS):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = ~sums.any(axis=1)
+        # Lists that lost all their points restart from random samples
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class MmapVectorStore:
+    """
+    Flat (optionally IVF-partitioned) cosine-similarity store of chunk vectors.
+
+    Safe for concurrent use by threads and processes: writers serialize on an
+    flock, readers work on their own read-only mappings.
+    """
+
+    def __init__(
+        self,
+        directory: Path = MMAP_STORE_DIR,
+        dtype: str = MMAP_STORE_DTYPE,
+        ivf_min_vectors: int = MMAP_IVF_MIN_VECTORS,
+        ivf_probes: int = MMAP_IVF_PROBES,
+    ):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}. Choose from: {', '.join(_DTYPES)}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ivf_min_vectors = ivf_min_vectors
+        self.ivf_probes = max(1, ivf_probes)
+
+        self._conn = sqlite3.connect(str(self.directory / "meta.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Searches use their own connection per thread and never wait on writers
+        self._readers = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._map_lock = threading.Lock()
+        self._lock_file = open(self.directory / "write.lock", "a+")
+        self._mapping: Optional[_Mapping] = None
+        self._ivf: Optional[_IVF] = None
+        self._ivf_key: Optional[Tuple[int, int]] = None
+
+        with self._write_lock():
+            # A dtype fixed by existing data wins over the configured one
+            self.dtype = self._state().get("dtype") or dtype
+            if self.dtype != dtype:
+                logger.warning(f"Vector store at {self.directory} holds {self.dtype} vectors; ignoring {dtype}")
+            with self._conn:
+                self._conn.execute("INSERT OR IGNORE INTO state VALUES ('dtype', ?)", (self.dtype,))
+            self._repair()
+
+    # --- Locking and state ---
+
+    @contextmanager
+    def _write_lock(self):
+        """Excludes other writers in any process; re-entrant within a thread."""
+        with self._lock:
+            if fcntl is not None and not self._lock_depth:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if fcntl is not None and not self._lock_depth:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.directory / "meta.sqlite"), timeout=30, check_same_thread=False)
+            self._readers.conn = conn
+            self._reader_conns.append(conn)
+        return conn
+
+    def _state(self, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+        return dict((conn or self._conn).execute("SELECT key, value FROM state"))
+
+    def _set_state(self, **values):
+        self._conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)", values.items())
+
+    def _files(self, generation: int) -> Tuple[Path, Path]:
+        return self.directory / f"vectors-{generation}.{self.dtype}", self.directory / f"alive-{generation}.u8"
+
+    def _ivf_path(self, generation: int, version: int) -> Path:
+        return self.directory / f"ivf-{generation}-{version}.npz"
+
+    def _writable(self, generation: int, dim: int, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Read-write maps of a generation's files, grown to hold at least rows rows."""
+        vectors_path, alive_path = self._files(generation)
+        itemsize = np.dtype(_DTYPES[self.dtype]).itemsize
+        capacity = vectors_path.stat().st_size // (dim * itemsize) if vectors_path.exists() else 0
+        if capacity < max(rows, 1):
+            capacity = max(_MIN_CAPACITY, capacity)
+            while capacity < rows:
+                capacity *= 2
+            # Readers size their maps by the vectors file, so it grows last
+            with open(alive_path, "ab") as f:
+                f.truncate(capacity)
+            with open(vectors_path, "ab") as f:
+                f.truncate(capacity * dim * itemsize)
+        vectors = np.memmap(vectors_path, dtype=_DTYPES[self.dtype], mode="r+", shape=(capacity, dim))
+        alive = np.memmap(alive_path, dtype=np.uint8, mode="r+", shape=(capacity,))
+        return vectors, alive
+
+    def _repair(self):
+        """Marks exactly the committed rows alive (after a crash between the two)."""
+        state = self._state()
+        if "dim" not in state:
+            return
+        vectors, alive = self._writable(state["generation"], state["dim"], state["rows"])
+        rows = np.fromiter((r for (r,) in self._conn.execute("SELECT row FROM points")), dtype=np.int64)
+        expected = np.zeros(len(alive), dtype=np.uint8)
+        expected[rows] = 1
+        if not np.array_equal(alive, expected):
+            logger.warning(f"Repairing live-row mask of the vector store at {self.directory}")
+            alive[:] = expected
+            alive.flush()
+
+    # --- Writes ---
+
+    def add(self, ids: List[str], documents: List[str], embeddings, metadatas: List[Dict[str, Any]]):
+        """Appends (or replaces, by id) points."""
+        vectors = _normalize(embeddings).reshape(len(ids), -1)
+        with self._write_lock():
+            state = self._state()
+            dim = state.get("dim", vectors.shape[1])
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Vector store holds {dim}-dim vectors, got {vectors.shape[1]}")
+            generation = state.get("generation", 0)
+            start = state.get("rows", 0)
+            end = start + len(ids)
+
+            mat, alive = self._writable(generation, dim, end)
+            mat[start:end] = vectors
+            mat.flush()
+
+            placeholders = ",".join("?" * len(ids))
+            replaced = [r for (r,) in self._conn.execute(f"SELECT row FROM points WHERE id IN ({placeholders})", ids)]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO points (id, row, source, document, payload) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (_id, start + i, meta.get("source"), doc, json.dumps(meta))
+                        for i, (_id, doc, meta) in enumerate(zip(ids, documents, metadatas))
+                    ],
+                )
+                self._set_state(
+                    dim=dim, generation=generation, rows=end, live=state.get("live", 0) + len(ids) - len(replaced)
+                )
+            # Rows become visible to searches only once their metadata is committed
+            alive[replaced] = 0
+            alive[start:end] = 1
+            alive.flush()
+
+            self._maybe_compact(self._state())
+
+    def delete_source(self, source: str) -> int:
+        """Deletes all points of a source file; returns how many there were."""
+        with self._write_lock():
+            state = self._state()
+            rows = [r for (r,) in self._conn.execute("SELECT row FROM points WHERE source = ?", (source,))]
+            if not rows:
+                return 0
+            # Hidden from searches before their metadata disappears
+            _, alive = self._writable(state["generation"], state["dim"], state["rows"])
+            alive[rows] = 0
+            alive.flush()
+            with self._conn:
+                self._conn.execute("DELETE FROM points WHERE source = ?", (source,))
+                self._set_state(live=state["live"] - len(rows))
+            self._maybe_compact(self._state())
+            return len(rows)
+
+    def _maybe_compact(self, state: Dict[str, Any]):
+        live = state["live"]
+        dead = state["rows"] - live
+        if dead > max(_COMPACT_MIN_DEAD, live):
+            self._compact(state)
+        elif live >= self.ivf_min_vectors > 0:
+            ivf_rows = state.get("ivf_rows", 0)
+            if state["rows"] - ivf_rows > ivf_rows // 2:
+                self._train_ivf(state)
+
+    def _compact(self, state: Dict[str, Any]):
+        old_generation, dim = state["generation"], state["dim"]
+        generation = old_generation + 1
+        old_rows = np.array([r for (r,) in self._conn.execute("SELECT row FROM points ORDER BY row")], dtype=np.int64)
+        logger.info(f"Compacting vector store: {state['rows'] - len(old_rows)} dead rows, {len(old_rows)} live")
+
+        src, _ = self._writable(old_generation, dim, state["rows"])
+        mat, alive = self._writable(generation, dim, len(old_rows))
+        for start in range(0, len(old_rows), _SCAN_BLOCK_ROWS):
+            block = old_rows[start : start + _SCAN_BLOCK_ROWS]
+            mat[start : start + len(block)] = src[block]
+        mat.flush()
+        alive[: len(old_rows)] = 1
+        alive.flush()
+
+        with self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS remap (old INTEGER PRIMARY KEY, new INTEGER)")
+            self._conn.execute("DELETE FROM remap")
+            self._conn.executemany("INSERT INTO remap VALUES (?, ?)", ((int(r), i) for i, r in enumerate(old_rows)))
+            self._conn.execute("UPDATE points SET row = (SELECT new FROM remap WHERE old = points.row)")
+            self._set_state(generation=generation, rows=len(old_rows), live=len(old_rows), ivf_rows=0, ivf_version=0)
+
+        # Readers still mapping the old generation keep their (unlinked) files
+        for path in self._files(old_generation) + tuple(self.directory.glob(f"ivf-{old_generation}-*.npz")):
+            path.unlink(missing_ok=True)
+        if len(old_rows) >= self.ivf_min_vectors > 0:
+            self._train_ivf(self._state())
+
+    def _train_ivf(self, state: Dict[str, Any]):
+        generation, dim, rows = state["generation"], state["dim"], state["rows"]
+        mat, alive = self._writable(generation, dim, rows)
+        live_rows = np.flatnonzero(alive[:rows])
+        lists = max(1, int(np.sqrt(len(live_rows))))
+        logger.info(f"Training IVF index: {len(live_rows)} vectors, {lists} lists")
+
+        rng = np.random.default_rng(0)
+        centroids = _train_centroids(mat[live_rows], lists, rng)
+        labels = _assign(mat[:rows], centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(labels[order], np.arange(lists + 1)).astype(np.int64)
+
+        version = state.get("ivf_version", 0) + 1
+        _IVF(centroids, order, offsets, rows).save(self._ivf_path(generation, version))
+        with self._conn:
+            self._set_state(ivf_rows=rows, ivf_version=version)
+        self._ivf_path(generation, version - 1).unlink(missing_ok=True)
+
+    # --- Reads ---
+
+    def _view(self) -> Tuple[Optional[_Mapping], Optional[_IVF], Dict[str, Any]]:
+        state = self._state(self._reader())
+        if "dim" not in state:
+            return None, None, state
+        with self._map_lock:
+            mapping = self._mapping
+            if mapping is None or mapping.generation != state["generation"]:
+                mapping = _Mapping(self.directory, state["generation"], state["dim"], self.dtype)
+            mapping.refresh()
+            self._mapping = mapping
+
+            ivf_key = (state["generation"], state.get("ivf_version", 0))
+            if ivf_key != self._ivf_key:
+                path = self._ivf_path(*ivf_key)
+                self._ivf = _IVF.load(path) if ivf_key[1] and path.exists() else None
+                self._ivf_key = ivf_key
+            return mapping, self._ivf, state
+
+    def _scores(self, mapping: _Mapping, rows: Optional[np.ndarray], limit: int, query: np.ndarray):
+        """Scores of rows (all rows below limit when None), dead rows at -inf."""
+        if rows is None:
+            scores = np.empty(limit, dtype=np.float32)
+            for start in range(0, limit, _SCAN_BLOCK_ROWS):
+                block = np.asarray(mapping.vectors[start : min(start + _SCAN_BLOCK_ROWS, limit)], dtype=np.float32)
+                scores[start : start + len(block)] = block @ query
+            scores[mapping.alive[:limit] == 0] = -np.inf
+            return scores
+        scores = np.asarray(mapping.vectors[rows], dtype=np.float32) @ query
+        scores[mapping.alive[rows] == 0] = -np.inf
+        return scores
+
+    def query(self, embedding, n_results: int = 4) -> Dict[str, List]:
+        """The n_results points most similar to embedding, best first."""
+        for _ in range(3):
+            mapping, ivf, state = self._view()
+            if mapping is not None and mapping.vectors is None and state.get("rows"):
+                # The files of the generation just read were compacted away; read the state again
+                continue
+            if mapping is None or mapping.vectors is None or n_results <= 0:
+                return {"documents": [], "metadatas": [], "distances": []}
+            limit = min(state["rows"], len(mapping.vectors))
+            if not limit:
+                return {"documents": [], "metadatas": [], "distances": []}
+            query = _normalize(embedding).reshape(-1)
+
+            if ivf is not None and ivf.trained_rows <= limit:
+                # Rows appended since training are scanned in full; sorted
+                # rows read the mapped file front to back
+                rows = np.sort(np.concatenate([
+                    ivf.candidates(query, self.ivf_probes), np.arange(ivf.trained_rows, limit)
+                ]))
+                scores = self._scores(mapping, rows, limit, query)
+            else:
+                rows = None
+                scores = self._scores(mapping, None, limit, query)
+
+            k = min(n_results, len(scores))
+            if not k:
+                return {"documents": [], "metadatas": [], "distances": []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            top = top[np.isfinite(scores[top])]
+            hit_rows = top if rows is None else rows[top]
+
+            result = self._fetch(mapping.generation, [int(r) for r in hit_rows], scores[top])
+            if result is not None:
+                return result
+        raise RuntimeError("Vector store kept changing during the search")
+
+    def _fetch(self, generation: int, rows: List[int], scores: np.ndarray) -> Optional[Dict[str, List]]:
+        if not rows:
+            return {"documents": [], "metadatas": [], "distances": []}
+        placeholders = ",".join("?" * len(rows))
+        conn = self._reader()
+        # One read transaction, so the rows cannot be renumbered mid-lookup
+        conn.execute("BEGIN")
+        try:
+            if self._state(conn).get("generation") != generation:
+                return None
+            found = {
+                row: (document, payload)
+                for row, document, payload in conn.execute(
+                    f"SELECT row, document, payload FROM points WHERE row IN ({placeholders})", rows
+                )
+            }
+        finally:
+            conn.execute("COMMIT")
+
+        documents, metadatas, distances = [], [], []
+        for row, score in zip(rows, scores):
+            if row not in found:  # deleted since it was scored
+                continue
+            document, payload = found[row]
+            documents.append(document)
+            metadatas.append(json.loads(payload))
+            distances.append(float(score))
+        return {"documents": documents, "metadatas": metadatas, "distances": distances}
+
+    def count(self) -> int:
+        return self._state(self._reader()).get("live", 0)
+
+    def counts_by_source(self) -> Dict[str, int]:
+        return dict(
+            self._reader().execute("SELECT source, COUNT(*) FROM points WHERE source IS NOT NULL GROUP BY source")
+        )
+
+    def close(self):
+        with self._lock, self._map_lock:
+            self._mapping, self._ivf, self._ivf_key = None, None, None
+            for conn in self._reader_conns:
+                conn.close()
+            self._conn.close()
+            self._lock_file.close()
+
+
+_store: Optional[MmapVectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MmapVectorStore:
+    """Returns the process-wide memory-mapped vector store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MmapVectorStore()
+    return _store
+
+
+# --- qdrant_store function surface ---
+
+def add_documents(
+    ids: List[str], documents: List[str], embeddings, metadatas: List[Dict[str, Any]]
+):
+    if not ids:
+        return
+    current_file = metadatas[0].get("source") if metadatas else None
+    store = get_store()
+    # The store's cross-process lock also covers the catalog update, so a
+    # recount in another worker never sees one without the other
+    with store._write_lock():
+        store.add(ids, documents, embeddings, metadatas)
+        if current_file:
+            get_catalog().add_chunks(current_file, len(ids))
+    logger.info("Added %d documents to the vector store for %s", len(ids), current_file)
+
+
+def query_embeddings(embedding, n_results: int = 4):
+    return get_store().query(embedding, n_results)
+
+
+def get_collection_count():
+    return get_store().count()
+
+
+def delete_file(filename: str) -> int:
+    """Deletes all chunks of a source file; returns how many were deleted."""
+    store = get_store()
+    with store._write_lock():
+        count = store.delete_source(filename)
+        if count:
+            logger.info(f"Deleted {count} chunks for file {filename}")
+        get_catalog().remove(filename)
+    return count
+
+
+def count_chunks_by_source() -> Dict[str, int]:
+    return get_store().counts_by_source()
+
+
+def reconcile_catalog() -> int:
+    """Resets the catalog's chunk counts to the store's; returns the files corrected."""
+    catalog = get_catalog()
+    store = get_store()
+    with store._write_lock():
+        stamps = catalog.stamps()
+        return catalog.set_counts(store.counts_by_source(), stamps)
+
+
+def list_files_with_counts() -> List[Dict[str, Any]]:
+    return get_catalog().list_files()
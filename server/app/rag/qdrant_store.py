@@ -1,18 +1,29 @@
 from typing import List, Dict, Any, Optional
 import logging
-import json
-import os
-from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 import uuid
-from ..core.config import QDRANT_DIR, QDRANT_URL, QDRANT_API_KEY
+from ..core.config import (
+    QDRANT_DIR,
+    QDRANT_URL,
+    QDRANT_API_KEY,
+    QDRANT_UPSERT_BATCH_SIZE,
+    QDRANT_UPSERT_PARALLEL,
+    QDRANT_STORAGE_PROFILE,
+)
+from . import storage_profiles
+from .catalog import get_catalog
 
 logger = logging.getLogger(__name__)
 
 _COLLECTION_NAME = "thinkbook"
 _VECTOR_SIZE = 384  # Dimension for all-MiniLM-L6-v2
-_REGISTRY_PATH = Path(QDRANT_DIR) / "file_registry.json"
+_PROFILE = storage_profiles.get_storage_profile(QDRANT_STORAGE_PROFILE)
+# Local mode searches exhaustively and warns about search params
+_SEARCH_PARAMS = storage_profiles.search_params(_PROFILE) if QDRANT_URL else None
 
 def get_client() -> QdrantClient:
     """
@@ -36,13 +47,13 @@ def _ensure_collection():
     exists = any(c.name == _COLLECTION_NAME for c in collections)
     
     if not exists:
-        logger.info(f"Creating Qdrant collection '{_COLLECTION_NAME}'")
+        logger.info(f"Creating Qdrant collection '{_COLLECTION_NAME}' ({QDRANT_STORAGE_PROFILE} profile)")
         _client.create_collection(
             collection_name=_COLLECTION_NAME,
-            vectors_config=models.VectorParams(
-                size=_VECTOR_SIZE,
-                distance=models.Distance.COSINE
-            )
+            vectors_config=storage_profiles.vectors_config(_PROFILE, _VECTOR_SIZE),
+            hnsw_config=storage_profiles.hnsw_config(_PROFILE),
+            quantization_config=storage_profiles.quantization_config(_PROFILE),
+            on_disk_payload=_PROFILE.payload_on_disk,
         )
         # Create Payload Index for 'source' to speed up deletions/filtering
         _client.create_payload_index(
@@ -50,79 +61,106 @@ def _ensure_collection():
             field_name="source",
             field_schema=models.PayloadSchemaType.KEYWORD
         )
+    elif QDRANT_URL:
+        # Local mode has no index or quantization to migrate
+        _apply_storage_profile()
+
+def _apply_storage_profile():
+    """
+    Migrates an existing collection to the configured storage profile.
+    Qdrant rebuilds the index and quantized vectors in the background while
+    the collection keeps serving; payload storage changes apply to segments
+    written afterwards.
+    """
+    try:
+        config = _client.get_collection(_COLLECTION_NAME).config
+        drift = storage_profiles.profile_drift(config, _PROFILE)
+        if not drift:
+            return
+        
+        logger.info(
+            f"Migrating collection '{_COLLECTION_NAME}' to the {QDRANT_STORAGE_PROFILE} profile "
+            f"({', '.join(drift)})"
+        )
+        _client.update_collection(
+            collection_name=_COLLECTION_NAME,
+            vectors_config={"": models.VectorParamsDiff(on_disk=_PROFILE.vectors_on_disk)},
+            hnsw_config=storage_profiles.hnsw_config(_PROFILE),
+            quantization_config=storage_profiles.quantization_config(_PROFILE),
+            collection_params=models.CollectionParamsDiff(on_disk_payload=_PROFILE.payload_on_disk),
+        )
+    except Exception as e:
+        logger.error(f"Failed to migrate collection '{_COLLECTION_NAME}' to the {QDRANT_STORAGE_PROFILE} profile: {e}")
 
 # Initialize collection on module load (or lazily)
 _ensure_collection()
 
-# --- File Registry Helpers ---
-
-def _load_registry() -> Dict[str, int]:
-    if not _REGISTRY_PATH.exists():
-        return {}
-    try:
-        with open(_REGISTRY_PATH, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load registry: {e}")
-        return {}
+# --- Main Store Functions ---
 
-def _save_registry(registry: Dict[str, int]):
-    try:
-        # Ensure parent dir exists
-        _REGISTRY_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with open(_REGISTRY_PATH, "w") as f:
-            json.dump(registry, f)
-    except Exception as e:
-        logger.error(f"Failed to save registry: {e}")
+def _point_batches(
+    ids: List[str], documents: List[str], embeddings, metadatas: List[Dict[str, Any]]
+) -> List[models.Batch]:
+    """Splits chunks into columnar batches of at most QDRANT_UPSERT_BATCH_SIZE points."""
+    # One C-level conversion of the whole (n, dim) array instead of one per point
+    vectors = np.asarray(embeddings, dtype=np.float32).tolist()
+    batches = []
+    for start in range(0, len(ids), QDRANT_UPSERT_BATCH_SIZE):
+        end = start + QDRANT_UPSERT_BATCH_SIZE
+        # Built from known-good columns: skips pydantic's per-float validation
+        batches.append(models.Batch.model_construct(
+            # Convert string ID to deterministic UUID for Qdrant compatibility
+            ids=[str(uuid.uuid5(uuid.NAMESPACE_DNS, _id)) for _id in ids[start:end]],
+            vectors=vectors[start:end],
+            # Qdrant stores the chunk text in the payload (Chroma kept documents separate)
+            payloads=[{**meta, "document": doc} for meta, doc in zip(metadatas[start:end], documents[start:end])],
+        ))
+    return batches
 
-def _update_registry_add(filename: str, chunk_count: int):
-    registry = _load_registry()
-    registry[filename] = chunk_count
-    _save_registry(registry)
+_upsert_pool: Optional[ThreadPoolExecutor] = None
+_upsert_pool_lock = threading.Lock()
 
-def _remove_from_registry(filename: str):
-    registry = _load_registry()
-    if filename in registry:
-        del registry[filename]
-        _save_registry(registry)
+def _get_upsert_pool() -> ThreadPoolExecutor:
+    global _upsert_pool
+    if _upsert_pool is None:
+        with _upsert_pool_lock:
+            if _upsert_pool is None:
+                _upsert_pool = ThreadPoolExecutor(QDRANT_UPSERT_PARALLEL, thread_name_prefix="qdrant-upsert")
+    return _upsert_pool
 
-# --- Main Store Functions ---
+def _upsert_batches(batches: List[models.Batch]):
+    """
+    Sends batches without waiting for them to be applied, then waits on the
+    last one. A Qdrant server applies acknowledged updates in order, so the
+    final wait=True upsert is a barrier for all earlier batches.
+    """
+    *rest, last = batches
+    if QDRANT_URL and QDRANT_UPSERT_PARALLEL > 1 and len(rest) > 1:
+        # Requests overlap; each has been acknowledged when map() returns
+        list(_get_upsert_pool().map(
+            lambda batch: _client.upsert(collection_name=_COLLECTION_NAME, points=batch, wait=False), rest
+        ))
+    else:
+        # Local mode applies every upsert synchronously in this process
+        for batch in rest:
+            _client.upsert(collection_name=_COLLECTION_NAME, points=batch, wait=False)
+    _client.upsert(collection_name=_COLLECTION_NAME, points=last, wait=True)
 
 def add_documents(
     ids: List[str], documents: List[str], embeddings, metadatas: List[Dict[str, Any]]
 ):
-    points = []
-    # Assumes all docs in this batch belong to the same file for registry purposes
+    if not ids:
+        return
+    # Assumes all docs in this batch belong to the same file for catalog purposes
     # But strictly we should check.
     # In RagService, we process one file at a time, so taking the first metadata source is safe.
     current_file = metadatas[0].get("source") if metadatas else "unknown"
 
-    for i, _id in enumerate(ids):
-        # embeddings[i] might be numpy array
-        vector = embeddings[i].tolist() if hasattr(embeddings[i], "tolist") else embeddings[i]
-        
-        # Combine document text into metadata ("page_content" is standard convention, or just keep "text")
-        # Chroma kept document separate, Qdrant stores it in payload
-        payload = metadatas[i].copy()
-        payload["document"] = documents[i]
-        
-        # Convert string ID to deterministic UUID for Qdrant compatibility
-        point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, _id))
-        
-        points.append(models.PointStruct(
-            id=point_id, 
-             vector=vector,
-            payload=payload
-        ))
-    
-    _client.upsert(
-        collection_name=_COLLECTION_NAME,
-        points=points
-    )
+    batches = _point_batches(ids, documents, embeddings, metadatas)
+    _upsert_batches(batches)
     
     if current_file != "unknown":
-        _update_registry_add(current_file, len(ids))
-        
+        get_catalog().add_chunks(current_file, len(ids))
+    
     logger.info("Added %d documents to Qdrant collection for %s", len(ids), current_file)
 
 def query_embeddings(embedding, n_results: int = 4):
@@ -132,6 +170,7 @@ def query_embeddings(embedding, n_results: int = 4):
         collection_name=_COLLECTION_NAME,
         query=query_vector,
         limit=n_results,
+        search_params=_SEARCH_PARAMS,
         with_payload=True
     ).points
     
@@ -187,17 +226,12 @@ def delete_file(filename: str) -> int:
         )
         logger.info(f"Deleted {count} chunks for file {filename}")
         
-    # Always try to remove from registry even if db count is 0 (cleanup)
-    _remove_from_registry(filename)
-        
+    # Always try to remove from the catalog even if db count is 0 (cleanup)
+    get_catalog().remove(filename)
+    
     return count
 
-def list_files_with_counts() -> List[Dict[str, Any]]:
-    """
-    Aggregates unique files and their chunk counts.
-    Always validates against actual Qdrant database to ensure consistency.
-    """
-    # Always scan the actual database to ensure accuracy
+def _scroll_counts() -> Dict[str, int]:
     file_counts = {}
     
     offset = None
@@ -220,7 +254,46 @@ def list_files_with_counts() -> List[Dict[str, Any]]:
         if offset is None:
             break
     
-    # Sync registry with actual database state
-    _save_registry(file_counts)
-            
-    return [{"name": k, "chunks": v} for k, v in file_counts.items()]
+    return file_counts
+
+def count_chunks_by_source() -> Dict[str, int]:
+    """
+    Counts chunks per source file.
+    Uses an exact facet count on the 'source' payload index, and falls back to
+    scrolling the whole collection on servers without the facet API.
+    """
+    # The limit must exceed the number of distinct files for the result to be complete
+    limit = 2 * len(get_catalog()) + 1000
+    try:
+        hits = _client.facet(
+            collection_name=_COLLECTION_NAME, key="source", limit=limit, exact=True
+        ).hits
+    except Exception as e:
+        logger.warning(f"Facet count unavailable ({e}); scrolling the collection")
+        return _scroll_counts()
+    
+    if len(hits) >= limit:
+        return _scroll_counts()
+    return {str(hit.value): hit.count for hit in hits}
+
+def reconcile_catalog() -> int:
+    """
+    Resets the catalog's chunk counts to the counts stored in Qdrant.
+    Returns the number of files whose entry was added, changed or dropped.
+    
+    Files written while Qdrant is being counted keep their catalog entry
+    (set_counts compares against stamps taken before the count), so no lock
+    is held against concurrent uploads and deletes.
+    """
+    catalog = get_catalog()
+    stamps = catalog.stamps()
+    counts = count_chunks_by_source()
+    return catalog.set_counts(counts, stamps)
+
+def list_files_with_counts() -> List[Dict[str, Any]]:
+    """
+    Lists indexed files with their chunk counts and ingest details.
+    Served from the catalog, which add_documents and delete_file keep current
+    (and the catalog reconciler periodically checks against Qdrant).
+    """
+    return get_catalog().list_files()
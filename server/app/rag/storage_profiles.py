@@ -0,0 +1,124 @@
+"""
+Named Qdrant storage profiles: how vectors, payloads and the HNSW graph are
+laid out between RAM and disk, how vectors are quantized, and how hard a
+search looks.
+
+Every profile keeps int8 scalar-quantized vectors for the first pass of a
+search and rescores the best candidates with the original float32 vectors,
+fetching oversampling * limit candidates so that quantization error does not
+change the top results. (Binary quantization loses too much at 384 dims.)
+
+    low-memory   originals, HNSW graph and payloads on disk; only the int8
+                 vectors (a quarter of float32) stay in RAM
+    balanced     originals on disk, int8 vectors, graph and payloads in RAM
+    low-latency  everything in RAM, a denser graph and a wider search
+
+Local mode (no THINKBOOK_QDRANT_URL) searches by brute force and ignores all
+of this; profiles take effect on a Qdrant server.
+"""
+
+from typing import List, NamedTuple, Optional
+
+from qdrant_client.http import models
+
+
+class StorageProfile(NamedTuple):
+    """Collection layout and search settings for one memory/latency trade-off."""
+    vectors_on_disk: bool
+    payload_on_disk: bool
+    quantized_in_ram: bool
+    hnsw_m: int
+    hnsw_ef_construct: int
+    hnsw_on_disk: bool
+    search_ef: int
+    oversampling: float
+
+
+STORAGE_PROFILES = {
+    "low-memory": StorageProfile(
+        vectors_on_disk=True,
+        payload_on_disk=True,
+        quantized_in_ram=True,
+        hnsw_m=16,
+        hnsw_ef_construct=100,
+        hnsw_on_disk=True,
+        search_ef=64,
+        oversampling=2.0,
+    ),
+    "balanced": StorageProfile(
+        vectors_on_disk=True,
+        payload_on_disk=False,
+        quantized_in_ram=True,
+        hnsw_m=16,
+        hnsw_ef_construct=100,
+        hnsw_on_disk=False,
+        search_ef=128,
+        oversampling=1.5,
+    ),
+    "low-latency": StorageProfile(
+        vectors_on_disk=False,
+        payload_on_disk=False,
+        quantized_in_ram=True,
+        hnsw_m=32,
+        hnsw_ef_construct=256,
+        hnsw_on_disk=False,
+        search_ef=256,
+        oversampling=1.5,
+    ),
+}
+
+
+def get_storage_profile(name: str) -> StorageProfile:
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {name}. Choose from: {', '.join(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+
+# --- Qdrant settings ---
+
+def vectors_config(profile: StorageProfile, size: int) -> models.VectorParams:
+    return models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=profile.vectors_on_disk)
+
+
+def hnsw_config(profile: StorageProfile) -> models.HnswConfigDiff:
+    return models.HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct, on_disk=profile.hnsw_on_disk)
+
+
+def quantization_config(profile: StorageProfile) -> models.ScalarQuantization:
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=0.99, always_ram=profile.quantized_in_ram
+        )
+    )
+
+
+def search_params(profile: StorageProfile) -> models.SearchParams:
+    return models.SearchParams(
+        hnsw_ef=profile.search_ef,
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=profile.oversampling),
+    )
+
+
+def profile_drift(config: models.CollectionConfig, profile: StorageProfile) -> List[str]:
+    """Names the settings in which an existing collection differs from a profile."""
+    drift = []
+    vectors = config.params.vectors
+    if bool(vectors.on_disk) != profile.vectors_on_disk:
+        drift.append("vectors on_disk")
+    if bool(config.params.on_disk_payload) != profile.payload_on_disk:
+        drift.append("payload on_disk")
+
+    hnsw = config.hnsw_config
+    if (hnsw.m, hnsw.ef_construct, bool(hnsw.on_disk)) != (
+        profile.hnsw_m, profile.hnsw_ef_construct, profile.hnsw_on_disk
+    ):
+        drift.append("hnsw_config")
+
+    quantization: Optional[models.ScalarQuantization] = config.quantization_config
+    if not isinstance(quantization, models.ScalarQuantization):
+        drift.append("quantization")
+    elif (quantization.scalar.type, bool(quantization.scalar.always_ram)) != (
+        models.ScalarType.INT8, profile.quantized_in_ram
+    ):
+        drift.append("quantization")
+    return drift
@@ -0,0 +1,41 @@
+"""
+The vector store used by the app, chosen with THINKBOOK_VECTOR_STORE:
+"qdrant" (app.rag.qdrant_store) or "mmap" (app.rag.mmap_store). Both expose
+the same functions; only the selected backend is imported, so the mmap
+store never opens (and locks) the local Qdrant directory.
+"""
+
+from ..core.config import VECTOR_STORE
+
+if VECTOR_STORE == "qdrant":
+    from .qdrant_store import (
+        add_documents,
+        query_embeddings,
+        get_collection_count,
+        delete_file,
+        count_chunks_by_source,
+        reconcile_catalog,
+        list_files_with_counts,
+    )
+elif VECTOR_STORE == "mmap":
+    from .mmap_store import (
+        add_documents,
+        query_embeddings,
+        get_collection_count,
+        delete_file,
+        count_chunks_by_source,
+        reconcile_catalog,
+        list_files_with_counts,
+    )
+else:
+    raise ValueError(f"Unknown vector store: {VECTOR_STORE}. Choose from: qdrant, mmap")
+
+__all__ = [
+    "add_documents",
+    "query_embeddings",
+    "get_collection_count",
+    "delete_file",
+    "count_chunks_by_source",
+    "reconcile_catalog",
+    "list_files_with_counts",
+]
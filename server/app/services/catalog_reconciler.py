@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process reconciles (set_counts is safe against that)
+    fcntl = None
+
+from ..core.config import CATALOG_PATH, CATALOG_RECONCILE_INTERVAL_SECONDS
+from ..rag.vector_store import reconcile_catalog
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogReconciler:
+    """
+    Periodically checks the catalog's chunk counts against the vector store.
+
+    Counts are kept current on every add and delete, so this only repairs
+    drift (e.g. a crash between a vector store write and its catalog update, or a
+    collection indexed before the catalog existed). It runs once at startup
+    and then every interval seconds, never more than one pass at a time.
+
+    Every API worker starts a reconciler, but only the one holding an flock
+    on lock_path runs passes; the others retry each interval and take over
+    if the leader exits.
+    """
+
+    def __init__(
+        self,
+        reconcile_fn: Callable[[], int] = reconcile_catalog,
+        interval: float = CATALOG_RECONCILE_INTERVAL_SECONDS,
+        lock_path: Path = CATALOG_PATH.with_name(CATALOG_PATH.name + ".reconcile.lock"),
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.reconcile_fn = reconcile_fn
+        self.interval = interval
+        self.lock_path = Path(lock_path)
+        self._sleep = sleep
+        self._lock_file = None
+        self.leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.corrected = 0
+        self.last_run_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Starts the reconciliation loop (disabled when interval <= 0)."""
+        if self.interval <= 0:
+            logger.info("Catalog reconciliation disabled")
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Catalog reconciliation every {self.interval:.0f}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._lock_file is not None:
+            # Closing releases the flock for another worker
+            self._lock_file.close()
+            self._lock_file = None
+        self.leader = False
+
+    # --- Public API ---
+
+    async def run_once(self) -> int:
+        """Runs one reconciliation pass and returns the number of corrected files."""
+        async with self._lock:
+            started = time.perf_counter()
+            try:
+                corrected = await asyncio.to_thread(self.reconcile_fn)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                self.last_run_at = time.time()
+                self.last_duration = time.perf_counter() - started
+            self.runs += 1
+            self.corrected += corrected
+            self.last_error = None
+        if corrected:
+            logger.warning(f"Catalog reconciliation corrected {corrected} files")
+        return corrected
+
+    def stats(self) -> Dict[str, Any]:
+        """Reconciliation counters since start."""
+        return {
+            "runs": self.runs,
+            "corrected_files": self.corrected,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": 1000 * self.last_duration if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "interval_seconds": self.interval,
+            "leader": self.leader,
+        }
+
+    # --- Internals ---
+
+    def _try_lead(self) -> bool:
+        if self.leader:
+            return True
+        if fcntl is None:
+            self.leader = True
+            return True
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.leader = True
+        logger.info("This process reconciles the catalog")
+        return True
+
+    async def _loop(self):
+        while True:
+            if self._try_lead():
+                try:
+                    await self.run_once()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Catalog reconciliation failed: {e}")
+            await self._sleep(self.interval)
+
+
+catalog_reconciler = CatalogReconciler()
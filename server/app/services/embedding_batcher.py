@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import QUERY_BATCH_MAX_SIZE, QUERY_BATCH_WINDOW_MS
+from ..rag.embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+# (query text, caller's future, time it was queued)
+_Pending = Tuple[str, asyncio.Future, float]
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent query embeddings into batched encode calls.
+
+    The first pending query opens a window of window_ms; every query that
+    arrives within it (up to max_batch) is embedded by one embed_fn call in a
+    worker thread, and each caller's future is resolved with its own vector.
+    Queries that arrive while a batch is being encoded form the next batch.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray] = embed_queries,
+        max_batch: int = QUERY_BATCH_MAX_SIZE,
+        window_ms: float = QUERY_BATCH_WINDOW_MS,
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Starts the batching worker on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker_task = asyncio.create_task(self._worker())
+        logger.info(
+            f"Embedding batcher started (window {self.window * 1000:.1f} ms, max batch {self.max_batch})"
+        )
+
+    async def stop(self):
+        """Stops the worker; queries still queued fail with CancelledError."""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            await asyncio.gather(self._worker_task, return_exceptions=True)
+            self._worker_task = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+
+    # --- Public API ---
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Returns the embedding (dim,) of one query, batched with concurrent ones."""
+        if self._worker_task is None or self._loop is not asyncio.get_running_loop():
+            await self.start()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queue wait metrics since start."""
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "mean_queue_wait_ms": 1000 * self.total_wait / self.queries if self.queries else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait,
+            "window_ms": 1000 * self.window,
+            "max_batch": self.max_batch,
+        }
+
+    # --- Internals ---
+
+    async def _collect(self) -> List[_Pending]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (e.g. a closed stream) are not embedded
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                wait = started - queued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            self.batches += 1
+            self.queries += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+            try:
+                vectors = await asyncio.to_thread(self.embed_fn, [text for text, _, _ in batch])
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Batched query embedding failed ({len(batch)} queries): {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+query_batcher = EmbeddingBatcher()
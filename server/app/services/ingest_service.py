@@ -0,0 +1,597 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set
+
+from ..core.config import INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_JOBS_PATH, UPLOAD_DIR
+from ..parsers import cached_extract_segments, cached_extract_text
+from ..core.utils import hash_file
+from ..parsers.text_cache import invalidate_file, parser_key
+from ..rag.catalog import get_catalog
+from ..rag.vector_store import delete_file as delete_file_qdrant
+from .rag_service import RagService
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+# Stages reported while a job is running, in order
+STAGES = ["queued", "parsing", "chunking", "embedding", "indexing", "done"]
+
+_FINISHED = {STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED}
+_MAX_FINISHED_JOBS = 200
+
+# How often idle workers look for jobs submitted in other processes, and
+# running jobs are heartbeated, checked for cancel requests and have their
+# stage saved
+_POLL_SECONDS = 1.0
+# A running job whose worker missed heartbeats this long is run again
+_LEASE_SECONDS = 30.0
+# How often cancel_file checks whether the file's jobs have stopped
+_CANCEL_WAIT_SECONDS = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    sha256 TEXT,
+    reindex INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    chunks INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    -- Re-index job that already dropped the file's previous chunks
+    replacing INTEGER NOT NULL DEFAULT 0,
+    -- Queue that claimed the running job, and when it last confirmed it is alive
+    owner TEXT,
+    heartbeat_at REAL,
+    -- Cancel asked for in another process, applied by the owner
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+"""
+
+_COLUMNS = (
+    "job_id", "file", "sha256", "reindex", "status", "stage", "chunks", "error",
+    "created_at", "updated_at", "replacing",
+)
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue is at capacity."""
+    pass
+
+
+class JobStateError(Exception):
+    """Raised when an operation is not valid for the job's current state."""
+    pass
+
+
+class JobStore:
+    """
+    Ingestion jobs in SQLite (WAL mode), shared by every API worker.
+
+    Jobs are claimed atomically, so each one runs in exactly one worker;
+    a running job is leased to its worker and handed to another one if the
+    worker stops heartbeating.
+    """
+
+    def __init__(self, path: Path, lease: float = _LEASE_SECONDS):
+        self.path = Path(path)
+        self.lease = lease
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are explicit (BEGIN IMMEDIATE), so check-then-write is atomic
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _job(row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job["reindex"] = bool(job["reindex"])
+        job["replacing"] = bool(job["replacing"])
+        return job
+
+    def insert(self, job: Dict[str, Any], max_queued: int):
+        """
+        Adds a queued job.
+
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting.
+        """
+        with self._transaction() as conn:
+            queued = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)
+            ).fetchone()[0]
+            if queued >= max_queued:
+                raise QueueFullError(
+                    f"Ingestion queue is full ({queued} jobs waiting). Try again later."
+                )
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [job[c] for c in _COLUMNS],
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def list_jobs(self, filename: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All jobs (or those of one file), most recent first."""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        args = ()
+        if filename is not None:
+            query += " WHERE file = ?"
+            args = (filename,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC", args).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Marks the oldest queued job as running in owner and returns it."""
+        now = time.time()
+        with self._transaction() as conn:
+            # Jobs of workers that died (or hung) start over
+            expired = conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'queued', replacing = 0, owner = NULL, "
+                "heartbeat_at = NULL, cancel_requested = 0, updated_at = ? "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (STATUS_QUEUED, now, STATUS_RUNNING, now - self.lease),
+            ).rowcount
+            if expired:
+                logger.info(f"Re-queued {expired} ingestion job(s) of a worker that stopped")
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (STATUS_QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._job(row)
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, heartbeat_at = ?, updated_at = ? WHERE job_id = ?",
+                (STATUS_RUNNING, owner, now, now, job["job_id"]),
+            )
+        job.update(status=STATUS_RUNNING, updated_at=now)
+        return job
+
+    def save(self, job: Dict[str, Any], owner: str):
+        """Writes a job's state; only its owner may."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, chunks = ?, error = ?, replacing = ?, updated_at = ? "
+                "WHERE job_id = ? AND owner = ?",
+                (job["status"], job["stage"], job["chunks"], job["error"], job["replacing"],
+                 job["updated_at"], job["job_id"], owner),
+            )
+            if job["status"] in _FINISHED:
+                self._prune(conn)
+
+    def heartbeat(self, owner: str, job_ids: List[str], stages: List[Dict[str, Any]]) -> List[str]:
+        """
+        Renews owner's leases on job_ids and saves the given jobs' stages;
+        returns the ids of owner's jobs that another process asked to cancel.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET stage = ?, updated_at = ? WHERE job_id = ? AND owner = ?",
+                [(job["stage"], job["updated_at"], job["job_id"], owner) for job in stages],
+            )
+            conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND owner = ? AND status = ?",
+                [(now, job_id, owner, STATUS_RUNNING) for job_id in job_ids],
+            )
+            requested = [
+                row[0] for row in conn.execute(
+                    "SELECT job_id FROM jobs WHERE owner = ? AND cancel_requested = 1", (owner,)
+                )
+            ]
+            if requested:
+                conn.execute("UPDATE jobs SET cancel_requested = 0 WHERE owner = ?", (owner,))
+        return requested
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Cancels a job that no worker claimed yet."""
+        with self._transaction() as conn:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED),
+            ).rowcount
+            if cancelled:
+                self._prune(conn)
+        return bool(cancelled)
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Asks the owner of a running job that is not writing to the index to cancel it."""
+        with self._transaction() as conn:
+            return bool(conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ? "
+                "AND stage != 'indexing' AND replacing = 0",
+                (job_id, STATUS_RUNNING),
+            ).rowcount)
+
+    def release(self, owner: str):
+        """Re-queues owner's running jobs (which start over) when it stops."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'queued', replacing = 0, owner = NULL, "
+                "heartbeat_at = NULL, cancel_requested = 0, updated_at = ? WHERE owner = ? AND status = ?",
+                (STATUS_QUEUED, time.time(), owner, STATUS_RUNNING),
+            )
+
+    @staticmethod
+    def _prune(conn):
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?, ?) AND job_id NOT IN ("
+            "SELECT job_id FROM jobs WHERE status IN (?, ?, ?) ORDER BY updated_at DESC LIMIT ?)",
+            (*_FINISHED, *_FINISHED, _MAX_FINISHED_JOBS),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IngestQueue:
+    """
+    Bounded queue that parses, chunks, embeds and indexes uploads in the
+    background.
+
+    Jobs live in a JobStore at INGEST_JOBS_PATH that every API worker
+    shares: a job submitted to one worker may run in any of them, is visible
+    (and can be cancelled) from all of them, and jobs interrupted by a
+    restart or a crashed worker are picked up again.
+    """
+
+    def __init__(
+        self,
+        workers: int = INGEST_WORKERS,
+        max_queued: int = INGEST_QUEUE_SIZE,
+        jobs_path: Path = INGEST_JOBS_PATH,
+        poll_interval: float = _POLL_SECONDS,
+        lease: float = _LEASE_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.jobs_path = jobs_path
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._store: Optional[JobStore] = None
+        self._owner = uuid.uuid4().hex
+        # Jobs running here; their stage changes are saved on the next heartbeat
+        self._running: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._unsaved: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Opens the job store and starts the workers."""
+        self._store = await asyncio.to_thread(JobStore, self.jobs_path, self.lease)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        self._worker_tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info(f"Ingestion queue started with {self.workers} worker(s)")
+
+    async def stop(self):
+        """Stops the workers. Their unfinished jobs are re-queued for any worker."""
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._store is not None:
+            await asyncio.to_thread(self._store.release, self._owner)
+            self._store.close()
+            self._store = None
+        self._running.clear()
+        self._unsaved.clear()
+
+    # --- Public API ---
+
+    async def submit(
+        self, filename: str, sha256: Optional[str] = None, reindex: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Queues an already-stored upload for ingestion.
+
+        With `reindex`, the file's existing chunks are replaced and the file is
+        kept if the job fails or is cancelled.
+
+        Raises:
+            QueueFullError: If INGEST_QUEUE_SIZE jobs are already waiting.
+        """
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "file": filename,
+            "sha256": sha256,
+            "reindex": reindex,
+            "status": STATUS_QUEUED,
+            "stage": "queued",
+            "chunks": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "replacing": False,
+        }
+        await asyncio.to_thread(self._store.insert, job, self.max_queued)
+        self._wakeup.set()
+        logger.info(f"Queued ingestion job {job['job_id']} for {filename}")
+        return dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._running.get(job_id)
+        if job is not None:
+            return dict(job)
+        return await asyncio.to_thread(self._store.get, job_id)
+
+    async def list_jobs(self) -> List[Dict[str, Any]]:
+        """Returns all known jobs, most recent first."""
+        jobs = await asyncio.to_thread(self._store.list_jobs)
+        # Jobs running here are more current than their last saved stage
+        return [dict(self._running.get(j["job_id"], j)) for j in jobs]
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancels a queued or running job and removes its uploaded file.
+
+        A running job's task is cancelled, which takes effect at its next
+        await: a parse running in the parser pool is stopped by killing its
+        worker, but with THINKBOOK_PARSER_POOL_ENABLED=false the parser thread
+        finishes the file first. The job reports `cancelled` once its task
+        has stopped and any chunks it already indexed are deleted. A job
+        running in another API worker is cancelled by that worker within
+        a poll interval, unless it has started writing to the index by then.
+
+        Returns None if the job does not exist.
+
+        Raises:
+            JobStateError: If the job already finished or is writing to the index.
+        """
+        job = await self.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in _FINISHED:
+            raise JobStateError(f"Job {job_id} already {job['status']}")
+        if job["stage"] == "indexing" or job["replacing"]:
+            raise JobStateError(f"Job {job_id} is already writing to the index")
+
+        if job_id in self._running:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+            return job
+        if job["status"] == STATUS_QUEUED:
+            if await asyncio.to_thread(self._store.cancel_queued, job_id):
+                self._discard(job)
+                return await self.get(job_id)
+        elif await asyncio.to_thread(self._store.request_cancel, job_id):
+            return job
+        # Claimed or moved on to indexing meanwhile
+        return await self.cancel(job_id)
+
+    async def cancel_file(self, filename: str):
+        """
+        Cancels every unfinished job for the given file and waits until they
+        have stopped, so that none of them writes chunks after the caller
+        deletes the file's. A job writing a batch to the index is cancelled
+        once that batch has landed.
+
+        Raises:
+            JobStateError: If a re-index job already dropped the file's
+                previous chunks and is writing the new ones.
+        """
+        while True:
+            jobs = [
+                dict(self._running.get(j["job_id"], j))
+                for j in await asyncio.to_thread(self._store.list_jobs, filename)
+            ]
+            jobs = [j for j in jobs if j["status"] not in _FINISHED]
+            if not jobs:
+                return
+            for job in jobs:
+                if job["replacing"]:
+                    raise JobStateError(
+                        f"Job {job['job_id']} is re-indexing {filename}; try again once it finishes"
+                    )
+            for job in jobs:
+                try:
+                    await self.cancel(job["job_id"])
+                except JobStateError:
+                    pass  # Finished or writing a batch meanwhile; checked again below
+            await asyncio.sleep(_CANCEL_WAIT_SECONDS)
+
+    # --- Workers ---
+
+    async def _worker(self, n: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(self._store.claim, self._owner)
+            except Exception as e:
+                logger.error(f"Ingestion worker {n} failed to claim a job: {e}")
+                job = None
+            if job is None:
+                # Submissions here wake the workers; those to other processes are polled for
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            job_id = job["job_id"]
+            self._running[job_id] = job
+            try:
+                if not (UPLOAD_DIR / job["file"]).exists():
+                    await self._finish(job, STATUS_FAILED, error="Uploaded file is missing")
+                    continue
+
+                task = asyncio.create_task(self._run(job))
+                self._tasks[job_id] = task
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    if self._stopping:
+                        raise
+                    logger.info(f"Ingestion job {job_id} cancelled")
+                    await self._finish(job, STATUS_CANCELLED)
+                    self._discard(job)
+                    if not job["reindex"]:
+                        # Earlier batches may already be indexed
+                        await asyncio.to_thread(delete_file_qdrant, job["file"])
+                finally:
+                    self._tasks.pop(job_id, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {n} crashed on job {job_id}: {e}")
+                if job["status"] not in _FINISHED:
+                    await self._finish(job, STATUS_FAILED, error="Internal processing error")
+            finally:
+                # Jobs left running when stopping are re-queued by stop()
+                self._running.pop(job_id, None)
+                self._unsaved.discard(job_id)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._running:
+                continue
+            stages = [dict(self._running[j]) for j in self._unsaved if j in self._running]
+            self._unsaved.clear()
+            try:
+                requested = await asyncio.to_thread(
+                    self._store.heartbeat, self._owner, list(self._running), stages
+                )
+            except Exception as e:
+                logger.error(f"Failed to save ingestion job state: {e}")
+                continue
+            for job_id in requested:
+                try:
+                    await self.cancel(job_id)
+                except JobStateError as e:
+                    logger.info(f"Ignored cancel request: {e}")
+
+    async def _run(self, job: Dict[str, Any]):
+        filename = job["file"]
+        path = UPLOAD_DIR / filename
+        self._set_stage(job, "parsing")
+
+        try:
+            if job["reindex"]:
+                # Parse fully before dropping the old chunks so that a file
+                # that fails to parse keeps its previous index
+                text = await cached_extract_text(path, sha256=job["sha256"])
+                if not text or not text.strip():
+                    raise ValueError(
+                        "No text extracted from file. File might be empty or unsupported."
+                    )
+                job.update(replacing=True, updated_at=time.time())
+                await asyncio.to_thread(self._store.save, dict(job), self._owner)
+                await asyncio.to_thread(delete_file_qdrant, filename)
+
+            result = await RagService.process_segments(
+                cached_extract_segments(path, sha256=job["sha256"]),
+                filename,
+                on_stage=lambda stage: self._set_stage(job, stage),
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion failed for {filename}: {e}")
+            await self._finish(job, STATUS_FAILED, error=str(e) or "Internal processing error")
+            if not job["reindex"]:
+                self._remove_upload(filename)
+                await asyncio.to_thread(delete_file_qdrant, filename)
+            return
+
+        job["chunks"] = result.get("chunks")
+        try:
+            await asyncio.to_thread(self._record_ingest, filename, job["sha256"])
+        except Exception as e:
+            logger.error(f"Failed to record {filename} in the catalog: {e}")
+        await self._finish(job, STATUS_DONE)
+
+    # --- Helpers ---
+
+    def _set_stage(self, job: Dict[str, Any], stage: str):
+        # Saved with the next heartbeat rather than on the event loop here
+        job.update(stage=stage, updated_at=time.time())
+        self._unsaved.add(job["job_id"])
+
+    async def _finish(self, job: Dict[str, Any], status: str, error: Optional[str] = None):
+        job.update(
+            status=status,
+            stage="done" if status == STATUS_DONE else job["stage"],
+            error=error,
+            updated_at=time.time(),
+        )
+        try:
+            await asyncio.to_thread(self._store.save, dict(job), self._owner)
+        except Exception as e:
+            logger.error(f"Failed to save ingestion job {job['job_id']}: {e}")
+
+    @staticmethod
+    def _record_ingest(filename: str, sha256: Optional[str]):
+        path = UPLOAD_DIR / filename
+        parser, version = parser_key(path) or (None, None)
+        get_catalog().record_ingest(
+            filename,
+            # Re-index jobs are submitted without a hash
+            sha256=sha256 or hash_file(path),
+            size_bytes=path.stat().st_size,
+            parser=parser,
+            parser_version=version,
+        )
+
+    def _discard(self, job: Dict[str, Any]):
+        """Removes the upload of a cancelled job (re-index jobs keep their file)."""
+        if not job["reindex"]:
+            self._remove_upload(job["file"])
+
+    @staticmethod
+    def _remove_upload(filename: str):
+        path = UPLOAD_DIR / filename
+        if path.exists():
+            path.unlink()
+        invalidate_file(filename)
+
+
+# Shared queue used by the API
+ingest_queue = IngestQueue()
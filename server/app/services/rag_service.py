@@ -3,11 +3,14 @@ import logging
 import time
 import json
 from pathlib import Path
-from typing import Dict, Any, List, AsyncIterator
+from typing import Dict, Any, List, AsyncIterator, Callable, Optional
 
-from ..rag.chunking import chunk_text
-from ..rag.embeddings import embed_texts, get_embedding_model
-from ..rag.qdrant_store import add_documents, query_embeddings, get_collection_count
+from ..core.config import INGEST_BATCH_CHUNKS
+from ..parsers.base import Segment
+from ..rag.chunking import StreamChunker
+from ..rag.embeddings import embed_documents
+from ..rag.vector_store import add_documents, query_embeddings, get_collection_count
+from .embedding_batcher import query_batcher
 from .llm_service import LLMService
 
 logger = logging.getLogger(__name__)
@@ -16,35 +19,119 @@ class RagService:
     """Service to handle RAG operations: indexing and querying."""
 
     @staticmethod
-    async def process_document(text: str, filename: str) -> Dict[str, Any]:
+    async def process_document(
+        text: str,
+        filename: str,
+        on_stage: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
         """
         Processes a document text: chunks, embeds, and indexes it.
         
         Args:
             text: The full text of the document.
             filename: The name of the file (used for metadata/IDs).
+            on_stage: Optional callback invoked with the name of each stage
+                ("chunking", "embedding", "indexing") as it starts.
             
         Returns:
             Dict: Status info.
         """
-        # CPU-bound chunking
-        chunks = chunk_text(text)
-        if not chunks:
-            raise ValueError("Chunking failed or produced zero chunks")
+        async def single():
+            yield text, {}
+
+        return await RagService.process_segments(single(), filename, on_stage=on_stage)
+
+    @staticmethod
+    async def process_segments(
+        segments: AsyncIterator[Segment],
+        filename: str,
+        on_stage: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Chunks, embeds, and indexes a document while it is still being parsed.
+        
+        Chunks are flushed to the index every INGEST_BATCH_CHUNKS chunks, so
+        embedding the first pages overlaps with parsing the rest, and each
+        batch is written to Qdrant while the next one is being embedded. Chunks run
+        across segment boundaries exactly as if the text had been chunked
+        whole; each chunk gets the metadata (e.g. {"page": 3}) of the segment
+        it starts in.
+        
+        Args:
+            segments: (text, metadata) segments in document order.
+            filename: The name of the file (used for metadata/IDs).
+            on_stage: Optional callback invoked with the name of each stage
+                ("parsing", "chunking", "embedding", "indexing") as it starts.
+            
+        Returns:
+            Dict: Status info.
+        """
+        def stage(name: str):
+            if on_stage:
+                on_stage(name)
 
         base_name = Path(filename).stem
-        ids = [f"{base_name}::chunk_{i}" for i in range(len(chunks))]
-        metadatas = [{"source": filename, "chunk_index": i} for i in range(len(chunks))]
+        chunks: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        total = 0
+        # Upsert of the previous batch, still running while the next is embedded
+        indexing: Optional[asyncio.Task] = None
 
-        # Run embedding in thread pool as it might be CPU intensive (or GPU)
-        # and we don't want to block the event loop
-        embeddings = await asyncio.to_thread(embed_texts, chunks)
+        async def flush():
+            nonlocal total, chunks, metadatas, indexing
+            if not chunks:
+                return
+            ids = [f"{base_name}::chunk_{total + i}" for i in range(len(chunks))]
 
-        # IO/DB bound
-        await asyncio.to_thread(add_documents, ids, chunks, embeddings, metadatas)
-        
-        logger.info("File %s processed: %d chunks", filename, len(chunks))
-        return {"status": "ok", "file": filename, "chunks": len(chunks)}
+            # Run embedding in thread pool as it might be CPU intensive (or GPU)
+            # and we don't want to block the event loop
+            stage("embedding")
+            embeddings = await asyncio.to_thread(embed_documents, chunks)
+
+            # IO/DB bound
+            stage("indexing")
+            if indexing is not None:
+                # Shielded: cancelling the ingest must not abandon a running upsert
+                await asyncio.shield(indexing)
+            indexing = asyncio.create_task(
+                asyncio.to_thread(add_documents, ids, chunks, embeddings, metadatas)
+            )
+            total += len(chunks)
+            chunks, metadatas = [], []
+
+        def collect(cut):
+            for chunk, meta in cut:
+                metadatas.append({"source": filename, "chunk_index": total + len(chunks), **meta})
+                chunks.append(chunk)
+
+        chunker = StreamChunker()
+        extracted = False
+        try:
+            async for text, meta in segments:
+                extracted = extracted or bool(text.strip())
+                # CPU-bound chunking
+                stage("chunking")
+                collect(chunker.feed(text, meta))
+                if len(chunks) >= INGEST_BATCH_CHUNKS:
+                    await flush()
+                stage("parsing")
+            collect(chunker.finish())
+            await flush()
+            if indexing is not None:
+                await asyncio.shield(indexing)
+        finally:
+            if indexing is not None and not indexing.done():
+                # A batch already handed to Qdrant must land before the caller
+                # cleans up the file after a failure or cancellation
+                await asyncio.gather(indexing, return_exceptions=True)
+
+        if not extracted:
+            raise ValueError("No text extracted from file. File might be empty or unsupported.")
+        if not total:
+            raise ValueError("Chunking failed or produced zero chunks")
+
+        logger.info("File %s processed: %d chunks", filename, total)
+        return {"status": "ok", "file": filename, "chunks": total}
 
     @staticmethod
     async def query(query_text: str, k: int = 4) -> Dict[str, Any]:
@@ -67,11 +154,8 @@ class RagService:
         k = min(k, count)
         logger.info(f"Querying with k={k} (total docs: {count})")
 
-        # 1. Embed query
-        model = get_embedding_model() # This is fast access to cached obj
-        # encode is blocking
-        q_emb = await asyncio.to_thread(model.encode, [query_text], convert_to_numpy=True)
-        q_emb = q_emb[0]
+        # 1. Embed query (batched with concurrent queries, cached)
+        q_emb = await query_batcher.embed(query_text)
 
         # 2. Retrieve relevant docs from Chroma
         results = await asyncio.to_thread(query_embeddings, q_emb, n_results=k)
@@ -141,9 +225,7 @@ class RagService:
         k = min(k, count)
 
         # Embed query
-        model = get_embedding_model()
-        q_emb = await asyncio.to_thread(model.encode, [query_text], convert_to_numpy=True)
-        q_emb = q_emb[0]
+        q_emb = await query_batcher.embed(query_text)
 
         # Retrieve relevant docs
         results = await asyncio.to_thread(query_embeddings, q_emb, n_results=k)
@@ -0,0 +1,100 @@
+"""
+Chunking throughput: offset-sliced token windows vs. decoding every window.
+
+"decode" is the previous implementation, which looked up the encoding on
+every call and decoded each (overlapping) window; "offsets" is
+chunk_text_tokenwise; "stream" feeds the same text through a StreamChunker
+in 64K pieces.
+
+Usage (from server/):
+    python -m benchmarks.bench_chunking [--sizes 10000 100000 1000000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+import tiktoken
+
+from app.core.config import CHUNK_OVERLAP_TOKENS, CHUNK_SIZE_TOKENS
+from app.rag.chunking import StreamChunker, chunk_text_tokenwise
+
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from at or an "
+    "document retrieval embedding vector index page section table figure results "
+    "température naïve café Größe 東京 数据 — “quoted” 42 3.14 2024-01-01"
+).split()
+
+
+def decode_chunks(text: str, chunk_size: int, overlap: int):
+    enc = tiktoken.get_encoding("cl100k_base")
+    tokens = enc.encode(text)
+    chunks = []
+    start = 0
+    n = len(tokens)
+    while start < n:
+        end = min(start + chunk_size, n)
+        chunks.append(enc.decode(tokens[start:end]))
+        if end >= n:
+            break
+        start = end - overlap
+    return chunks
+
+
+def offset_chunks(text: str, chunk_size: int, overlap: int):
+    return chunk_text_tokenwise(text, chunk_size, overlap)
+
+
+def stream_chunks(text: str, chunk_size: int, overlap: int):
+    chunker = StreamChunker(chunk_size, overlap)
+    chunks = []
+    for i in range(0, len(text), 65536):
+        chunks.extend(chunk for chunk, _ in chunker.feed(text[i : i + 65536]))
+    chunks.extend(chunk for chunk, _ in chunker.finish())
+    return chunks
+
+
+METHODS = {"decode": decode_chunks, "offsets": offset_chunks, "stream": stream_chunks}
+
+
+def make_text(size: int, rng: random.Random) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word + ("\n\n" if rng.random() < 0.02 else " "))
+        length += len(words[-1])
+    return "".join(words)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Load the BPE ranks and token tables once so no timing includes them
+    chunk_text_tokenwise("warm up", CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS)
+    rng = random.Random(0)
+
+    print(f"chunk size {CHUNK_SIZE_TOKENS} tokens, overlap {CHUNK_OVERLAP_TOKENS}")
+    print(f"{'chars':>10} {'method':<8} {'chunks':>7} {'best (s)':>9} {'chunks/s':>10} {'speedup':>8}")
+    for size in args.sizes:
+        text = make_text(size, rng)
+        baseline = None
+        for name, method in METHODS.items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                chunks = method(text, CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            baseline = baseline or best
+            print(
+                f"{size:>10} {name:<8} {len(chunks):>7} {best:>9.4f} "
+                f"{len(chunks) / best:>10.0f} {baseline / best:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Embedding throughput and memory of each backend (torch, onnx, onnx-int8).
+
+Each backend runs in a fresh process so that peak RSS covers only its own
+model and runtime. Throughput is measured on chunk-sized texts, after one
+warm-up batch.
+
+Usage (from server/):
+    python -m benchmarks.bench_embeddings [--texts 512] [--batch-size 32] [backend ...]
+"""
+
+import argparse
+import multiprocessing as mp
+import resource
+import sys
+import time
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(backend: str, texts: int, batch_size: int) -> dict:
+    from app.rag.embeddings import get_embedding_model
+
+    corpus = [
+        f"Section {i}. The quarterly report describes revenue, costs and the outlook for "
+        f"product line {i % 17}, with tables comparing regions and a summary of risks. " * 6
+        for i in range(texts)
+    ]
+
+    start = time.perf_counter()
+    model = get_embedding_model(backend)
+    load_time = time.perf_counter() - start
+    model.encode(corpus[:batch_size], batch_size=batch_size, show_progress_bar=False)
+
+    start = time.perf_counter()
+    model.encode(corpus, batch_size=batch_size, show_progress_bar=False)
+    elapsed = time.perf_counter() - start
+    return {"load": load_time, "rate": texts / elapsed, "rss": _peak_rss_mb()}
+
+
+def main():
+    from app.core.config import EMBEDDING_MODEL
+    from app.rag.embeddings import EMBEDDING_BACKENDS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backends", nargs="*", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"Model: {EMBEDDING_MODEL}, {args.texts} texts, batch size {args.batch_size}")
+    print(f"{'backend':<10} {'load (s)':>9} {'texts/s':>9} {'peak RSS (MB)':>14}")
+    ctx = mp.get_context("spawn")
+    for backend in args.backends:
+        with ctx.Pool(1) as pool:
+            try:
+                result = pool.apply(_run, (backend, args.texts, args.batch_size))
+            except Exception as e:
+                print(f"{backend:<10} failed: {e}")
+                continue
+        print(f"{backend:<10} {result['load']:>9.2f} {result['rate']:>9.1f} {result['rss']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Ingest throughput of Qdrant upserts: one PointStruct per chunk in a single
+waiting upsert ("per-point", the previous add_documents) against bounded
+columnar batches sent with wait=False and a final barrier ("batched").
+
+Runs against local mode (a temporary directory) and, with --url, a Qdrant
+server. Each target runs in a fresh process, writes to its own
+"thinkbook_bench" collection and deletes it afterwards.
+
+Usage (from server/):
+    python -m benchmarks.bench_qdrant_upsert [--chunks 10000] [--url http://localhost:6333]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+import uuid
+
+
+def _run(target: str, url: str, chunks: int, batch_size: int, parallel: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Configure the store before the app reads its settings
+        os.environ["THINKBOOK_QDRANT_DIR"] = os.path.join(tmp, "qdrant")
+        os.environ["THINKBOOK_CATALOG_PATH"] = os.path.join(tmp, "catalog.sqlite")
+        os.environ["THINKBOOK_QDRANT_UPSERT_BATCH_SIZE"] = str(batch_size)
+        os.environ["THINKBOOK_QDRANT_UPSERT_PARALLEL"] = str(parallel)
+        if target == "server":
+            os.environ["THINKBOOK_QDRANT_URL"] = url
+        else:
+            os.environ.pop("THINKBOOK_QDRANT_URL", None)
+
+        import numpy as np
+        from qdrant_client.http import models
+        from app.rag import qdrant_store
+
+        qdrant_store._COLLECTION_NAME = "thinkbook_bench"
+        client = qdrant_store._client
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((chunks, qdrant_store._VECTOR_SIZE)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        documents = [f"Chunk {i} of the benchmark document. " * 20 for i in range(chunks)]
+
+        def per_point(ids, metadatas):
+            points = [
+                models.PointStruct(
+                    id=str(uuid.uuid5(uuid.NAMESPACE_DNS, _id)),
+                    vector=vectors[i].tolist(),
+                    payload={**metadatas[i], "document": documents[i]},
+                )
+                for i, _id in enumerate(ids)
+            ]
+            client.upsert(collection_name=qdrant_store._COLLECTION_NAME, points=points)
+
+        def batched(ids, metadatas):
+            qdrant_store.add_documents(ids, documents, vectors, metadatas)
+
+        results = {}
+        for mode, upsert in (("per-point", per_point), ("batched", batched)):
+            if client.collection_exists(qdrant_store._COLLECTION_NAME):
+                client.delete_collection(qdrant_store._COLLECTION_NAME)
+            qdrant_store._ensure_collection()
+
+            source = f"bench-{mode}.txt"
+            ids = [f"bench-{mode}::chunk_{i}" for i in range(chunks)]
+            metadatas = [{"source": source, "chunk_index": i} for i in range(chunks)]
+            start = time.perf_counter()
+            upsert(ids, metadatas)
+            elapsed = time.perf_counter() - start
+
+            count = client.count(collection_name=qdrant_store._COLLECTION_NAME).count
+            assert count == chunks, f"{mode}: {count} of {chunks} points stored"
+            results[mode] = chunks / elapsed
+
+        client.delete_collection(qdrant_store._COLLECTION_NAME)
+        client.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--url", help="Qdrant server URL; local mode only when omitted")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    targets = ["local"] + (["server"] if args.url else [])
+    print(f"{args.chunks} chunks, batch size {args.batch_size}, {args.parallel} parallel requests (server)")
+    print(f"{'target':<8} {'per-point (chunks/s)':>21} {'batched (chunks/s)':>19} {'speedup':>8}")
+    ctx = mp.get_context("spawn")
+    for target in targets:
+        with ctx.Pool(1) as pool:
+            try:
+                r = pool.apply(_run, (target, args.url, args.chunks, args.batch_size, args.parallel))
+            except Exception as e:
+                print(f"{target:<8} failed: {e}")
+                continue
+        print(f"{target:<8} {r['per-point']:>21.0f} {r['batched']:>19.0f} {r['batched'] / r['per-point']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Query embedding throughput under concurrency, with and without micro-batching.
+
+"unbatched" encodes every query on its own (max batch 1); "batched" uses the
+configured THINKBOOK_QUERY_BATCH_WINDOW_MS / THINKBOOK_QUERY_BATCH_MAX_SIZE.
+The embedding cache is bypassed so every query reaches the model.
+
+Usage (from server/):
+    python -m benchmarks.bench_query_batching [--queries 256] [--concurrency 1 8 32 64]
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import QUERY_BATCH_MAX_SIZE, QUERY_BATCH_WINDOW_MS
+from app.rag.embeddings import _encode
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+async def run(batcher: EmbeddingBatcher, queries: int, concurrency: int) -> float:
+    texts = iter(f"benchmark question number {i} about the uploaded documents?" for i in range(queries))
+
+    async def client():
+        for text in texts:
+            await batcher.embed(text)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await batcher.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+
+    # Load the model outside the timings
+    _encode(["warm up"])
+
+    print(f"window {QUERY_BATCH_WINDOW_MS} ms, max batch {QUERY_BATCH_MAX_SIZE}, {args.queries} queries")
+    print(f"{'clients':>7} {'mode':<10} {'queries/s':>10} {'mean batch':>11} {'mean wait (ms)':>15}")
+    for concurrency in args.concurrency:
+        modes = {
+            "unbatched": EmbeddingBatcher(_encode, max_batch=1, window_ms=0),
+            "batched": EmbeddingBatcher(_encode),
+        }
+        for name, batcher in modes.items():
+            elapsed = asyncio.run(run(batcher, args.queries, concurrency))
+            stats = batcher.stats()
+            print(
+                f"{concurrency:>7} {name:<10} {args.queries / elapsed:>10.1f} "
+                f"{stats['mean_batch_size']:>11.1f} {stats['mean_queue_wait_ms']:>15.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
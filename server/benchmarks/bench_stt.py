@@ -0,0 +1,56 @@
+"""
+Real-time factor of each speech-to-text backend.
+
+RTF = transcription time / audio duration; below 1.0 is faster than real time.
+
+Usage (from server/):
+    python -m benchmarks.bench_stt [--audio tests/sample_audio.wav] [--repeat 3] [backend ...]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from app.core.config import STT_COMPUTE_TYPE, WHISPER_MODEL
+from app.parsers.stt import BACKENDS, FASTER_WHISPER_AVAILABLE, get_stt_backend
+from app.parsers.transcription import SAMPLE_RATE, read_audio
+
+DEFAULT_AUDIO = Path(__file__).resolve().parent.parent / "tests" / "sample_audio.wav"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backends", nargs="*", default=list(BACKENDS))
+    parser.add_argument("--audio", type=Path, default=DEFAULT_AUDIO)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    audio = read_audio(args.audio)
+    duration = len(audio) / SAMPLE_RATE
+    print(f"Audio: {args.audio.name} ({duration:.1f}s), model: {WHISPER_MODEL}")
+    print(f"{'backend':<16} {'load (s)':>9} {'best (s)':>9} {'RTF':>7}  transcript")
+
+    for name in args.backends:
+        if name == "faster-whisper" and not FASTER_WHISPER_AVAILABLE:
+            print(f"{name:<16} skipped: faster-whisper is not installed")
+            continue
+
+        start = time.perf_counter()
+        backend = get_stt_backend(name)
+        load_time = time.perf_counter() - start
+
+        # The first call includes one-off warm-up costs
+        text = backend.transcribe(audio)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            backend.transcribe(audio)
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        label = f"{name} ({STT_COMPUTE_TYPE})" if name == "faster-whisper" else name
+        print(f"{label:<16} {load_time:>9.2f} {best:>9.2f} {best / duration:>7.3f}  {text[:40]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Vector store backends on the same corpus: local-mode Qdrant against the
+memory-mapped store searched exhaustively ("mmap-flat") and through its IVF
+index ("mmap-ivf"), in float16. Reports ingest rate, query latency and
+recall@k against an exact float32 search.
+
+Vectors are clustered random unit vectors, so recall is a lower bound for
+real embeddings. Each target runs in a fresh process on a temporary
+directory.
+
+Usage (from server/):
+    python -m benchmarks.bench_vector_store [--vectors 100000] [--queries 200] [--k 4]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+_DIM = 384  # all-MiniLM-L6-v2, the collection size qdrant_store creates
+
+
+def _corpus(vectors: int, queries: int, dim: int):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, vectors // 500), dim)).astype(np.float32)
+    data = centers[rng.integers(0, len(centers), vectors)] + 0.5 * rng.standard_normal((vectors, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    picks = rng.integers(0, vectors, queries)
+    q = data[picks] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return data, q
+
+
+def _run(target: str, vectors: int, queries: int, k: int, probes: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Configure the store before the app reads its settings
+        os.environ["THINKBOOK_QDRANT_DIR"] = os.path.join(tmp, "qdrant")
+        os.environ["THINKBOOK_CATALOG_PATH"] = os.path.join(tmp, "catalog.sqlite")
+        os.environ["THINKBOOK_MMAP_STORE_DIR"] = os.path.join(tmp, "vector_store")
+        os.environ["THINKBOOK_MMAP_STORE_DTYPE"] = "float16"
+        os.environ["THINKBOOK_MMAP_IVF_MIN_VECTORS"] = "1" if target == "mmap-ivf" else "0"
+        os.environ["THINKBOOK_MMAP_IVF_PROBES"] = str(probes)
+        os.environ["THINKBOOK_VECTOR_STORE"] = "qdrant" if target == "qdrant" else "mmap"
+        os.environ.pop("THINKBOOK_QDRANT_URL", None)
+
+        import numpy as np
+        from app.rag import vector_store
+
+        data, q = _corpus(vectors, queries, _DIM)
+        exact = np.argsort(-(q @ data.T), axis=1)[:, :k]
+
+        start = time.perf_counter()
+        for offset in range(0, vectors, 10000):
+            batch = data[offset : offset + 10000]
+            rows = range(offset, offset + len(batch))
+            vector_store.add_documents(
+                [f"bench::chunk_{i}" for i in rows],
+                [str(i) for i in rows],
+                batch,
+                [{"source": "bench.txt", "chunk_index": i} for i in rows],
+            )
+        ingest = vectors / (time.perf_counter() - start)
+
+        vector_store.query_embeddings(q[0], n_results=k)  # load the index / warm the page cache
+        latencies, hits = [], 0
+        for i in range(queries):
+            start = time.perf_counter()
+            result = vector_store.query_embeddings(q[i], n_results=k)
+            latencies.append(time.perf_counter() - start)
+            hits += len({int(d) for d in result["documents"]} & set(exact[i].tolist()))
+
+        latencies = np.array(latencies) * 1000
+        return {
+            "ingest": ingest,
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "recall": hits / (queries * k),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--probes", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{args.vectors} vectors, {args.queries} queries, recall@{args.k}, {args.probes} IVF probes")
+    print(f"{'target':<10} {'ingest (vec/s)':>15} {'p50 (ms)':>9} {'p95 (ms)':>9} {'recall':>7}")
+    ctx = mp.get_context("spawn")
+    for target in ("qdrant", "mmap-flat", "mmap-ivf"):
+        with ctx.Pool(1) as pool:
+            try:
+                r = pool.apply(_run, (target, args.vectors, args.queries, args.k, args.probes))
+            except Exception as e:
+                print(f"{target:<10} failed: {e}")
+                continue
+        print(f"{target:<10} {r['ingest']:>15.0f} {r['p50']:>9.2f} {r['p95']:>9.2f} {r['recall']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Unit tests for the document catalog."""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.rag.catalog import Catalog
+from app.services.catalog_reconciler import CatalogReconciler
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """A catalog in a temporary directory, without a legacy registry."""
+    cat = Catalog(tmp_path / "catalog.sqlite", legacy_registry=None)
+    yield cat
+    cat.close()
+
+
+class TestCatalog:
+    """Tests for per-file catalog entries."""
+    
+    def test_chunks_accumulate(self, catalog):
+        """Test that batches of one file add up."""
+        catalog.add_chunks("a.pdf", 64)
+        catalog.add_chunks("a.pdf", 10)
+        catalog.add_chunks("b.txt", 3)
+        
+        assert catalog.counts() == {"a.pdf": 74, "b.txt": 3}
+    
+    def test_record_ingest(self, catalog):
+        """Test that ingest details are stored next to the chunk count."""
+        catalog.add_chunks("a.pdf", 5)
+        catalog.record_ingest("a.pdf", sha256="abc", size_bytes=1234, parser="PDFParser", parser_version=2)
+        
+        entry = catalog.get("a.pdf")
+        assert entry["chunks"] == 5
+        assert entry["sha256"] == "abc"
+        assert entry["size_bytes"] == 1234
+        assert entry["parser"] == "PDFParser"
+        assert entry["parser_version"] == 2
+        assert entry["ingested_at"] is not None
+    
+    def test_remove(self, catalog):
+        """Test that removed files disappear from listings."""
+        catalog.add_chunks("a.pdf", 5)
+        catalog.remove("a.pdf")
+        catalog.remove("missing.pdf")
+        
+        assert catalog.get("a.pdf") is None
+        assert catalog.list_files() == []
+    
+    def test_set_counts(self, catalog):
+        """Test that reconciled counts replace stale ones and keep metadata."""
+        catalog.add_chunks("a.pdf", 5)
+        catalog.record_ingest("a.pdf", sha256="abc")
+        catalog.add_chunks("gone.txt", 1)
+        
+        assert catalog.set_counts({"a.pdf": 7, "new.txt": 2}, catalog.stamps()) == 3
+        
+        assert catalog.counts() == {"a.pdf": 7, "new.txt": 2}
+        assert catalog.get("a.pdf")["sha256"] == "abc"
+    
+    def test_set_counts_skips_files_written_meanwhile(self, catalog):
+        """Test that writes made after the stamps were taken win over the recount."""
+        catalog.add_chunks("a.pdf", 5)
+        catalog.add_chunks("b.txt", 3)
+        stamps = catalog.stamps()
+        # Another worker adds a batch, re-ingests a file and deletes one while the store is counted
+        catalog.add_chunks("a.pdf", 5)
+        catalog.record_ingest("b.txt", sha256="def")
+        catalog.add_chunks("c.txt", 4)
+        catalog.remove("c.txt")
+        
+        assert catalog.set_counts({"a.pdf": 5, "c.txt": 4}, stamps) == 0
+        
+        assert catalog.counts() == {"a.pdf": 10, "b.txt": 3}
+        assert catalog.get("b.txt")["sha256"] == "def"
+    
+    def test_concurrent_updates_are_not_lost(self, catalog):
+        """Test that increments from many threads all land."""
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: catalog.add_chunks("a.pdf", 1), range(200)))
+        
+        assert catalog.counts() == {"a.pdf": 200}
+    
+    def test_sees_writes_from_other_processes(self, catalog):
+        """Test that the read cache is refreshed after another connection writes."""
+        catalog.add_chunks("a.pdf", 1)
+        assert catalog.counts() == {"a.pdf": 1}
+        
+        other = Catalog(catalog.path, legacy_registry=None)
+        other.add_chunks("b.txt", 2)
+        other.close()
+        
+        assert catalog.counts() == {"a.pdf": 1, "b.txt": 2}
+
+
+class TestLegacyRegistry:
+    """Tests for importing file_registry.json."""
+    
+    def test_migrates_once(self, tmp_path):
+        """Test that registry counts are imported and the JSON file is retired."""
+        registry = tmp_path / "file_registry.json"
+        registry.write_text(json.dumps({"a.pdf": 12, "b.txt": 3}))
+        
+        catalog = Catalog(tmp_path / "catalog.sqlite", legacy_registry=registry)
+        
+        assert catalog.counts() == {"a.pdf": 12, "b.txt": 3}
+        assert not registry.exists()
+        assert (tmp_path / "file_registry.json.migrated").exists()
+        catalog.close()
+    
+    def test_does_not_overwrite_existing_catalog(self, tmp_path):
+        """Test that a registry found next to a populated catalog is ignored."""
+        catalog = Catalog(tmp_path / "catalog.sqlite", legacy_registry=None)
+        catalog.add_chunks("a.pdf", 5)
+        catalog.close()
+        registry = tmp_path / "file_registry.json"
+        registry.write_text(json.dumps({"old.pdf": 9}))
+        
+        catalog = Catalog(tmp_path / "catalog.sqlite", legacy_registry=registry)
+        
+        assert catalog.counts() == {"a.pdf": 5}
+        catalog.close()
+
+
+
+class TestCatalogReconciler:
+    """Tests for the background reconciliation job."""
+    
+    def make_sleep(self, sleeps, wake):
+        """A sleep that records its interval and returns when wake is set."""
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            await wake.wait()
+            wake.clear()
+        return sleep
+    
+    async def wait_for(self, condition):
+        while not condition():
+            await asyncio.sleep(0)
+    
+    def test_runs_at_start_and_on_interval(self, tmp_path):
+        """Test that a pass runs immediately and then once per interval."""
+        calls, sleeps = [], []
+        
+        async def run():
+            wake = asyncio.Event()
+            reconciler = CatalogReconciler(
+                lambda: calls.append(1) or 0, interval=60,
+                lock_path=tmp_path / "reconcile.lock", sleep=self.make_sleep(sleeps, wake),
+            )
+            await reconciler.start()
+            for ticks in (1, 2):
+                await self.wait_for(lambda: len(sleeps) == ticks)
+                wake.set()
+            await self.wait_for(lambda: len(sleeps) == 3)
+            await reconciler.stop()
+            return reconciler.stats()
+        
+        stats = asyncio.run(run())
+        assert len(calls) == 3
+        assert sleeps == [60, 60, 60]
+        assert stats["runs"] == 3
+    
+    def test_only_the_leader_reconciles(self, tmp_path):
+        """Test that of two workers sharing a catalog, one runs passes until it stops."""
+        calls = {"a": 0, "b": 0}
+        
+        def count(name):
+            calls[name] += 1
+            return 0
+        
+        async def run():
+            sleeps = {"a": [], "b": []}
+            wake_b = asyncio.Event()
+            lock_path = tmp_path / "reconcile.lock"
+            a = CatalogReconciler(lambda: count("a"), interval=60, lock_path=lock_path,
+                                  sleep=self.make_sleep(sleeps["a"], asyncio.Event()))
+            b = CatalogReconciler(lambda: count("b"), interval=60, lock_path=lock_path,
+                                  sleep=self.make_sleep(sleeps["b"], wake_b))
+            await a.start()
+            await self.wait_for(lambda: sleeps["a"])
+            await b.start()
+            await self.wait_for(lambda: sleeps["b"])
+            assert (a.leader, b.leader) == (True, False)
+            
+            # b takes over on its next tick once a has stopped
+            await a.stop()
+            wake_b.set()
+            await self.wait_for(lambda: len(sleeps["b"]) == 2)
+            assert b.leader
+            await b.stop()
+        
+        asyncio.run(run())
+        assert calls == {"a": 1, "b": 1}
+    
+    def test_counts_corrections_and_errors(self):
+        """Test that corrected files and failures are reported in stats."""
+        results = [3, RuntimeError("qdrant down")]
+        
+        def reconcile():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        
+        async def run():
+            reconciler = CatalogReconciler(reconcile, interval=0)
+            assert await reconciler.run_once() == 3
+            with pytest.raises(RuntimeError):
+                await reconciler.run_once()
+            return reconciler.stats()
+        
+        stats = asyncio.run(run())
+        assert stats["runs"] == 1
+        assert stats["corrected_files"] == 3
+        assert stats["last_error"] == "qdrant down"
+    
+    def test_disabled(self):
+        """Test that a zero interval starts no background task."""
+        async def run():
+            reconciler = CatalogReconciler(lambda: pytest.fail("reconciled"), interval=0)
+            await reconciler.start()
+            await asyncio.sleep(0.01)
+            await reconciler.stop()
+        
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
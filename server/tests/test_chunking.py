@@ -1,7 +1,45 @@
 """Unit tests for text chunking functionality."""
 
+import random
+
 import pytest
-from app.rag.chunking import chunk_text, count_tokens
+from app.rag import chunking
+from app.rag.chunking import chunk_segments, chunk_stream, chunk_text, count_tokens
+
+# cl100k_base pre-tokenizer; the vocabulary itself is not needed offline
+CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+|"""
+    r""" ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+
+
+@pytest.fixture
+def local_encoding(monkeypatch):
+    """A small byte-level BPE using the cl100k pre-tokenizer."""
+    tiktoken = pytest.importorskip("tiktoken")
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in (b" t", b"th", b"he", b" the", b"en", b"ce", b"  ", b"\n\n", b" n", b"er"):
+        ranks[merge] = len(ranks)
+    enc = tiktoken.Encoding(name="test", pat_str=CL100K_PATTERN, mergeable_ranks=ranks, special_tokens={})
+    monkeypatch.setattr(chunking, "_TIKTOKEN_AVAILABLE", True)
+    monkeypatch.setattr(chunking, "_get_encoding", lambda: enc)
+    return enc
+
+
+@pytest.fixture
+def no_tokenizer(monkeypatch):
+    """Forces the character-based fallback."""
+    monkeypatch.setattr(chunking, "_TIKTOKEN_AVAILABLE", False)
+
+
+def _sample_text(rng: random.Random) -> str:
+    words = ["the", "then", "sentence", "number", "42.", "l'été", "(x)", "\n\n", "  ", "\t", "we've", "ünïcode"]
+    return " ".join(rng.choice(words) for _ in range(3000))
+
+
+def _random_split(text: str, rng: random.Random):
+    cuts = sorted(rng.sample(range(1, len(text)), 40))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
 
 
 class TestChunking:
@@ -61,5 +99,127 @@ class TestChunking:
             assert len(chunks[1]) > 0
 
 
+
+class TestOffsetChunking:
+    """Tests for slicing token windows by character offset."""
+    
+    @staticmethod
+    def _decode_chunks(enc, text, size, overlap):
+        """Reference: decode every token window."""
+        tokens = enc.encode_ordinary(text)
+        return [enc.decode(tokens[s:e]) for s, e in chunking._windows(len(tokens), size, overlap)]
+    
+    def test_matches_decoded_windows(self, local_encoding):
+        """Test slices equal decoding each window for ASCII text."""
+        text = " ".join(f"Sentence number {i}, then the next." for i in range(2000))
+        expected = self._decode_chunks(local_encoding, text, 120, 20)
+        assert chunking.chunk_text_tokenwise(text, 120, 20) == expected
+    
+    def test_chunks_are_slices_of_text(self, local_encoding):
+        """Test multi-byte characters split by a boundary are kept whole."""
+        text = _sample_text(random.Random(1))
+        chunks = chunking.chunk_text_tokenwise(text, 50, 0)
+        
+        assert "".join(chunks) == text
+        assert all("\ufffd" not in chunk for chunk in chunks)
+    
+    def test_overlap_tokens(self, local_encoding):
+        """Test consecutive chunks share exactly the overlap tokens."""
+        text = " ".join(f"Sentence number {i}." for i in range(500))
+        chunks = chunking.chunk_text_tokenwise(text, 100, 25)
+        
+        for a, b in zip(chunks, chunks[1:]):
+            overlap = local_encoding.encode_ordinary(a)[-25:]
+            assert local_encoding.encode_ordinary(b)[:25] == overlap
+    
+    def test_batched_encoding_is_exact(self, local_encoding, monkeypatch):
+        """Test encoding long texts in parts yields the same tokens."""
+        monkeypatch.setattr(chunking, "_ENCODE_BATCH_CHARS", 500)
+        monkeypatch.setattr(chunking, "_ENCODE_THREADS", 2)
+        text = _sample_text(random.Random(2))
+        assert chunking._encode(local_encoding, text) == local_encoding.encode_ordinary(text)
+    
+    def test_count_tokens(self, local_encoding):
+        """Test token counts use the cached encoding."""
+        assert count_tokens("the then") == len(local_encoding.encode_ordinary("the then"))
+
+
+class TestStreamingChunker:
+    """Tests for chunk_stream / chunk_segments."""
+    
+    @pytest.mark.parametrize("seed", range(5))
+    def test_tokenwise_matches_whole_text(self, local_encoding, seed):
+        """Test streamed token chunks equal chunking the concatenated text."""
+        rng = random.Random(seed)
+        text = _sample_text(rng)
+        pieces = _random_split(text, rng)
+        
+        expected = chunking.chunk_text_tokenwise(text, chunking.CHUNK_SIZE_TOKENS, chunking.CHUNK_OVERLAP_TOKENS)
+        assert len(expected) > 1
+        assert list(chunk_stream(pieces)) == expected
+    
+    @pytest.mark.parametrize("seed", range(5))
+    def test_charwise_matches_whole_text(self, no_tokenizer, seed):
+        """Test the character fallback streams the same chunks as chunk_text."""
+        rng = random.Random(seed)
+        text = _sample_text(rng)
+        pieces = _random_split(text, rng)
+        
+        expected = chunk_text(text)
+        assert len(expected) > 1
+        assert list(chunk_stream(pieces)) == expected
+    
+    def test_single_characters(self, local_encoding):
+        """Test feeding one character at a time."""
+        text = _sample_text(random.Random(7))[:6000]
+        expected = chunk_text(text)
+        assert list(chunk_stream(iter(text))) == expected
+    
+    def test_chunks_yielded_before_input_ends(self, local_encoding):
+        """Test chunks are produced while input is still arriving."""
+        consumed = []
+        
+        def pieces():
+            for i in range(2000):
+                consumed.append(i)
+                yield f"sentence number {i}. "
+        
+        stream = chunk_stream(pieces())
+        next(stream)
+        assert len(consumed) < 2000
+    
+    def test_empty_input(self, local_encoding):
+        """Test no chunks for empty input."""
+        assert list(chunk_stream([])) == []
+        assert list(chunk_stream(["", ""])) == []
+    
+    def test_segment_metadata(self, local_encoding):
+        """Test each chunk carries the metadata of the segment it starts in."""
+        rng = random.Random(3)
+        pages = [(_sample_text(rng)[:4000], {"page": n}) for n in range(1, 4)]
+        
+        chunks = list(chunk_segments(pages))
+        assert [c for c, _ in chunks] == chunk_text("".join(t for t, _ in pages))
+        assert chunks[0][1] == {"page": 1}
+        assert chunks[-1][1] == {"page": 3}
+        pages_seen = [m["page"] for _, m in chunks]
+        assert pages_seen == sorted(pages_seen)
+        assert set(pages_seen) == {1, 2, 3}
+    
+    def test_text_without_spaces_is_bounded(self, local_encoding):
+        """Test that a long run without spaces is chunked as it arrives instead of buffered."""
+        chunker = chunking.StreamChunker(chunk_size=50, overlap=0)
+        text = "Ünïcode_base64+/" * 20000
+        chunks = []
+        for i in range(0, len(text), 1000):
+            chunks.extend(chunker.feed(text[i : i + 1000]))
+            assert chunker._pending_chars <= chunker._max_pending + 1000
+        streamed = len(chunks)
+        chunks.extend(chunker.finish())
+        
+        assert streamed > len(chunks) - 5
+        # No merges span the forced cuts in this text, so the windows are unchanged
+        assert [c for c, _ in chunks] == chunking.chunk_text_tokenwise(text, 50, 0)
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
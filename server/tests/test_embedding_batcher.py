@@ -0,0 +1,109 @@
+"""Unit tests for query embedding micro-batching."""
+
+import asyncio
+import time
+
+import numpy as np
+import pytest
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEncoder:
+    """Records batch sizes; each vector is [len(text), batch size]."""
+    
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+    
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("encoder failed")
+        return np.array([[len(t), len(texts)] for t in texts], dtype=np.float32)
+
+
+async def _embed_all(batcher, texts):
+    try:
+        return await asyncio.gather(*(batcher.embed(t) for t in texts))
+    finally:
+        await batcher.stop()
+
+
+class TestEmbeddingBatcher:
+    """Tests for EmbeddingBatcher."""
+    
+    def test_concurrent_queries_share_a_batch(self):
+        """Test that queries arriving within the window are encoded together."""
+        encoder = FakeEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch=32, window_ms=50)
+        texts = ["a" * i for i in range(1, 11)]
+        
+        vectors = asyncio.run(_embed_all(batcher, texts))
+        
+        assert len(encoder.calls) == 1
+        assert [v[0] for v in vectors] == [len(t) for t in texts]
+        assert batcher.stats()["max_batch_size"] == 10
+    
+    def test_max_batch_size(self):
+        """Test that a batch never exceeds max_batch."""
+        encoder = FakeEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch=4, window_ms=50)
+        
+        vectors = asyncio.run(_embed_all(batcher, [f"q{i}" for i in range(10)]))
+        
+        assert [len(c) for c in encoder.calls] == [4, 4, 2]
+        assert len(vectors) == 10
+    
+    def test_queries_queue_while_encoding(self):
+        """Test that queries arriving during an encode form the next batch."""
+        encoder = FakeEncoder(delay=0.05)
+        batcher = EmbeddingBatcher(encoder, max_batch=32, window_ms=0)
+        
+        async def run():
+            first = asyncio.create_task(batcher.embed("first"))
+            await asyncio.sleep(0.01)
+            rest = [asyncio.create_task(batcher.embed(f"q{i}")) for i in range(5)]
+            await asyncio.gather(first, *rest)
+            await batcher.stop()
+        
+        asyncio.run(run())
+        assert [len(c) for c in encoder.calls] == [1, 5]
+    
+    def test_errors_reach_every_caller(self):
+        """Test that an encode failure is raised to each query of the batch."""
+        batcher = EmbeddingBatcher(FakeEncoder(fail=True), window_ms=20)
+        
+        async def run():
+            results = await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+            await batcher.stop()
+            return results
+        
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
+    
+    def test_stats(self):
+        """Test batch size and queue wait metrics."""
+        batcher = EmbeddingBatcher(FakeEncoder(), max_batch=8, window_ms=10)
+        asyncio.run(_embed_all(batcher, [f"q{i}" for i in range(8)]))
+        
+        stats = batcher.stats()
+        assert stats["queries"] == 8
+        assert stats["batches"] == 1
+        assert stats["mean_batch_size"] == 8
+        assert 0 <= stats["mean_queue_wait_ms"] <= stats["max_queue_wait_ms"]
+    
+    def test_restarts_on_new_event_loop(self):
+        """Test that the batcher can be used from successive event loops."""
+        encoder = FakeEncoder()
+        batcher = EmbeddingBatcher(encoder, window_ms=0)
+        
+        asyncio.run(batcher.embed("a"))
+        asyncio.run(batcher.embed("b"))
+        
+        assert len(encoder.calls) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
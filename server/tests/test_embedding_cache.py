@@ -0,0 +1,202 @@
+"""Unit tests for the embedding cache."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from app.rag import embedding_cache, embeddings
+from app.rag.embedding_cache import EmbeddingCache
+
+DIM = 8
+SERVER_DIR = Path(__file__).parent.parent
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A fresh cache with room for 100 vectors on disk and 10 in memory."""
+    c = EmbeddingCache(tmp_path / "emb", max_bytes=100 * DIM * 4, memory_items=10)
+    yield c
+    c.close()
+
+
+class TestEmbeddingCache:
+    """Tests for the two-level embedding cache."""
+    
+    def test_miss_returns_none(self, cache):
+        """Test that unknown texts are misses."""
+        assert cache.get_many("m", ["a", "b"]) == [None, None]
+        assert cache.stats()["misses"] == 2
+    
+    def test_memory_hit(self, cache):
+        """Test that a stored vector is served from memory."""
+        vecs = _vectors(2)
+        cache.put_many("m", ["a", "b"], vecs)
+        
+        found = cache.get_many("m", ["b", "a"])
+        np.testing.assert_array_equal(found[0], vecs[1])
+        np.testing.assert_array_equal(found[1], vecs[0])
+        assert cache.stats()["memory_hits"] == 2
+    
+    def test_model_is_part_of_key(self, cache):
+        """Test that another model does not reuse the embedding."""
+        cache.put_many("m1", ["a"], _vectors(1))
+        assert cache.get_many("m2", ["a"]) == [None]
+    
+    def test_persists_across_instances(self, cache, tmp_path):
+        """Test that vectors are read back from disk by a new cache."""
+        vecs = _vectors(20)
+        texts = [f"t{i}" for i in range(20)]
+        cache.put_many("m", texts, vecs)
+        cache.close()
+        
+        reopened = EmbeddingCache(tmp_path / "emb", max_bytes=cache.max_bytes, memory_items=10)
+        found = reopened.get_many("m", texts)
+        np.testing.assert_array_equal(np.stack(found), vecs)
+        stats = reopened.stats()
+        assert stats["disk_hits"] == 20
+        assert stats["memory_items"] == 10
+        reopened.close()
+    
+    def test_memory_lru_is_bounded(self, cache):
+        """Test that the in-memory level keeps only the most recent vectors."""
+        cache.put_many("m", [f"t{i}" for i in range(30)], _vectors(30))
+        
+        cache.get_many("m", ["t0"])
+        stats = cache.stats()
+        assert stats["memory_items"] == 10
+        assert stats["disk_hits"] == 1
+    
+    def test_evicts_least_recently_used_by_size(self, cache):
+        """Test that the disk store stays within max_bytes, dropping old entries."""
+        cache.put_many("m", [f"old{i}" for i in range(90)], _vectors(90, seed=1))
+        cache.get_many("m", ["old0"])
+        cache.put_many("m", [f"new{i}" for i in range(30)], _vectors(30, seed=2))
+        cache._memory.clear()
+        
+        stats = cache.stats()
+        assert stats["disk_bytes"] <= cache.max_bytes
+        assert cache.get_many("m", ["old0"])[0] is not None
+        assert cache.get_many("m", ["old1"])[0] is None
+        assert all(v is not None for v in cache.get_many("m", [f"new{i}" for i in range(30)]))
+    
+    def test_memory_hits_count_as_disk_reads(self, tmp_path, monkeypatch):
+        """Test that a vector only ever read from memory is not the first evicted from disk."""
+        clock = iter(range(1, 1000))
+        monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+        cache = EmbeddingCache(tmp_path / "emb", max_bytes=100 * DIM * 4, memory_items=200)
+        cache.put_many("m", ["hot"], _vectors(1))
+        cache.put_many("m", [f"old{i}" for i in range(89)], _vectors(89, seed=1))
+        assert cache.get_many("m", ["hot"])[0] is not None
+        cache.put_many("m", [f"new{i}" for i in range(30)], _vectors(30, seed=2))
+        cache._memory.clear()
+        
+        assert cache.stats()["memory_hits"] == 1
+        assert cache.get_many("m", ["hot"])[0] is not None
+        assert cache.get_many("m", ["old0"])[0] is None
+        cache.close()
+    
+    def test_evicted_rows_are_reused(self, cache):
+        """Test that the vector file does not grow past the budget."""
+        for round_ in range(5):
+            cache.put_many("m", [f"r{round_}-{i}" for i in range(60)], _vectors(60, seed=round_))
+        
+        vectors = cache._file(DIM)
+        assert vectors.capacity <= 1024
+        cache._memory.clear()
+        found = cache.get_many("m", [f"r4-{i}" for i in range(60)])
+        np.testing.assert_array_equal(np.stack(found), _vectors(60, seed=4))
+    
+    def test_clear(self, cache):
+        """Test that clear drops every entry."""
+        cache.put_many("m", ["a"], _vectors(1))
+        cache.clear()
+        assert cache.get_many("m", ["a"]) == [None]
+        assert cache.stats()["disk_items"] == 0
+
+
+class TestCachedEmbedTexts:
+    """Tests for embed_texts with the cache in front of the model."""
+    
+    @pytest.fixture(autouse=True)
+    def fake_model(self, cache, monkeypatch):
+        """Counts texts sent to a fake encoder."""
+        self.encoded = []
+        
+        def encode(texts):
+            self.encoded.extend(texts)
+            return np.stack([np.full(DIM, len(t), dtype=np.float32) for t in texts])
+        
+        monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_ENABLED", True)
+        monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+        monkeypatch.setattr(embeddings, "_encode", encode)
+    
+    def test_only_misses_are_encoded(self):
+        """Test that cached and duplicate texts skip the encoder."""
+        embeddings.embed_texts(["a", "bb"])
+        result = embeddings.embed_texts(["bb", "ccc", "ccc", "a"])
+        
+        assert self.encoded == ["a", "bb", "ccc"]
+        assert result.shape == (4, DIM)
+        assert result[:, 0].tolist() == [2, 3, 3, 1]
+    
+    def test_repeated_query_skips_encoder(self):
+        """Test that a repeated query is answered from the cache."""
+        first = embeddings.embed_query("what is thinkbook?")
+        second = embeddings.embed_query("what is thinkbook?")
+        
+        assert self.encoded == ["what is thinkbook?"]
+        np.testing.assert_array_equal(first, second)
+
+
+class TestSharedCache:
+    """Tests for several processes sharing one cache directory."""
+    
+    WRITER = """
+import sys
+import zlib
+import numpy as np
+from app.rag.embedding_cache import EmbeddingCache
+
+directory, name = sys.argv[1], sys.argv[2]
+cache = EmbeddingCache(directory, max_bytes=300 * 8 * 4, memory_items=0)
+wrong = 0
+for round in range(60):
+    texts = [f"{name}-{round}-{i}" for i in range(20)]
+    cache.put_many("m", texts, np.stack([np.full(8, zlib.crc32(t.encode()) % 100003, dtype=np.float32) for t in texts]))
+    earlier = [f"{other}-{r}-{i}" for other in ("a", "b") for r in range(max(0, round - 20), round + 1) for i in range(20)]
+    for text, vector in zip(earlier, cache.get_many("m", earlier)):
+        if vector is not None and vector[0] != zlib.crc32(text.encode()) % 100003:
+            wrong += 1
+print(wrong)
+"""
+
+    def test_concurrent_writers(self, tmp_path):
+        """Test that two processes evicting and reusing rows never return another text's vector."""
+        writers = [
+            subprocess.Popen(
+                [sys.executable, "-c", self.WRITER, str(tmp_path / "emb"), name],
+                cwd=SERVER_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for name in ("a", "b")
+        ]
+        for writer in writers:
+            out, err = writer.communicate(timeout=300)
+            assert writer.returncode == 0, err
+            assert out.strip() == "0"
+        
+        cache = EmbeddingCache(tmp_path / "emb", max_bytes=300 * DIM * 4, memory_items=0)
+        assert cache.stats()["disk_items"] <= 300
+        # Neither process truncated rows the other still indexes
+        texts = [f"{name}-59-{i}" for name in ("a", "b") for i in range(20)]
+        assert any(v is not None for v in cache.get_many("m", texts))
+        cache.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
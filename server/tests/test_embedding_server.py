@@ -0,0 +1,159 @@
+"""Unit tests for the shared embedding server."""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from app.rag import embeddings
+from app.rag.embedding_server import EmbeddingClient, EmbeddingServer, EmbeddingServerError
+from app.services.embedding_batcher import EmbeddingBatcher
+
+SERVER_DIR = Path(__file__).parent.parent
+
+
+def fake_encode(texts):
+    """A text's vector is [len(text), 0, 0]."""
+    if any(t == "boom" for t in texts):
+        raise RuntimeError("model exploded")
+    return np.array([[len(t), 0, 0] for t in texts], dtype=np.float32)
+
+
+def fake_encode_bucketed(texts):
+    """Like fake_encode, but marks vectors as coming from the document path."""
+    vectors = fake_encode(texts)
+    vectors[:, 1] = 1
+    return vectors
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """An embedding server with a fake model, running on its own event loop thread."""
+    # The server process may share the API's config; it must still compute embeddings itself
+    monkeypatch.setattr(embeddings, "EMBEDDING_SERVER_SOCKET", str(tmp_path / "embed.sock"))
+    monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(embeddings, "_encode", fake_encode)
+    monkeypatch.setattr(embeddings, "_encode_bucketed", fake_encode_bucketed)
+    
+    srv = EmbeddingServer(str(tmp_path / "embed.sock"), batcher=EmbeddingBatcher(embeddings.embed_texts, window_ms=50))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(srv.start(), loop).result(5)
+    yield srv
+    asyncio.run_coroutine_threadsafe(srv.stop(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+class TestEmbeddingServer:
+    """Tests for the Unix socket embedding server and client."""
+    
+    def test_embed_texts(self, server):
+        """Test that vectors come back in order over the socket."""
+        client = EmbeddingClient(server.path)
+        vectors = client.embed(["a", "bbb", "cc"])
+        
+        assert vectors.dtype == np.float32
+        assert vectors[:, 0].tolist() == [1, 3, 2]
+    
+    def test_documents_use_bucketed_path(self, server):
+        """Test that document requests go through length-bucketed embedding."""
+        client = EmbeddingClient(server.path)
+        vectors = client.embed(["a", "bb"], kind="documents")
+        
+        assert vectors[:, 1].tolist() == [1, 1]
+    
+    def test_queries_from_many_clients_are_batched(self, server):
+        """Test that concurrent queries from separate connections share batches."""
+        client = EmbeddingClient(server.path)
+        texts = ["q" * n for n in range(1, 17)]
+        
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(lambda t: client.embed([t], kind="query"), texts))
+        
+        assert [int(r[0, 0]) for r in results] == list(range(1, 17))
+        stats = client.stats()["query_batcher"]
+        assert stats["queries"] == 16
+        assert stats["batches"] < 16
+    
+    def test_errors_are_reported(self, server):
+        """Test that a model failure reaches the client as EmbeddingServerError."""
+        client = EmbeddingClient(server.path)
+        with pytest.raises(EmbeddingServerError, match="model exploded"):
+            client.embed(["boom"])
+        # The connection stays usable
+        assert client.embed(["ok"])[0, 0] == 2
+    
+    def test_stats(self, server):
+        """Test that stats report the server's cache and batcher."""
+        stats = EmbeddingClient(server.path).stats()
+        assert set(stats) == {"embedding_cache", "query_batcher"}
+    
+    def test_unavailable_server(self, tmp_path):
+        """Test that a missing server raises EmbeddingServerError."""
+        client = EmbeddingClient(str(tmp_path / "missing.sock"))
+        with pytest.raises(EmbeddingServerError):
+            client.embed(["a"])
+    
+    def test_stuck_server_times_out(self, tmp_path):
+        """Test that a server that never answers raises instead of blocking forever."""
+        path = str(tmp_path / "stuck.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen(1)
+        try:
+            client = EmbeddingClient(path, timeout=0.2)
+            with pytest.raises(EmbeddingServerError, match="did not answer"):
+                client.embed(["a"])
+        finally:
+            listener.close()
+
+
+class TestEmbeddingServerClientMode:
+    """Tests for API workers that use an embedding server."""
+    
+    def test_requests_are_forwarded(self, monkeypatch):
+        """Test that embedding calls are sent to the server with their kind."""
+        sent = []
+        
+        class RecordingClient:
+            def embed(self, texts, kind):
+                sent.append((kind, list(texts)))
+                return np.zeros((len(texts), 3), dtype=np.float32)
+        
+        monkeypatch.setattr(embeddings, "EMBEDDING_SERVER_SOCKET", "/tmp/embed.sock")
+        monkeypatch.setattr(embeddings, "get_embedding_client", lambda path: RecordingClient())
+        monkeypatch.setattr(embeddings, "get_embedding_model", lambda backend=None: pytest.fail("model loaded"))
+        
+        embeddings.embed_texts(["a"])
+        embeddings.embed_documents(["b", "c"])
+        embeddings.embed_queries(["d"])
+        
+        assert sent == [("texts", ["a"]), ("documents", ["b", "c"]), ("query", ["d"])]
+    
+    def test_api_does_not_import_model_runtime(self, tmp_path):
+        """Test that importing the API does not pull in PyTorch or sentence-transformers."""
+        code = (
+            "import sys, app.main\n"
+            "heavy = [m for m in ('torch', 'sentence_transformers') if m in sys.modules]\n"
+            "print(','.join(heavy))\n"
+        )
+        # Local Qdrant storage allows one client, which this test process may hold
+        env = dict(os.environ, THINKBOOK_QDRANT_DIR=str(tmp_path / "qdrant"))
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=SERVER_DIR, env=env, capture_output=True, text=True, timeout=120
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,8 +1,23 @@
 """Unit tests for embedding functionality."""
 
+import math
+
 import pytest
 import numpy as np
-from app.rag.embeddings import get_embedding_model, embed_texts
+from app.core.config import INGEST_BATCH_CHUNKS
+from app.rag import embeddings as embeddings_module
+from app.rag.embeddings import get_embedding_model, embed_texts, cache_model_name
+
+BACKEND_TEXTS = [
+    "ThinkBook indexes PDFs, Word documents, images and audio.",
+    "Quarterly revenue grew by 12% compared to last year.",
+    "The mitochondria is the powerhouse of the cell.",
+    "Short.",
+]
+
+requires_onnx = pytest.mark.skipif(
+    not embeddings_module.ONNX_AVAILABLE, reason="onnxruntime/optimum not installed"
+)
 
 
 class TestEmbeddings:
@@ -78,5 +93,130 @@ class TestEmbeddings:
         np.testing.assert_array_almost_equal(emb1, emb2)
 
 
+
+class TestEmbeddingBackends:
+    """Tests for the torch / ONNX / int8 embedding backends."""
+    
+    @staticmethod
+    def _encode(backend):
+        model = get_embedding_model(backend)
+        return model.encode(BACKEND_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected."""
+        with pytest.raises(ValueError):
+            get_embedding_model("tensorflow")
+    
+    def test_onnx_requires_runtime(self, monkeypatch):
+        """Test that ONNX backends explain how to install ONNX Runtime."""
+        monkeypatch.setattr(embeddings_module, "ONNX_AVAILABLE", False)
+        monkeypatch.setattr(embeddings_module, "_models", {})
+        with pytest.raises(RuntimeError, match="onnx"):
+            get_embedding_model("onnx-int8")
+    
+    def test_backends_cache_separately(self):
+        """Test that each backend's vectors get their own cache entries."""
+        names = {cache_model_name(b) for b in embeddings_module.EMBEDDING_BACKENDS}
+        assert len(names) == 3
+    
+    @requires_onnx
+    def test_onnx_matches_torch(self):
+        """Test that the fp32 ONNX model gives the torch vectors."""
+        torch_embs = self._encode("torch")
+        onnx_embs = self._encode("onnx")
+        
+        np.testing.assert_allclose(onnx_embs, torch_embs, atol=1e-4)
+    
+    @requires_onnx
+    def test_int8_close_to_torch(self):
+        """Test that int8 quantization keeps vectors close to torch."""
+        torch_embs = self._encode("torch")
+        int8_embs = self._encode("onnx-int8")
+        
+        cosines = np.sum(torch_embs * int8_embs, axis=1)
+        assert cosines.min() > 0.98
+
+
+
+class FakeModel:
+    """Stands in for a SentenceTransformer; a text's vector is [words, batch size]."""
+    
+    max_seq_length = 50
+    
+    def __init__(self):
+        self.batches = []
+        self.pool_calls = []
+    
+    def tokenizer(self, texts, truncation, max_length, return_attention_mask):
+        return {"input_ids": [[0] * min(len(t.split()), max_length) for t in texts]}
+    
+    def get_sentence_embedding_dimension(self):
+        return 2
+    
+    def encode(self, texts, pool=None, **kwargs):
+        if pool is not None:
+            self.pool_calls.append(list(texts))
+            self.chunk_size = kwargs["chunk_size"]
+        else:
+            self.batches.append(list(texts))
+        return np.array([[len(t.split()), len(texts)] for t in texts], dtype=np.float32)
+
+
+class TestDocumentEmbedding:
+    """Tests for length-bucketed document embedding."""
+    
+    @pytest.fixture(autouse=True)
+    def fake_model(self, monkeypatch):
+        """Replaces the model and disables the cache."""
+        self.model = FakeModel()
+        monkeypatch.setattr(embeddings_module, "get_embedding_model", lambda backend=None: self.model)
+        monkeypatch.setattr(embeddings_module, "EMBEDDING_CACHE_ENABLED", False)
+        monkeypatch.setattr(embeddings_module, "EMBEDDING_BATCH_SIZE", 4)
+        monkeypatch.setattr(embeddings_module, "EMBEDDING_PROCESSES", 0)
+    
+    def test_results_in_input_order(self):
+        """Test that vectors come back in the order of the input texts."""
+        texts = [" ".join(["w"] * n) for n in (9, 1, 5, 3, 7, 2, 8, 4, 6, 10)]
+        embs = embeddings_module.embed_documents(texts)
+        
+        assert embs[:, 0].tolist() == [9, 1, 5, 3, 7, 2, 8, 4, 6, 10]
+    
+    def test_fixed_size_batches_of_similar_length(self):
+        """Test that batches are bounded and grouped by token length."""
+        texts = [" ".join(["w"] * n) for n in (9, 1, 5, 3, 7, 2, 8, 4, 6, 10)]
+        embeddings_module.embed_documents(texts)
+        
+        sizes = [[len(t.split()) for t in batch] for batch in self.model.batches]
+        assert sizes == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    
+    def test_lengths_capped_at_max_sequence(self):
+        """Test that texts beyond the model's max length are bucketed together."""
+        lengths = embeddings_module._token_lengths(self.model, ["w " * 80, "w " * 60, "w"])
+        assert lengths == [50, 50, 1]
+    
+    def test_process_pool(self, monkeypatch):
+        """Test that the multi-process pool receives the length-sorted texts."""
+        monkeypatch.setattr(embeddings_module, "EMBEDDING_PROCESSES", 2)
+        monkeypatch.setattr(embeddings_module, "_get_pool", lambda model: {"processes": []})
+        texts = [" ".join(["w"] * n) for n in (3, 1, 2, 6, 5, 4)]
+        
+        embs = embeddings_module.embed_documents(texts)
+        
+        assert [len(t.split()) for t in self.model.pool_calls[0]] == [1, 2, 3, 4, 5, 6]
+        assert embs[:, 0].tolist() == [3, 1, 2, 6, 5, 4]
+    
+    def test_ingest_flush_uses_every_process(self, monkeypatch):
+        """Test that one ingest flush is split into a pool chunk per process."""
+        monkeypatch.setattr(embeddings_module, "EMBEDDING_BATCH_SIZE", 32)
+        monkeypatch.setattr(embeddings_module, "EMBEDDING_PROCESSES", 4)
+        monkeypatch.setattr(embeddings_module, "_get_pool", lambda model: {"processes": []})
+        texts = [f"chunk {i}" for i in range(INGEST_BATCH_CHUNKS)]
+        
+        embeddings_module.embed_documents(texts)
+        
+        chunks = math.ceil(len(self.model.pool_calls[0]) / self.model.chunk_size)
+        assert chunks == 4
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
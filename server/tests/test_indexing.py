@@ -0,0 +1,185 @@
+"""Unit tests for batched Qdrant upserts and pipelined indexing."""
+
+import asyncio
+import functools
+import threading
+import time
+
+import numpy as np
+import pytest
+from app.core.config import INGEST_BATCH_CHUNKS, QDRANT_UPSERT_BATCH_SIZE
+from app.rag import qdrant_store
+from app.rag.chunking import StreamChunker
+from app.services import rag_service
+from app.services.rag_service import RagService
+
+
+class RecordingClient:
+    """Stands in for QdrantClient and records upsert calls."""
+    
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+    
+    def upsert(self, collection_name, points, wait=True):
+        with self.lock:
+            self.calls.append((len(points.ids), wait))
+
+
+class RecordingCatalog:
+    """Stands in for the document catalog."""
+    
+    def __init__(self):
+        self.added = []
+    
+    def add_chunks(self, name, count):
+        self.added.append((name, count))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A recording client and catalog in place of the module's Qdrant client."""
+    fake = RecordingClient()
+    fake.catalog = RecordingCatalog()
+    monkeypatch.setattr(qdrant_store, "_client", fake)
+    monkeypatch.setattr(qdrant_store, "get_catalog", lambda: fake.catalog)
+    return fake
+
+
+def make_chunks(n, dim=4):
+    ids = [f"doc::chunk_{i}" for i in range(n)]
+    documents = [f"text {i}" for i in range(n)]
+    embeddings = np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+    return ids, documents, embeddings, [{"chunk_index": i} for i in range(n)]
+
+
+class TestBatchedUpserts:
+    """Tests for add_documents batching."""
+    
+    def test_point_batches_are_columnar(self, monkeypatch):
+        """Test that chunks are split into bounded columnar batches in order."""
+        monkeypatch.setattr(qdrant_store, "QDRANT_UPSERT_BATCH_SIZE", 4)
+        ids, documents, embeddings, metadatas = make_chunks(10)
+        
+        batches = qdrant_store._point_batches(ids, documents, embeddings, metadatas)
+        
+        assert [len(b.ids) for b in batches] == [4, 4, 2]
+        assert batches[1].vectors[0] == embeddings[4].tolist()
+        assert batches[2].payloads[1] == {"chunk_index": 9, "document": "text 9"}
+        assert len({i for b in batches for i in b.ids}) == 10
+    
+    def test_only_last_batch_waits(self, client, monkeypatch):
+        """Test that batches are sent without waiting except for the final barrier."""
+        monkeypatch.setattr(qdrant_store, "QDRANT_UPSERT_BATCH_SIZE", 3)
+        qdrant_store.add_documents(*make_chunks(10)[:3], [{"source": "doc.txt"}] * 10)
+        
+        assert sorted(n for n, _ in client.calls) == [1, 3, 3, 3]
+        assert [wait for _, wait in client.calls] == [False, False, False, True]
+        assert client.calls[-1] == (1, True)
+        assert client.catalog.added == [("doc.txt", 10)]
+    
+    def test_server_batches_are_sent_concurrently(self, client, monkeypatch):
+        """Test that a Qdrant server gets overlapping requests before the barrier."""
+        in_flight, peak = [0], [0]
+        barrier_seen_early = []
+        
+        def upsert(collection_name, points, wait=True):
+            with client.lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+                if wait and in_flight[0] > 1:
+                    barrier_seen_early.append(True)
+            time.sleep(0.02)
+            with client.lock:
+                in_flight[0] -= 1
+        
+        monkeypatch.setattr(client, "upsert", upsert)
+        monkeypatch.setattr(qdrant_store, "QDRANT_URL", "http://qdrant:6333")
+        monkeypatch.setattr(qdrant_store, "QDRANT_UPSERT_BATCH_SIZE", 2)
+        monkeypatch.setattr(qdrant_store, "QDRANT_UPSERT_PARALLEL", 4)
+        qdrant_store.add_documents(*make_chunks(10)[:3], [{"source": "doc.txt"}] * 10)
+        
+        assert peak[0] > 1
+        assert not barrier_seen_early
+
+
+class TestPipelinedIndexing:
+    """Tests for overlapping embedding with indexing during ingestion."""
+    
+    def test_indexing_overlaps_next_embedding(self, monkeypatch):
+        """Test that a batch is upserted while the next batch is embedded."""
+        events = []
+        
+        def embed(chunks):
+            events.append("embed start")
+            time.sleep(0.05)
+            events.append("embed end")
+            return np.zeros((len(chunks), 4), dtype=np.float32)
+        
+        def add(ids, chunks, embeddings, metadatas):
+            events.append("add start")
+            time.sleep(0.05)
+            events.append("add end")
+        
+        monkeypatch.setattr(rag_service, "embed_documents", embed)
+        monkeypatch.setattr(rag_service, "add_documents", add)
+        monkeypatch.setattr(rag_service, "INGEST_BATCH_CHUNKS", 1)
+        
+        async def segments():
+            for i in range(3):
+                yield f"Segment {i} has some words. " * 400, {}
+        
+        result = asyncio.run(RagService.process_segments(segments(), "doc.txt"))
+        
+        assert result["chunks"] >= 3
+        assert events.count("add end") == events.count("embed end")
+        # The second embedding starts before the first upsert has finished
+        assert events.index("embed start", 1) < events.index("add end")
+    
+    def test_ingest_flushes_use_concurrent_upserts(self, client, monkeypatch):
+        """Test that with the configured sizes each ingest flush is sent as several upserts."""
+        monkeypatch.setattr(qdrant_store, "QDRANT_URL", "http://qdrant:6333")
+        monkeypatch.setattr(qdrant_store, "QDRANT_UPSERT_PARALLEL", 4)
+        monkeypatch.setattr(rag_service, "add_documents", qdrant_store.add_documents)
+        monkeypatch.setattr(rag_service, "embed_documents", lambda c: np.zeros((len(c), 4), dtype=np.float32))
+        # Small chunks so that a short document fills two flushes
+        monkeypatch.setattr(rag_service, "StreamChunker", functools.partial(StreamChunker, chunk_size=8, overlap=0))
+        threads = set()
+        upsert = client.upsert
+        
+        def recording_upsert(collection_name, points, wait=True):
+            threads.add(threading.current_thread().name)
+            upsert(collection_name, points, wait)
+        
+        monkeypatch.setattr(client, "upsert", recording_upsert)
+        
+        async def segments():
+            for i in range(2 * INGEST_BATCH_CHUNKS):
+                yield f"Sentence number {i} fills about one chunk. ", {}
+        
+        result = asyncio.run(RagService.process_segments(segments(), "doc.txt"))
+        
+        assert result["chunks"] >= 2 * INGEST_BATCH_CHUNKS
+        per_flush = INGEST_BATCH_CHUNKS // QDRANT_UPSERT_BATCH_SIZE
+        assert per_flush > 2
+        assert [wait for _, wait in client.calls].count(True) == -(-result["chunks"] // INGEST_BATCH_CHUNKS)
+        assert any(name.startswith("qdrant-upsert") for name in threads)
+    
+    def test_failed_upsert_is_raised(self, monkeypatch):
+        """Test that an indexing error fails the ingestion."""
+        monkeypatch.setattr(rag_service, "embed_documents", lambda c: np.zeros((len(c), 4), dtype=np.float32))
+        
+        def add(ids, chunks, embeddings, metadatas):
+            raise RuntimeError("qdrant down")
+        
+        monkeypatch.setattr(rag_service, "add_documents", add)
+        
+        async def segments():
+            yield "Some text to index.", {}
+        
+        with pytest.raises(RuntimeError, match="qdrant down"):
+            asyncio.run(RagService.process_segments(segments(), "doc.txt"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
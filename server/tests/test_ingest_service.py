@@ -0,0 +1,485 @@
+"""Unit tests for the background ingestion queue and its job routes."""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import routes
+from app.services import ingest_service
+from app.services.ingest_service import IngestQueue, JobStateError, JobStore, QueueFullError
+
+
+class FakePipeline:
+    """Stands in for the parser, RagService, vector store and catalog."""
+    
+    def __init__(self, uploads):
+        self.uploads = uploads
+        # Cleared to hold jobs in the parsing or indexing stage
+        self.parse_gate = asyncio.Event()
+        self.parse_gate.set()
+        self.index_gate = asyncio.Event()
+        self.index_gate.set()
+        self.parses_stopped = []
+        self.processed = []
+        self.deleted = []
+        self.recorded = []
+    
+    def upload(self, name):
+        (self.uploads / name).write_text(f"contents of {name}")
+        return name
+    
+    async def segments(self, path, sha256=None):
+        finished = False
+        try:
+            await self.parse_gate.wait()
+            yield f"text of {path.name}", {}
+            finished = True
+        finally:
+            if not finished:
+                self.parses_stopped.append(path.name)
+    
+    async def extract_text(self, path, sha256=None):
+        return f"text of {path.name}"
+    
+    async def process_segments(self, segments, filename, on_stage=None):
+        async for text, meta in segments:
+            on_stage("chunking")
+        on_stage("indexing")
+        await self.index_gate.wait()
+        self.processed.append(filename)
+        return {"status": "ok", "file": filename, "chunks": 3}
+    
+    def delete_file(self, filename):
+        self.deleted.append(filename)
+        return 0
+    
+    def record(self, filename, sha256):
+        self.recorded.append((filename, sha256))
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """A fake pipeline wired into the ingest service, with uploads under tmp_path."""
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    fake = FakePipeline(uploads)
+    monkeypatch.setattr(ingest_service, "UPLOAD_DIR", uploads)
+    monkeypatch.setattr(ingest_service, "cached_extract_segments", fake.segments)
+    monkeypatch.setattr(ingest_service, "cached_extract_text", fake.extract_text)
+    monkeypatch.setattr(ingest_service, "RagService", fake)
+    monkeypatch.setattr(ingest_service, "delete_file_qdrant", fake.delete_file)
+    monkeypatch.setattr(ingest_service, "invalidate_file", lambda name: None)
+    monkeypatch.setattr(IngestQueue, "_record_ingest", staticmethod(fake.record))
+    return fake
+
+
+def make_queue(tmp_path, max_queued=8, lease=30.0):
+    return IngestQueue(
+        workers=1, max_queued=max_queued, jobs_path=tmp_path / "jobs.sqlite",
+        poll_interval=0.05, lease=lease,
+    )
+
+
+async def wait_for(queue, job_id, timeout=5.0, **expected):
+    """Polls the job until its fields have the expected values; returns it."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if all(job[k] == v for k, v in expected.items()):
+            return job
+        assert loop.time() < deadline, f"job {job} never reached {expected}"
+        await asyncio.sleep(0.01)
+
+
+def saved_jobs(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    try:
+        return {j["job_id"]: j for j in store.list_jobs()}
+    finally:
+        store.close()
+
+
+class TestIngestQueue:
+    """Tests for submitting and cancelling ingestion jobs."""
+    
+    def test_job_runs_to_done(self, pipeline, tmp_path):
+        """Test that a submitted upload is indexed and recorded in the catalog."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            job = await queue.submit(pipeline.upload("a.txt"), sha256="abc")
+            assert job["status"] == "queued"
+            
+            job = await wait_for(queue, job["job_id"], status="done")
+            await queue.stop()
+            return job
+        
+        job = asyncio.run(run())
+        
+        assert job["stage"] == "done"
+        assert job["chunks"] == 3
+        assert pipeline.processed == ["a.txt"]
+        assert pipeline.recorded == [("a.txt", "abc")]
+    
+    def test_full_queue_is_rejected(self, pipeline, tmp_path):
+        """Test that submitting beyond max_queued waiting jobs raises QueueFullError."""
+        async def run():
+            queue = make_queue(tmp_path, max_queued=1)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            running = await queue.submit(pipeline.upload("a.txt"))
+            await wait_for(queue, running["job_id"], status="running")
+            
+            # The running job does not count against the limit
+            await queue.submit(pipeline.upload("b.txt"))
+            with pytest.raises(QueueFullError):
+                await queue.submit(pipeline.upload("c.txt"))
+            await queue.stop()
+        
+        asyncio.run(run())
+    
+    def test_cancel_queued_job(self, pipeline, tmp_path):
+        """Test that a cancelled waiting job is never run and its upload is removed."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            first = await queue.submit(pipeline.upload("a.txt"))
+            second = await queue.submit(pipeline.upload("b.txt"))
+            await wait_for(queue, first["job_id"], status="running")
+            
+            assert (await queue.cancel(second["job_id"]))["status"] == "cancelled"
+            pipeline.parse_gate.set()
+            await wait_for(queue, first["job_id"], status="done")
+            await queue.stop()
+            return await asyncio.to_thread(saved_jobs, tmp_path)
+        
+        jobs = asyncio.run(run())
+        
+        assert sorted(j["status"] for j in jobs.values()) == ["cancelled", "done"]
+        assert pipeline.processed == ["a.txt"]
+        assert not (pipeline.uploads / "b.txt").exists()
+    
+    def test_cancel_running_job(self, pipeline, tmp_path):
+        """Test that cancelling a parsing job stops its parser and cleans up its file and chunks."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            job = await queue.submit(pipeline.upload("a.txt"))
+            await wait_for(queue, job["job_id"], stage="parsing")
+            
+            await queue.cancel(job["job_id"])
+            await wait_for(queue, job["job_id"], status="cancelled")
+            await queue.stop()
+        
+        asyncio.run(run())
+        
+        assert pipeline.parses_stopped == ["a.txt"]
+        assert pipeline.processed == []
+        assert pipeline.deleted == ["a.txt"]
+        assert not (pipeline.uploads / "a.txt").exists()
+    
+    def test_cancel_while_indexing_is_refused(self, pipeline, tmp_path):
+        """Test that a job writing to the index cannot be cancelled and still completes."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.index_gate.clear()
+            job = await queue.submit(pipeline.upload("a.txt"))
+            await wait_for(queue, job["job_id"], stage="indexing")
+            
+            with pytest.raises(JobStateError, match="writing to the index"):
+                await queue.cancel(job["job_id"])
+            pipeline.index_gate.set()
+            await wait_for(queue, job["job_id"], status="done")
+            await queue.stop()
+        
+        asyncio.run(run())
+        assert (pipeline.uploads / "a.txt").exists()
+    
+    def test_cancel_finished_or_unknown_job(self, pipeline, tmp_path):
+        """Test that finished jobs cannot be cancelled and unknown ids return None."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            job = await queue.submit(pipeline.upload("a.txt"))
+            await wait_for(queue, job["job_id"], status="done")
+            
+            with pytest.raises(JobStateError, match="already done"):
+                await queue.cancel(job["job_id"])
+            assert await queue.cancel("missing") is None
+            await queue.stop()
+        
+        asyncio.run(run())
+    
+    def test_cancel_file(self, pipeline, tmp_path):
+        """Test that cancel_file cancels the running and waiting jobs of one file only."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            running = await queue.submit(pipeline.upload("a.txt"), sha256="1")
+            waiting = await queue.submit("a.txt", sha256="2")
+            other = await queue.submit(pipeline.upload("b.txt"))
+            await wait_for(queue, running["job_id"], status="running")
+            
+            await queue.cancel_file("a.txt")
+            await wait_for(queue, running["job_id"], status="cancelled")
+            pipeline.parse_gate.set()
+            await wait_for(queue, other["job_id"], status="done")
+            await queue.stop()
+            jobs = await asyncio.to_thread(saved_jobs, tmp_path)
+            return [jobs[j["job_id"]]["status"] for j in (running, waiting, other)]
+        
+        assert asyncio.run(run()) == ["cancelled", "cancelled", "done"]
+        assert pipeline.processed == ["b.txt"]
+    
+    def test_cancel_file_waits_for_a_batch_being_indexed(self, pipeline, tmp_path):
+        """Test that cancel_file returns only once a job writing to the index has stopped."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.index_gate.clear()
+            job = await queue.submit(pipeline.upload("a.txt"))
+            await wait_for(queue, job["job_id"], stage="indexing")
+            
+            cancelling = asyncio.create_task(queue.cancel_file("a.txt"))
+            await asyncio.sleep(0.2)
+            assert not cancelling.done()
+            pipeline.index_gate.set()
+            await asyncio.wait_for(cancelling, 5)
+            job = await queue.get(job["job_id"])
+            await queue.stop()
+            return job
+        
+        assert asyncio.run(run())["status"] == "done"
+    
+    def test_cancel_file_refuses_a_replacing_reindex(self, pipeline, tmp_path):
+        """Test that a re-index job that already dropped the old chunks is not cancelled."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            job = await queue.submit(pipeline.upload("a.txt"), reindex=True)
+            await wait_for(queue, job["job_id"], replacing=True)
+            
+            with pytest.raises(JobStateError, match="re-indexing"):
+                await queue.cancel_file("a.txt")
+            pipeline.parse_gate.set()
+            job = await wait_for(queue, job["job_id"], status="done")
+            await queue.stop()
+            return job
+        
+        asyncio.run(run())
+        assert pipeline.processed == ["a.txt"]
+    
+    def test_job_with_missing_upload_fails(self, pipeline, tmp_path):
+        """Test that a job whose upload disappeared before it ran is marked failed."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            first = await queue.submit(pipeline.upload("a.txt"))
+            second = await queue.submit(pipeline.upload("b.txt"))
+            await wait_for(queue, first["job_id"], status="running")
+            
+            (pipeline.uploads / "b.txt").unlink()
+            pipeline.parse_gate.set()
+            job = await wait_for(queue, second["job_id"], status="failed")
+            await queue.stop()
+            return job
+        
+        assert asyncio.run(run())["error"] == "Uploaded file is missing"
+
+
+class TestSharedJobs:
+    """Tests for jobs shared by several API workers and kept across restarts."""
+    
+    def test_stages_are_saved(self, pipeline, tmp_path):
+        """Test that the job table follows a running job's stage."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            pipeline.parse_gate.clear()
+            job = await queue.submit(pipeline.upload("a.txt"))
+            await wait_for(queue, job["job_id"], stage="parsing")
+            
+            # Coalesced stage changes reach the table with the next heartbeat
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + 5
+            while (await asyncio.to_thread(saved_jobs, tmp_path))[job["job_id"]]["stage"] != "parsing":
+                assert loop.time() < deadline
+                await asyncio.sleep(0.01)
+            pipeline.parse_gate.set()
+            await wait_for(queue, job["job_id"], status="done")
+            await queue.stop()
+            return job["job_id"]
+        
+        job_id = asyncio.run(run())
+        assert saved_jobs(tmp_path)[job_id]["status"] == "done"
+    
+    def test_each_job_runs_in_one_worker(self, pipeline, tmp_path):
+        """Test that jobs submitted to two workers sharing the table each run exactly once."""
+        async def run():
+            first, second = make_queue(tmp_path), make_queue(tmp_path)
+            await first.start()
+            await second.start()
+            jobs = []
+            for i in range(6):
+                jobs.append(await (first, second)[i % 2].submit(pipeline.upload(f"{i}.txt")))
+            for job in jobs:
+                await wait_for(first, job["job_id"], status="done")
+            await first.stop()
+            await second.stop()
+        
+        asyncio.run(run())
+        assert sorted(pipeline.processed) == [f"{i}.txt" for i in range(6)]
+    
+    def test_cancel_from_another_worker(self, pipeline, tmp_path):
+        """Test that a job running in one worker can be followed and cancelled from another."""
+        async def run():
+            owner, other = make_queue(tmp_path), make_queue(tmp_path)
+            await owner.start()
+            pipeline.parse_gate.clear()
+            job = await owner.submit(pipeline.upload("a.txt"))
+            await wait_for(owner, job["job_id"], stage="parsing")
+            await other.start()
+            
+            assert (await other.cancel(job["job_id"]))["status"] == "running"
+            job = await wait_for(other, job["job_id"], status="cancelled")
+            await owner.stop()
+            await other.stop()
+            return job
+        
+        assert asyncio.run(run())["file"] == "a.txt"
+        assert pipeline.parses_stopped == ["a.txt"]
+        assert not (pipeline.uploads / "a.txt").exists()
+    
+    def test_interrupted_jobs_resume_after_restart(self, pipeline, tmp_path):
+        """Test that running and waiting jobs start over after a restart, and finished ones stay."""
+        async def run():
+            queue = make_queue(tmp_path)
+            await queue.start()
+            done = await queue.submit(pipeline.upload("done.txt"))
+            await wait_for(queue, done["job_id"], status="done")
+            pipeline.parse_gate.clear()
+            running = await queue.submit(pipeline.upload("a.txt"))
+            waiting = await queue.submit(pipeline.upload("b.txt"))
+            await wait_for(queue, running["job_id"], stage="parsing")
+            await queue.stop()
+            
+            pipeline.parse_gate.set()
+            restarted = make_queue(tmp_path)
+            await restarted.start()
+            for job in (running, waiting):
+                await wait_for(restarted, job["job_id"], status="done")
+            await restarted.stop()
+        
+        asyncio.run(run())
+        assert pipeline.processed == ["done.txt", "a.txt", "b.txt"]
+    
+    def test_jobs_of_a_dead_worker_run_again(self, pipeline, tmp_path):
+        """Test that a job whose worker stopped heartbeating is picked up by another worker."""
+        async def run():
+            dead = make_queue(tmp_path, lease=0.3)
+            await dead.start()
+            pipeline.parse_gate.clear()
+            job = await dead.submit(pipeline.upload("a.txt"))
+            await wait_for(dead, job["job_id"], stage="parsing")
+            # Dies without releasing its job
+            dead._store.release = lambda owner: None
+            await dead.stop()
+            
+            pipeline.parse_gate.set()
+            survivor = make_queue(tmp_path, lease=0.3)
+            await survivor.start()
+            job = await wait_for(survivor, job["job_id"], status="done")
+            await survivor.stop()
+            return job
+        
+        assert asyncio.run(run())["chunks"] == 3
+        assert pipeline.processed == ["a.txt"]
+
+
+@pytest.fixture
+def client(pipeline, tmp_path, monkeypatch):
+    """An API client over a queue whose jobs stay queued (no workers run)."""
+    queue = make_queue(tmp_path, max_queued=2)
+    queue._store = JobStore(tmp_path / "jobs.sqlite")
+    queue._wakeup = asyncio.Event()
+    monkeypatch.setattr(routes, "ingest_queue", queue)
+    monkeypatch.setattr(routes, "UPLOAD_DIR", pipeline.uploads)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    with TestClient(app) as c:
+        c.queue = queue
+        yield c
+    queue._store.close()
+
+
+class TestJobRoutes:
+    """Tests for the job, cancel and re-index endpoints."""
+    
+    def test_list_and_cancel_jobs(self, client, pipeline):
+        """Test that jobs are listed newest first and a queued job can be cancelled once."""
+        first = asyncio.run(client.queue.submit(pipeline.upload("a.txt")))
+        second = asyncio.run(client.queue.submit(pipeline.upload("b.txt")))
+        
+        listed = client.get("/api/jobs").json()
+        assert [j["job_id"] for j in listed] == [second["job_id"], first["job_id"]]
+        
+        response = client.post(f"/api/jobs/{first['job_id']}/cancel")
+        assert response.status_code == 200
+        assert response.json()["status"] == "cancelled"
+        assert client.get(f"/api/jobs/{first['job_id']}").json()["status"] == "cancelled"
+        
+        assert client.post(f"/api/jobs/{first['job_id']}/cancel").status_code == 409
+        assert client.post("/api/jobs/missing/cancel").status_code == 404
+        assert client.get("/api/jobs/missing").status_code == 404
+    
+    def test_reindex_file(self, client, pipeline):
+        """Test that re-indexing queues a re-index job for an existing upload only."""
+        assert client.post("/api/reindex_file", data={"name": "missing.txt"}).status_code == 404
+        assert client.post("/api/reindex_file", data={"name": "../a.txt"}).status_code == 400
+        
+        pipeline.upload("a.txt")
+        response = client.post("/api/reindex_file", data={"name": "a.txt"})
+        
+        assert response.status_code == 202
+        job = asyncio.run(client.queue.get(response.json()["job_id"]))
+        assert job["file"] == "a.txt"
+        assert job["reindex"] is True
+    
+    def test_delete_during_reindex_returns_409(self, client, pipeline, monkeypatch):
+        """Test that a file is not deleted while a re-index job is writing its chunks."""
+        deleted = []
+        monkeypatch.setattr(routes, "delete_file_qdrant", deleted.append)
+        job = asyncio.run(client.queue.submit(pipeline.upload("a.txt"), reindex=True))
+        client.queue._store._conn.execute(
+            "UPDATE jobs SET status = 'running', replacing = 1 WHERE job_id = ?", (job["job_id"],)
+        )
+        
+        response = client.request("DELETE", "/api/delete_file", data={"name": "a.txt"})
+        
+        assert response.status_code == 409
+        assert deleted == []
+        assert (pipeline.uploads / "a.txt").exists()
+    
+    def test_full_queue_returns_503(self, client, pipeline):
+        """Test that uploads and re-index requests are refused while the queue is full."""
+        pipeline.upload("a.txt")
+        for _ in range(2):
+            assert client.post("/api/reindex_file", data={"name": "a.txt"}).status_code == 202
+        
+        assert client.post("/api/reindex_file", data={"name": "a.txt"}).status_code == 503
+        response = client.post("/api/upload_file", files={"file": ("new.txt", b"Some notes.", "text/plain")})
+        assert response.status_code == 503
+        # The rejected upload is not kept
+        assert not (pipeline.uploads / "new.txt").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
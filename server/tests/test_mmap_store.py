@@ -0,0 +1,238 @@
+"""Unit tests for the memory-mapped vector store."""
+
+import numpy as np
+import pytest
+from app.rag import mmap_store
+from app.rag.catalog import Catalog
+from app.rag.mmap_store import MmapVectorStore
+
+DIM = 16
+
+
+@pytest.fixture
+def store(tmp_path):
+    """An empty float32 store without IVF."""
+    s = MmapVectorStore(tmp_path / "vectors", dtype="float32", ivf_min_vectors=0)
+    yield s
+    s.close()
+
+
+def random_vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def add_file(store, source, vectors, start=0):
+    """Adds one point per vector for source; returns their ids."""
+    ids = [f"{source}::chunk_{start + i}" for i in range(len(vectors))]
+    store.add(
+        ids,
+        [f"{source} text {start + i}" for i in range(len(vectors))],
+        vectors,
+        [{"source": source, "chunk_index": start + i} for i in range(len(vectors))],
+    )
+    return ids
+
+
+class TestMmapVectorStore:
+    """Tests for adding, searching and deleting points."""
+    
+    def test_query_returns_nearest_with_cosine_scores(self, store):
+        """Test that the most similar vectors come first with their payloads."""
+        vectors = random_vectors(50)
+        add_file(store, "a.txt", vectors)
+        
+        result = store.query(vectors[7] * 3, n_results=3)
+        
+        assert result["documents"][0] == "a.txt text 7"
+        assert result["metadatas"][0] == {"source": "a.txt", "chunk_index": 7}
+        assert result["distances"][0] == pytest.approx(1.0, abs=1e-5)
+        assert result["distances"] == sorted(result["distances"], reverse=True)
+    
+    def test_empty_store(self, store):
+        """Test that searching an empty store returns no hits."""
+        assert store.query(random_vectors(1)[0]) == {"documents": [], "metadatas": [], "distances": []}
+        assert store.count() == 0
+    
+    def test_readding_an_id_replaces_it(self, store):
+        """Test that upserting an existing id leaves one point with the new vector."""
+        vectors = random_vectors(2)
+        store.add(["p"], ["old"], vectors[:1], [{"source": "a.txt"}])
+        store.add(["p"], ["new"], vectors[1:], [{"source": "a.txt"}])
+        
+        assert store.count() == 1
+        assert store.query(vectors[0], n_results=5)["documents"] == ["new"]
+    
+    def test_delete_source(self, store):
+        """Test that a deleted file's points are no longer found or counted."""
+        vectors = random_vectors(20)
+        add_file(store, "a.txt", vectors[:10])
+        add_file(store, "b.txt", vectors[10:])
+        
+        assert store.delete_source("a.txt") == 10
+        assert store.delete_source("a.txt") == 0
+        assert store.count() == 10
+        assert store.counts_by_source() == {"b.txt": 10}
+        result = store.query(vectors[3], n_results=20)
+        assert all(m["source"] == "b.txt" for m in result["metadatas"])
+    
+    def test_compaction_keeps_live_points(self, store, monkeypatch):
+        """Test that rewriting the files without dead rows keeps search results."""
+        monkeypatch.setattr(mmap_store, "_COMPACT_MIN_DEAD", 10)
+        vectors = random_vectors(60)
+        add_file(store, "a.txt", vectors[:40])
+        add_file(store, "b.txt", vectors[40:], start=40)
+        
+        store.delete_source("a.txt")
+        
+        state = store._state()
+        assert state["generation"] == 1
+        assert state["rows"] == 20
+        assert store.query(vectors[45], n_results=1)["documents"] == ["b.txt text 45"]
+        assert not (store.directory / "vectors-0.float32").exists()
+    
+    def test_float16_storage(self, tmp_path):
+        """Test that float16 vectors halve the file and keep rankings."""
+        vectors = random_vectors(100)
+        s = MmapVectorStore(tmp_path / "f16", dtype="float16", ivf_min_vectors=0)
+        add_file(s, "a.txt", vectors)
+        
+        assert (tmp_path / "f16" / "vectors-0.float16").stat().st_size == 1024 * DIM * 2
+        for i in (0, 42, 99):
+            assert s.query(vectors[i], n_results=1)["documents"] == [f"a.txt text {i}"]
+        s.close()
+        
+        # The stored dtype wins over a different configured one
+        reopened = MmapVectorStore(tmp_path / "f16", dtype="float32", ivf_min_vectors=0)
+        assert reopened.dtype == "float16"
+        reopened.close()
+    
+    def test_dimension_mismatch(self, store):
+        """Test that vectors of another dimension are rejected."""
+        add_file(store, "a.txt", random_vectors(2))
+        with pytest.raises(ValueError, match="16-dim"):
+            store.add(["x"], ["x"], np.ones((1, 8), dtype=np.float32), [{"source": "b.txt"}])
+
+
+class TestIVF:
+    """Tests for IVF-partitioned search."""
+    
+    def test_ivf_matches_exact_search(self, tmp_path):
+        """Test that IVF search finds the same nearest neighbours on clustered data."""
+        rng = np.random.default_rng(3)
+        centers = rng.standard_normal((20, DIM)).astype(np.float32)
+        vectors = centers[rng.integers(0, 20, 2000)] + 0.05 * rng.standard_normal((2000, DIM)).astype(np.float32)
+        s = MmapVectorStore(tmp_path / "ivf", dtype="float32", ivf_min_vectors=1000, ivf_probes=4)
+        add_file(s, "a.txt", vectors)
+        
+        assert s._state()["ivf_rows"] == 2000
+        assert list(s.directory.glob("ivf-0-*.npz"))
+        hits = sum(s.query(vectors[i], n_results=1)["documents"] == [f"a.txt text {i}"] for i in range(0, 2000, 50))
+        assert hits == 40
+        s.close()
+    
+    def test_rows_added_after_training_are_found(self, tmp_path):
+        """Test that points appended since the index was trained are searched."""
+        vectors = random_vectors(1300)
+        s = MmapVectorStore(tmp_path / "ivf", dtype="float32", ivf_min_vectors=1000, ivf_probes=1)
+        add_file(s, "a.txt", vectors[:1000])
+        add_file(s, "b.txt", vectors[1000:], start=1000)
+        
+        assert s._state()["ivf_rows"] == 1000
+        assert s.query(vectors[1200], n_results=1)["documents"] == ["b.txt text 1200"]
+        s.close()
+
+
+class TestSharedReaders:
+    """Tests for several store instances (processes) on one directory."""
+    
+    def test_reader_sees_appends_deletes_and_compaction(self, tmp_path, monkeypatch):
+        """Test that a second instance follows another instance's writes."""
+        monkeypatch.setattr(mmap_store, "_COMPACT_MIN_DEAD", 10)
+        writer = MmapVectorStore(tmp_path / "shared", dtype="float32", ivf_min_vectors=0)
+        reader = MmapVectorStore(tmp_path / "shared", dtype="float32", ivf_min_vectors=0)
+        vectors = random_vectors(3000)
+        
+        add_file(writer, "a.txt", vectors[:10])
+        assert reader.query(vectors[5], n_results=1)["documents"] == ["a.txt text 5"]
+        
+        # Grows the files past the reader's current mapping
+        add_file(writer, "b.txt", vectors[10:], start=10)
+        assert reader.query(vectors[2500], n_results=1)["documents"] == ["b.txt text 2500"]
+        
+        writer.delete_source("b.txt")
+        assert writer._state()["generation"] == 1
+        assert reader.query(vectors[5], n_results=1)["documents"] == ["a.txt text 5"]
+        assert reader.count() == 10
+        writer.close()
+        reader.close()
+    
+    def test_reader_with_stale_state_retries(self, tmp_path, monkeypatch):
+        """Test that a search that read the state just before a compaction still finds hits."""
+        monkeypatch.setattr(mmap_store, "_COMPACT_MIN_DEAD", 10)
+        writer = MmapVectorStore(tmp_path / "shared", dtype="float32", ivf_min_vectors=0)
+        vectors = random_vectors(60)
+        add_file(writer, "a.txt", vectors[:20])
+        add_file(writer, "b.txt", vectors[20:], start=20)
+        reader = MmapVectorStore(tmp_path / "shared", dtype="float32", ivf_min_vectors=0)
+        stale = reader._state(reader._reader())
+        
+        writer.delete_source("b.txt")
+        assert not (tmp_path / "shared" / "vectors-0.float32").exists()
+        
+        # The first state read is from before the compaction, whose files are gone
+        states = [stale]
+        real_state = reader._state
+        monkeypatch.setattr(reader, "_state", lambda conn=None: states.pop() if states else real_state(conn))
+        assert reader.query(vectors[5], n_results=1)["documents"] == ["a.txt text 5"]
+        writer.close()
+        reader.close()
+
+
+class TestStoreFunctions:
+    """Tests for the qdrant_store-compatible module functions."""
+    
+    def test_catalog_follows_writes(self, store, tmp_path, monkeypatch):
+        """Test that adds and deletes keep catalog counts and reconcile fixes drift."""
+        catalog = Catalog(tmp_path / "catalog.sqlite", legacy_registry=None)
+        monkeypatch.setattr(mmap_store, "get_store", lambda: store)
+        monkeypatch.setattr(mmap_store, "get_catalog", lambda: catalog)
+        vectors = random_vectors(5)
+        
+        mmap_store.add_documents(["a0", "a1", "a2"], ["x", "y", "z"], vectors[:3], [{"source": "a.txt"}] * 3)
+        mmap_store.add_documents(["b0", "b1"], ["x", "y"], vectors[3:], [{"source": "b.txt"}] * 2)
+        assert catalog.counts() == {"a.txt": 3, "b.txt": 2}
+        assert mmap_store.get_collection_count() == 5
+        
+        assert mmap_store.delete_file("a.txt") == 3
+        catalog.add_chunks("ghost.txt", 4)
+        assert mmap_store.reconcile_catalog() == 1
+        assert store._lock_depth == 0
+        assert [f["name"] for f in mmap_store.list_files_with_counts()] == ["b.txt"]
+        catalog.close()
+    
+    def test_catalog_update_holds_the_write_lock(self, store, tmp_path, monkeypatch):
+        """Test that another process cannot recount between a write and its catalog update."""
+        held = []
+        
+        class LockCheckingCatalog(Catalog):
+            def add_chunks(self, name, count):
+                held.append(store._lock_depth)
+                super().add_chunks(name, count)
+            
+            def remove(self, name):
+                held.append(store._lock_depth)
+                super().remove(name)
+        
+        catalog = LockCheckingCatalog(tmp_path / "catalog.sqlite", legacy_registry=None)
+        monkeypatch.setattr(mmap_store, "get_store", lambda: store)
+        monkeypatch.setattr(mmap_store, "get_catalog", lambda: catalog)
+        
+        mmap_store.add_documents(["a0"], ["x"], random_vectors(1), [{"source": "a.txt"}])
+        mmap_store.delete_file("a.txt")
+        
+        assert held == [1, 1]
+        catalog.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
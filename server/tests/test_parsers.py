@@ -1,11 +1,35 @@
 """Unit tests for file parsers."""
 
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zipfile
 import pytest
+import numpy as np
 from pathlib import Path
+from xml.etree import ElementTree
 from app.parsers.text_parser import TextParser
+from app.core.utils import iter_file_text
+from app.parsers import pdf_parser
 from app.parsers.pdf_parser import PDFParser
 from app.parsers.docx_parser import DocxParser
 from app.parsers.registry import ParserRegistry
+from app.parsers.image_parser import ImageParser
+from app.parsers import ocr, text_cache
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.errors import PdfReadError
+from app.parsers.transcription import read_audio, split_audio
+from app.parsers import audio_parser, video_parser
+from app.parsers.audio_parser import AudioParser
+from app.parsers.video_parser import VideoParser
+from app.parsers.stt import get_stt_backend, FASTER_WHISPER_AVAILABLE
+from app.parsers import pool as pool_module
+from app.parsers.pool import _SlotPool, ParseCancelledError, ParseTimeoutError, ParseResourceError
 
 
 class TestTextParser:
@@ -42,6 +66,194 @@ class TestTextParser:
         result = parser.parse(test_file)
         
         assert result == test_content
+    
+    def test_streamed_windows_keep_multibyte_characters(self, tmp_path):
+        """Test that characters split across mmap windows are decoded intact."""
+        test_file = tmp_path / "large.txt"
+        # 4095 ASCII bytes put the 3-byte check mark across the first page boundary
+        test_content = "a" * 4095 + "✓ 世界 🌍\n" * 3000
+        test_file.write_text(test_content, encoding="utf-8")
+        
+        windows = list(iter_file_text(test_file, window_bytes=4096))
+        assert len(windows) > 1
+        assert windows[1].startswith("✓")
+        assert "".join(windows) == test_content
+    
+    def test_iter_parse_matches_parse(self, tmp_path):
+        """Test that streaming a text file gives the same text as parse()."""
+        test_file = tmp_path / "notes.txt"
+        test_file.write_text("line\n" * 1000)
+        
+        parser = TextParser()
+        assert "".join(t for t, _ in parser.iter_parse(test_file)) == parser.parse(test_file)
+        assert list(parser.iter_parse(tmp_path / "missing.txt")) == []
+
+
+def _write_docx(path: Path, body: str, header: str = "", footer: str = ""):
+    """Writes a minimal .docx containing the given WordprocessingML fragments."""
+    ns = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {ns}><w:body>{body}</w:body></w:document>")
+        if header:
+            archive.writestr("word/header1.xml", f"<w:hdr {ns}>{header}</w:hdr>")
+        if footer:
+            archive.writestr("word/footer1.xml", f"<w:ftr {ns}>{footer}</w:ftr>")
+
+
+def _p(text: str) -> str:
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+class TestDocxParser:
+    """Tests for the streaming DocxParser."""
+    
+    def test_paragraphs_and_tables_in_order(self, tmp_path):
+        """Test that table rows are emitted between the paragraphs around them."""
+        docx_path = tmp_path / "report.docx"
+        table = (
+            "<w:tbl>"
+            f"<w:tr><w:tc>{_p('Region')}</w:tc><w:tc>{_p('Revenue')}</w:tc></w:tr>"
+            f"<w:tr><w:tc>{_p('North')}</w:tc><w:tc>{_p('1200')}</w:tc></w:tr>"
+            "</w:tbl>"
+        )
+        _write_docx(docx_path, _p("Before the table.") + table + _p("After the table."))
+        
+        result = DocxParser().parse(docx_path)
+        assert result == "Before the table.\nRegion | Revenue\nNorth | 1200\nAfter the table."
+    
+    def test_headers_and_footers(self, tmp_path):
+        """Test that header and footer text is included around the body."""
+        docx_path = tmp_path / "letter.docx"
+        _write_docx(docx_path, _p("Body text."), header=_p("Company Ltd."), footer=_p("Confidential"))
+        
+        assert DocxParser().parse(docx_path) == "Company Ltd.\nBody text.\nConfidential"
+    
+    def test_runs_tabs_and_breaks(self, tmp_path):
+        """Test that runs are joined and tabs/breaks are kept within a paragraph."""
+        docx_path = tmp_path / "runs.docx"
+        _write_docx(
+            docx_path,
+            "<w:p><w:r><w:t>Split </w:t></w:r><w:r><w:t>run</w:t><w:tab/><w:t>tab</w:t>"
+            "<w:br/><w:t>next line</w:t></w:r></w:p>",
+        )
+        
+        assert DocxParser().parse(docx_path) == "Split run\ttab\nnext line"
+    
+    def test_segments_join_to_parse_output(self, tmp_path):
+        """Test that a large document streams in several segments."""
+        docx_path = tmp_path / "large.docx"
+        _write_docx(docx_path, "".join(_p(f"Paragraph {i} of a long report.") for i in range(2000)))
+        
+        segments = list(DocxParser().iter_parse(docx_path))
+        assert len(segments) > 1
+        assert "".join(text for text, _ in segments) == DocxParser().parse(docx_path)
+    
+    def test_invalid_file(self, tmp_path):
+        """Test that a file that is not a zip archive fails the parse."""
+        docx_path = tmp_path / "legacy.doc"
+        docx_path.write_bytes(b"\xd0\xcf\x11\xe0 not a docx")
+        
+        with pytest.raises(zipfile.BadZipFile):
+            DocxParser().parse(docx_path)
+    
+    def test_corrupt_document_is_raised(self, tmp_path):
+        """Test that a document.xml cut off mid-way fails instead of yielding partial text."""
+        docx_path = tmp_path / "truncated.docx"
+        _write_docx(docx_path, "".join(_p(f"Paragraph {i} of a long report.") for i in range(2000)))
+        with zipfile.ZipFile(docx_path) as archive:
+            xml = archive.read("word/document.xml")
+        with zipfile.ZipFile(docx_path, "w") as archive:
+            archive.writestr("word/document.xml", xml[: len(xml) // 2])
+        
+        with pytest.raises(ElementTree.ParseError):
+            list(DocxParser().iter_parse(docx_path))
+
+
+class TestPDFParser:
+    """Tests for PDFParser."""
+    
+    def test_parallel_matches_sequential(self, tmp_path, monkeypatch):
+        """Test that page ranges extracted on worker processes keep page order."""
+        sample = PdfReader(str(Path(__file__).parent / "sample_document.pdf"))
+        writer = PdfWriter()
+        for _ in range(5):
+            writer.add_page(sample.pages[0])
+        pdf_path = tmp_path / "five_pages.pdf"
+        with open(pdf_path, "wb") as f:
+            writer.write(f)
+        sequential = list(PDFParser().iter_parse(pdf_path))
+        
+        monkeypatch.setattr(pdf_parser, "PDF_PARALLEL_MIN_PAGES", 2)
+        monkeypatch.setattr(pdf_parser, "PDF_PAGES_PER_TASK", 2)
+        monkeypatch.setattr(pdf_parser, "PDF_PAGE_WORKERS", 2)
+        parallel = list(PDFParser().iter_parse(pdf_path))
+        
+        assert parallel == sequential
+        assert [meta["page"] for _, meta in parallel] == [1, 2, 3, 4, 5]
+    
+    def test_error_is_raised(self, tmp_path):
+        """Test that an unreadable PDF fails instead of yielding partial text."""
+        pdf_path = tmp_path / "broken.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 not really a pdf")
+        
+        with pytest.raises(PdfReadError):
+            list(PDFParser().iter_parse(pdf_path))
+
+
+class TestOCR:
+    """Tests for the batched OCR pipeline."""
+    
+    @pytest.fixture(autouse=True)
+    def cache_db(self, tmp_path, monkeypatch):
+        """Point the OCR result cache at a fresh database."""
+        monkeypatch.setattr(text_cache, "TEXT_CACHE_PATH", tmp_path / "text_cache.sqlite")
+        monkeypatch.setattr(text_cache, "_initialized", False)
+    
+    def test_preprocess_binarizes_and_rescales(self):
+        """Test that a 150 DPI scan is scaled to 300 DPI and binarized."""
+        image = Image.new("RGB", (400, 200), "white")
+        image.paste((40, 40, 40), (100, 80, 300, 120))
+        image.info["dpi"] = (150, 150)
+        
+        result = ocr.preprocess(image)
+        assert result.mode == "1"
+        assert result.size == (800, 400)
+    
+    def test_batch_order_and_cache(self, monkeypatch):
+        """Test that results keep input order and an image repeated in a batch is OCRed once."""
+        calls = []
+        
+        def fake_tesseract(image, lang=None):
+            calls.append(image.size)
+            return f"width {image.width}"
+        
+        monkeypatch.setattr(ocr.pytesseract, "image_to_string", fake_tesseract)
+        images = [Image.new("L", (w, 1200), 255) for w in (1000, 1100, 1200, 1000)]
+        
+        assert list(ocr.ocr_images(images)) == ["width 1000", "width 1100", "width 1200", "width 1000"]
+        assert len(calls) == 3
+    
+    def test_multipage_tiff(self, tmp_path, monkeypatch):
+        """Test that each TIFF page becomes a segment with its page number."""
+        monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda image, lang=None: f"{image.width}px page")
+        tiff_path = tmp_path / "scan.tiff"
+        pages = [Image.new("L", (w, 1400), 255) for w in (1000, 1100)]
+        pages[0].save(tiff_path, save_all=True, append_images=pages[1:])
+        
+        segments = list(ImageParser().iter_parse(tiff_path))
+        assert segments == [("1000px page", {"page": 1}), ("\n1100px page", {"page": 2})]
+    
+    def test_missing_tesseract_is_raised(self, tmp_path, monkeypatch):
+        """Test that a missing Tesseract binary fails instead of yielding an error message as text."""
+        def missing_tesseract(image, lang=None):
+            raise ocr.pytesseract.TesseractNotFoundError()
+        
+        monkeypatch.setattr(ocr.pytesseract, "image_to_string", missing_tesseract)
+        image_path = tmp_path / "scan.png"
+        Image.new("L", (1000, 1400), 255).save(image_path)
+        
+        with pytest.raises(ocr.pytesseract.TesseractNotFoundError):
+            list(ImageParser().iter_parse(image_path))
 
 
 class TestParserRegistry:
@@ -79,5 +291,261 @@ class TestParserRegistry:
         assert ".docx" in extensions
 
 
+def _run_isolated(code: str) -> dict:
+    """Runs `code` in a fresh interpreter and returns the JSON it prints."""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestLazyParserLoading:
+    """Tests that parser backends are only imported when first used."""
+    
+    HEAVY_MODULES = ["torch", "whisper", "PIL", "pytesseract", "docx", "PyPDF2", "numpy"]
+    
+    # Generous enough for slow CI machines; the eager imports took seconds
+    IMPORT_BUDGET_SECONDS = 1.0
+    
+    def test_import_budget(self):
+        """Test that importing the parsers package is fast and loads no backends."""
+        result = _run_isolated(
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "import app.parsers\n"
+            "elapsed = time.perf_counter() - start\n"
+            f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {self.HEAVY_MODULES!r} if m in sys.modules]}}))"
+        )
+        
+        assert result["loaded"] == []
+        assert result["elapsed"] < self.IMPORT_BUDGET_SECONDS
+    
+    def test_backend_loaded_on_first_use(self):
+        """Test that looking up a parser imports only that parser's backend."""
+        result = _run_isolated(
+            "import json, sys\n"
+            "from pathlib import Path\n"
+            "from app.parsers import ParserRegistry\n"
+            "parser = ParserRegistry.get_parser(Path('doc.pdf'))\n"
+            "print(json.dumps({'parser': type(parser).__name__, "
+            "'pdf': 'PyPDF2' in sys.modules, 'whisper': 'whisper' in sys.modules}))"
+        )
+        
+        assert result == {"parser": "PDFParser", "pdf": True, "whisper": False}
+
+
+class TestAudioSegmentation:
+    """Tests for splitting audio into transcription windows."""
+    
+    def test_windows_cover_audio(self):
+        """Test that windows are contiguous and cover every sample."""
+        audio = np.ones(16000 * 100, dtype=np.float32)
+        ranges = split_audio(audio, window_seconds=30)
+        
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == len(audio)
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        # A short remainder is merged into the last window
+        assert all(end - start >= 16000 * 15 for start, end in ranges)
+    
+    def test_cut_snaps_to_silence(self):
+        """Test that a window boundary moves to a nearby quiet stretch."""
+        audio = np.ones(16000 * 60, dtype=np.float32)
+        audio[16000 * 32 : 16000 * 32 + 1600] = 0.0
+        
+        (first_start, first_end), _ = split_audio(audio, window_seconds=30)
+        assert 16000 * 32 <= first_end < 16000 * 32 + 1600
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+class TestAudioDecoding:
+    """Tests for decoding audio through the ffmpeg pipe."""
+    
+    def test_read_audio_resamples_to_16k_mono(self):
+        """Test that a 44.1 kHz WAV is decoded to 16 kHz mono float32."""
+        audio = read_audio(Path(__file__).parent / "sample_audio.wav")
+        
+        assert audio.dtype == np.float32
+        assert audio.ndim == 1
+        assert len(audio) == 16000 * 3
+        assert np.abs(audio).max() <= 1.0
+    
+    def test_video_without_audio(self):
+        """Test that a silent video is reported without a temp file being left behind."""
+        video_path = Path(__file__).parent / "sample_video.mp4"
+        
+        assert VideoParser().parse(video_path) == "Video has no audio track."
+        assert not video_path.with_suffix(".temp.wav").exists()
+
+
+class TestTranscriptionErrors:
+    """Tests that failed transcriptions are raised rather than indexed."""
+    
+    def test_audio_decode_error_is_raised(self, monkeypatch):
+        """Test that an audio file ffmpeg cannot decode fails the parse."""
+        def broken_read_audio(file_path):
+            raise RuntimeError("ffmpeg failed")
+        
+        monkeypatch.setattr(audio_parser, "read_audio", broken_read_audio)
+        
+        with pytest.raises(RuntimeError, match="ffmpeg failed"):
+            list(AudioParser().iter_parse(Path("talk.mp3")))
+    
+    def test_video_transcription_error_is_raised(self, monkeypatch):
+        """Test that a transcription failure partway through a video fails the parse."""
+        def broken_transcribe(audio):
+            yield "first words", {"start": 0.0, "end": 1.0}
+            raise RuntimeError("model crashed")
+        
+        monkeypatch.setattr(video_parser, "read_audio", lambda file_path: np.zeros(16000, dtype=np.float32))
+        monkeypatch.setattr(video_parser, "transcribe_segments", broken_transcribe)
+        
+        with pytest.raises(RuntimeError, match="model crashed"):
+            list(VideoParser().iter_parse(Path("talk.mp4")))
+    
+    
+    def test_ffmpeg_error_flood_does_not_block(self, tmp_path, monkeypatch):
+        """Test that ffmpeg logging more than a pipe buffer of errors still decodes."""
+        fake_ffmpeg = tmp_path / "ffmpeg"
+        fake_ffmpeg.write_text(
+            f"#!{sys.executable}\n"
+            "import sys\n"
+            "sys.stderr.write('corrupt frame\\n' * 100000)\n"
+            "sys.stderr.flush()\n"
+            "sys.stdout.buffer.write(bytes(32000))\n"
+        )
+        fake_ffmpeg.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+        result = {}
+        
+        # Deadlocked when stdout was drained before stderr
+        reader = threading.Thread(target=lambda: result.update(audio=read_audio(Path("damaged.mp3"))), daemon=True)
+        reader.start()
+        reader.join(30)
+        
+        assert not reader.is_alive()
+        assert len(result["audio"]) == 16000
+
+
+class TestSTTBackends:
+    """Tests for speech-to-text backend selection."""
+    
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected."""
+        with pytest.raises(ValueError):
+            get_stt_backend("does-not-exist")
+    
+    @pytest.mark.skipif(FASTER_WHISPER_AVAILABLE, reason="faster-whisper is installed")
+    def test_missing_optional_backend(self):
+        """Test that selecting faster-whisper without the package fails clearly."""
+        with pytest.raises(RuntimeError, match="faster-whisper"):
+            get_stt_backend("faster-whisper")
+
+
+class TestParserPool:
+    """Tests for the out-of-process parser pool."""
+    
+    def test_parse_in_worker(self, tmp_path):
+        """Test that a worker process returns the parsed text."""
+        test_file = tmp_path / "pooled.txt"
+        test_file.write_text("Parsed out of process.")
+        
+        pool = _SlotPool("test", slots=1, timeout=120, max_rss_mb=0)
+        try:
+            assert pool.run(test_file) == "Parsed out of process."
+            # The worker is kept for the next job
+            assert len(pool._idle) == 1
+        finally:
+            pool.shutdown()
+    
+    def test_stream_segments(self, tmp_path):
+        """Test that a worker streams segments with their metadata."""
+        pdf_path = Path(__file__).parent / "sample_document.pdf"
+        
+        pool = _SlotPool("test", slots=1, timeout=120, max_rss_mb=0)
+        try:
+            segments = list(pool.stream(pdf_path))
+        finally:
+            pool.shutdown()
+        
+        assert segments == list(PDFParser().iter_parse(pdf_path))
+        assert segments[0][1] == {"page": 1}
+    
+    def test_wall_clock_budget(self, tmp_path):
+        """Test that a job exceeding its timeout fails and its worker is discarded."""
+        test_file = tmp_path / "slow.txt"
+        test_file.write_text("Never returned in time.")
+        
+        pool = _SlotPool("test", slots=1, timeout=0.001, max_rss_mb=0)
+        with pytest.raises(ParseTimeoutError):
+            pool.run(test_file)
+        assert pool._idle == []
+    
+    def test_memory_budget(self, tmp_path):
+        """Test that a worker over its RSS limit is killed."""
+        test_file = tmp_path / "big.txt"
+        test_file.write_text("Any interpreter exceeds one megabyte.")
+        
+        pool = _SlotPool("test", slots=1, timeout=120, max_rss_mb=1)
+        with pytest.raises(ParseResourceError):
+            pool.run(test_file)
+    
+    def test_interpreter_exits_without_shutdown(self, tmp_path):
+        """Test that a script using the shared pool exits without shutting it down itself."""
+        test_file = tmp_path / "script.txt"
+        test_file.write_text("Parsed by a script.")
+        code = (
+            "from pathlib import Path\n"
+            "from app.parsers import parser_pool\n"
+            f"print(parser_pool.extract_text(Path({str(test_file)!r})))\n"
+        )
+        
+        # Hung forever in multiprocessing's exit handler joining the idle worker
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=Path(__file__).parent.parent,
+            capture_output=True, text=True, timeout=60,
+        )
+        
+        assert result.returncode == 0
+        assert result.stdout.strip() == "Parsed by a script."
+    
+    @pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+    def test_cancel_kills_the_worker(self, tmp_path):
+        """Test that cancelling a stream stops the parse by killing its worker."""
+        # Opening a FIFO without a writer blocks, like a parser stuck on a huge file
+        test_file = tmp_path / "stuck.txt"
+        os.mkfifo(test_file)
+        cancelled = threading.Event()
+        threading.Timer(0.5, cancelled.set).start()
+        
+        pool = _SlotPool("test", slots=1, timeout=120, max_rss_mb=0)
+        start = time.monotonic()
+        with pytest.raises(ParseCancelledError):
+            list(pool.stream(test_file, cancelled))
+        
+        assert time.monotonic() - start < 30
+        assert pool._idle == [] and not pool._busy
+    
+    @pytest.mark.skipif(not Path("/proc/self/statm").exists(), reason="needs procfs")
+    def test_memory_budget_counts_child_processes(self):
+        """Test that processes a parser starts count towards its worker's RSS."""
+        before = pool_module._current_rss_bytes()
+        child = subprocess.Popen(
+            [sys.executable, "-c", "import sys; data = b'x' * (200 << 20); print(flush=True); sys.stdin.read()"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        try:
+            child.stdout.readline()
+            assert child.pid in pool_module._descendant_pids()
+            assert pool_module._current_rss_bytes() - before > 150 << 20
+        finally:
+            child.kill()
+            child.wait()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -1,6 +1,12 @@
 """Unit tests for security validation functions."""
 
+import asyncio
+import hashlib
+import io
+
 import pytest
+from starlette.datastructures import UploadFile
+
 from app.core.security import (
     validate_file_size,
     validate_file_extension,
@@ -8,6 +14,7 @@ from app.core.security import (
     FileValidationError,
 )
 from app.core.config import MAX_FILE_SIZE_BYTES, ALLOWED_EXTENSIONS
+from app.core.utils import save_upload_stream
 
 
 class TestFileValidation:
@@ -91,5 +98,44 @@ class TestFileValidation:
             sanitize_filename("../../")
 
 
+class TestStreamedUpload:
+    """Tests for streaming uploads to disk."""
+    
+    def _upload(self, content: bytes, filename: str = "notes.txt") -> UploadFile:
+        return UploadFile(file=io.BytesIO(content), filename=filename)
+    
+    def test_stream_writes_file_and_hash(self, tmp_path):
+        """Test that the streamed file matches the upload and its SHA-256."""
+        content = b"Streaming upload line.\n" * 5000
+        stored = asyncio.run(
+            save_upload_stream(self._upload(content), tmp_path, "notes.txt", block_size=4096)
+        )
+        
+        assert stored.path == tmp_path / "notes.txt"
+        assert stored.path.read_bytes() == content
+        assert stored.size == len(content)
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+    
+    def test_stream_enforces_size_limit(self, tmp_path):
+        """Test that oversized uploads are rejected and leave nothing behind."""
+        content = b"x" * 10000
+        with pytest.raises(FileValidationError):
+            asyncio.run(
+                save_upload_stream(
+                    self._upload(content), tmp_path, "big.txt", max_bytes=4096, block_size=1024
+                )
+            )
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_stream_never_overwrites(self, tmp_path):
+        """Test that a file stored meanwhile under the same name is kept."""
+        (tmp_path / "notes.txt").write_bytes(b"First upload.\n")
+        with pytest.raises(FileExistsError):
+            asyncio.run(save_upload_stream(self._upload(b"Second upload.\n"), tmp_path, "notes.txt"))
+        
+        assert (tmp_path / "notes.txt").read_bytes() == b"First upload.\n"
+        assert [p.name for p in tmp_path.iterdir()] == ["notes.txt"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
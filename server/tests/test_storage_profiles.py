@@ -0,0 +1,123 @@
+"""Unit tests for Qdrant storage profiles and collection migration."""
+
+from types import SimpleNamespace
+
+import pytest
+from qdrant_client.http import models
+from app.rag import qdrant_store, storage_profiles
+from app.rag.storage_profiles import STORAGE_PROFILES, get_storage_profile, profile_drift
+
+
+def collection_config(profile=None, quantization=True, **overrides):
+    """A collection config as Qdrant reports it, matching profile unless overridden."""
+    profile = profile or STORAGE_PROFILES["balanced"]
+    settings = dict(
+        vectors_on_disk=profile.vectors_on_disk,
+        payload_on_disk=profile.payload_on_disk,
+        hnsw_m=profile.hnsw_m,
+        hnsw_ef_construct=profile.hnsw_ef_construct,
+        hnsw_on_disk=profile.hnsw_on_disk,
+    )
+    settings.update(overrides)
+    return SimpleNamespace(
+        params=SimpleNamespace(
+            vectors=SimpleNamespace(on_disk=settings["vectors_on_disk"]),
+            on_disk_payload=settings["payload_on_disk"],
+        ),
+        hnsw_config=SimpleNamespace(
+            m=settings["hnsw_m"], ef_construct=settings["hnsw_ef_construct"], on_disk=settings["hnsw_on_disk"]
+        ),
+        quantization_config=storage_profiles.quantization_config(profile) if quantization else None,
+    )
+
+
+class TestStorageProfiles:
+    """Tests for profile definitions and the Qdrant settings built from them."""
+    
+    def test_profiles_trade_memory_for_latency(self):
+        """Test that low-memory keeps the most on disk and low-latency the least."""
+        low_memory = get_storage_profile("low-memory")
+        low_latency = get_storage_profile("low-latency")
+        
+        assert low_memory.vectors_on_disk and low_memory.hnsw_on_disk and low_memory.payload_on_disk
+        assert not (low_latency.vectors_on_disk or low_latency.hnsw_on_disk or low_latency.payload_on_disk)
+        assert low_latency.hnsw_m > low_memory.hnsw_m
+        assert low_latency.search_ef > get_storage_profile("balanced").search_ef > low_memory.search_ef
+    
+    def test_unknown_profile(self):
+        """Test that an unknown profile name is rejected."""
+        with pytest.raises(ValueError, match="Unknown storage profile"):
+            get_storage_profile("tiny")
+    
+    def test_search_rescores_quantized_candidates(self):
+        """Test that searches rescore with original vectors and oversample."""
+        params = storage_profiles.search_params(get_storage_profile("low-memory"))
+        
+        assert params.hnsw_ef == 64
+        assert params.quantization.rescore is True
+        assert params.quantization.oversampling == 2.0
+    
+    def test_no_drift(self):
+        """Test that a collection created from a profile matches it."""
+        for profile in STORAGE_PROFILES.values():
+            assert profile_drift(collection_config(profile), profile) == []
+    
+    def test_drift(self):
+        """Test that each differing setting is reported."""
+        profile = get_storage_profile("balanced")
+        
+        assert profile_drift(collection_config(vectors_on_disk=False), profile) == ["vectors on_disk"]
+        assert profile_drift(collection_config(hnsw_m=32), profile) == ["hnsw_config"]
+        assert profile_drift(collection_config(quantization=False), profile) == ["quantization"]
+        assert profile_drift(collection_config(get_storage_profile("low-latency")), profile) == [
+            "vectors on_disk", "hnsw_config"
+        ]
+
+
+class TestCollectionMigration:
+    """Tests for migrating an existing collection to the configured profile."""
+    
+    def make_client(self, config):
+        class Client:
+            updates = []
+            
+            def get_collection(self, name):
+                return SimpleNamespace(config=config)
+            
+            def update_collection(self, **kwargs):
+                self.updates.append(kwargs)
+        
+        return Client()
+    
+    def test_migrates_legacy_collection(self, monkeypatch):
+        """Test that a collection created without a profile is updated in place."""
+        # What _ensure_collection used to create: in-RAM float32 vectors, default HNSW
+        legacy = collection_config(
+            quantization=False, vectors_on_disk=None, payload_on_disk=None, hnsw_on_disk=None
+        )
+        client = self.make_client(legacy)
+        monkeypatch.setattr(qdrant_store, "_client", client)
+        monkeypatch.setattr(qdrant_store, "_PROFILE", get_storage_profile("balanced"))
+        
+        qdrant_store._apply_storage_profile()
+        
+        assert len(client.updates) == 1
+        update = client.updates[0]
+        assert update["vectors_config"][""].on_disk is True
+        assert update["hnsw_config"].m == 16
+        assert isinstance(update["quantization_config"], models.ScalarQuantization)
+    
+    def test_up_to_date_collection_is_left_alone(self, monkeypatch):
+        """Test that no update is sent when the collection matches the profile."""
+        profile = get_storage_profile("low-latency")
+        client = self.make_client(collection_config(profile))
+        monkeypatch.setattr(qdrant_store, "_client", client)
+        monkeypatch.setattr(qdrant_store, "_PROFILE", profile)
+        
+        qdrant_store._apply_storage_profile()
+        
+        assert client.updates == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
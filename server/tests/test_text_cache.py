@@ -0,0 +1,166 @@
+"""Unit tests for the extracted text cache."""
+
+import json
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import routes
+from app.parsers import text_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_db(tmp_path, monkeypatch):
+    """Point the cache at a fresh database for each test."""
+    monkeypatch.setattr(text_cache, "TEXT_CACHE_PATH", tmp_path / "text_cache.sqlite")
+    monkeypatch.setattr(text_cache, "_initialized", False)
+
+
+class TestTextCache:
+    """Tests for the content-addressed text cache."""
+    
+    def test_miss_returns_none(self):
+        """Test that an unknown key is a miss."""
+        assert text_cache.get_text(("0" * 64, "TextParser", 1)) is None
+    
+    def test_round_trip_across_segments(self):
+        """Test that text spanning several segments is returned intact."""
+        key = ("a" * 64, "TextParser", 1)
+        text = "Unicode ✓ line.\n" * 10000
+        text_cache.put_text(key, text)
+        
+        assert text_cache.get_text(key) == text
+    
+    def test_segments_replay_with_metadata(self):
+        """Test that segments with metadata come back as they were stored."""
+        key = ("d" * 64, "PDFParser", 2)
+        segments = [("page one " * 9000, {"page": 1}), ("\npage two", {"page": 2})]
+        text = "".join(t for t, _ in segments)
+        text_cache.put_text(key, text, marks=[(0, {"page": 1}), (len(segments[0][0]), {"page": 2})])
+        
+        assert list(text_cache.iter_segments(key)) == segments
+    
+    def test_parser_version_is_part_of_key(self):
+        """Test that a parser version bump does not reuse old text."""
+        text_cache.put_text(("b" * 64, "PDFParser", 1), "old output")
+        assert text_cache.get_text(("b" * 64, "PDFParser", 2)) is None
+    
+    def test_invalidate_keeps_shared_content(self):
+        """Test that deleting one of two identical files keeps the cached text."""
+        key = ("c" * 64, "TextParser", 1)
+        text_cache.put_text(key, "shared content")
+        text_cache.bind_file("one.txt", key)
+        text_cache.bind_file("two.txt", key)
+        
+        text_cache.invalidate_file("one.txt")
+        assert text_cache.lookup_file("one.txt") is None
+        assert text_cache.get_text(key) == "shared content"
+        
+        text_cache.invalidate_file("two.txt")
+        assert text_cache.get_text(key) is None
+    
+    def test_eviction_drops_least_recently_used(self, monkeypatch):
+        """Test that the cache evicts old entries when over its size budget."""
+        monkeypatch.setattr(text_cache, "TEXT_CACHE_MAX_MB", 0)
+        key = ("d" * 64, "TextParser", 1)
+        text_cache.put_text(key, "evicted immediately")
+        
+        assert text_cache.get_text(key) is None
+    
+    def test_creates_missing_directory(self, tmp_path, monkeypatch):
+        """Test that the cache can live in a directory that does not exist yet."""
+        monkeypatch.setattr(text_cache, "TEXT_CACHE_PATH", tmp_path / "new" / "dir" / "text_cache.sqlite")
+        key = ("e" * 64, "TextParser", 1)
+        text_cache.put_text(key, "cached")
+        
+        assert text_cache.get_text(key) == "cached"
+
+
+
+# Longer than two cache segments, with characters JSON has to escape
+ROUTE_TEXT = ('Quote " backslash \\ path C:\\dir\ttab \u00e9t\u00e9 \u2713 \U0001F600\n' * 5000)[: 2 * text_cache._SEGMENT_CHARS + 500]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """An API client over an upload whose text is already cached."""
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "notes.txt").write_text(ROUTE_TEXT, encoding="utf-8")
+    key = ("f" * 64, *text_cache.parser_key(Path("notes.txt")))
+    text_cache.put_text(key, ROUTE_TEXT)
+    text_cache.bind_file("notes.txt", key)
+    monkeypatch.setattr(routes, "UPLOAD_DIR", uploads)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    with TestClient(app) as c:
+        yield c
+
+
+def get_range(client, **params) -> dict:
+    """Requests a text range and parses the streamed body as plain JSON."""
+    response = client.get("/api/get_file_text", params={"name": "notes.txt", **params})
+    assert response.status_code == 200
+    assert response.headers["X-Total-Length"] == str(len(ROUTE_TEXT))
+    return json.loads(response.content)
+
+
+class TestFileTextRoute:
+    """Tests for the streamed /get_file_text response."""
+    
+    def test_range_across_segment_boundary(self, client):
+        """Test that a range spanning two cache segments is sliced exactly."""
+        offset = text_cache._SEGMENT_CHARS - 37
+        
+        body = get_range(client, offset=offset, length=100)
+        
+        assert body["text"] == ROUTE_TEXT[offset : offset + 100]
+        assert body["offset"] == offset
+        assert body["length"] == 100
+        assert body["total_length"] == len(ROUTE_TEXT)
+        assert body["next_offset"] == offset + 100
+    
+    def test_whole_text_round_trips(self, client):
+        """Test that quotes, backslashes and non-ASCII text survive the hand-built JSON."""
+        body = get_range(client, length=len(ROUTE_TEXT))
+        
+        assert body["text"] == ROUTE_TEXT
+        assert body["next_offset"] is None
+    
+    def test_pages_join_to_whole_text(self, client):
+        """Test that following next_offset returns the text without gaps or overlaps."""
+        pieces, offset = [], 0
+        while offset is not None:
+            body = get_range(client, offset=offset, length=50000)
+            pieces.append(body["text"])
+            offset = body["next_offset"]
+        
+        assert len(pieces) == 3
+        assert "".join(pieces) == ROUTE_TEXT
+    
+    def test_next_offset_is_null_at_end(self, client):
+        """Test that a range reaching the end is shortened and has no next offset."""
+        body = get_range(client, offset=len(ROUTE_TEXT) - 5, length=100)
+        
+        assert body["text"] == ROUTE_TEXT[-5:]
+        assert body["length"] == 5
+        assert body["next_offset"] is None
+    
+    def test_offset_past_end(self, client):
+        """Test that an offset past the end returns an empty range at the end."""
+        body = get_range(client, offset=len(ROUTE_TEXT) + 10)
+        
+        assert body["text"] == ""
+        assert body["offset"] == len(ROUTE_TEXT)
+        assert body["length"] == 0
+        assert body["next_offset"] is None
+    
+    def test_invalid_requests(self, client):
+        """Test that negative offsets and unknown files are rejected."""
+        assert client.get("/api/get_file_text", params={"name": "notes.txt", "offset": -1}).status_code == 422
+        assert client.get("/api/get_file_text", params={"name": "notes.txt", "length": 0}).status_code == 422
+        assert client.get("/api/get_file_text", params={"name": "missing.txt"}).status_code == 404
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])